@@ -0,0 +1,203 @@
+import streamlit as st # type: ignore
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+import os
+import database
+
+# Dose events: one row per taken dose, queried by user and date range
+DATA_DIR = "data"
+ADHERENCE_DB_FILE = os.path.join(DATA_DIR, "adherence.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dose_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    medication_id TEXT NOT NULL,
+    scheduled_slot TEXT NOT NULL DEFAULT '',
+    slot_date TEXT NOT NULL,
+    taken_at TEXT NOT NULL,
+    UNIQUE (medication_id, slot_date, scheduled_slot)
+);
+CREATE INDEX IF NOT EXISTS idx_dose_events_user_date ON dose_events (username, slot_date);
+CREATE INDEX IF NOT EXISTS idx_dose_events_date ON dose_events (slot_date);
+"""
+
+# PRAGMA user_version once the legacy taken flags have been imported
+TAKEN_FLAGS_IMPORTED = 1
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def initialize_adherence_store():
+    """
+    Initialize the dose event database if it doesn't exist
+
+    The first time, the legacy taken flags on medications are imported as
+    dose events; the database's user_version records that it happened.
+    """
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        if not os.path.exists(DATA_DIR):
+            os.makedirs(DATA_DIR)
+        with closing(sqlite3.connect(ADHERENCE_DB_FILE, timeout=10)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            needs_import = conn.execute("PRAGMA user_version").fetchone()[0] < TAKEN_FLAGS_IMPORTED
+        _schema_ready = True
+
+    # Outside the lock, since recording doses initializes the store again;
+    # importing twice is harmless because repeated events are ignored
+    if needs_import:
+        import_taken_flags(database.iter_all_medications())
+        with closing(sqlite3.connect(ADHERENCE_DB_FILE, timeout=10)) as conn:
+            conn.execute(f"PRAGMA user_version = {TAKEN_FLAGS_IMPORTED}")
+
+def _connect():
+    """
+    Open a connection to the dose event database
+
+    Returns:
+        sqlite3.Connection: Connection with rows returned as sqlite3.Row
+    """
+    initialize_adherence_store()
+    conn = sqlite3.connect(ADHERENCE_DB_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _to_date_str(day):
+    """
+    Normalize a date or "YYYY-MM-DD" string to "YYYY-MM-DD"
+    """
+    return day if isinstance(day, str) else day.strftime("%Y-%m-%d")
+
+def record_dose(username, medication_id, scheduled_slot="", taken_at=None):
+    """
+    Record that a scheduled dose was taken
+
+    Recording the same (medication, day, slot) twice keeps the first event.
+
+    Args:
+        username (str): Username
+        medication_id (str): Medication ID
+        scheduled_slot (str): Slot the dose belongs to (e.g. "morning" or "08:00")
+        taken_at (datetime): When the dose was taken, defaults to now
+
+    Returns:
+        bool: True if the dose was recorded successfully, False otherwise
+    """
+    taken_at = taken_at or datetime.now()
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO dose_events (username, medication_id, scheduled_slot, slot_date, taken_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    username,
+                    medication_id,
+                    scheduled_slot or "",
+                    taken_at.strftime("%Y-%m-%d"),
+                    taken_at.strftime("%Y-%m-%d %H:%M:%S")
+                )
+            )
+        return True
+    except Exception as e:
+        st.error(f"Error recording dose: {str(e)}")
+        return False
+
+def get_dose_events(username, start_date, end_date):
+    """
+    Get all dose events for a user between two dates (inclusive)
+
+    Args:
+        username (str): Username
+        start_date (date or str): First day of the range
+        end_date (date or str): Last day of the range
+
+    Returns:
+        list: Dose events ordered by time taken
+    """
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute(
+                "SELECT medication_id, scheduled_slot, slot_date, taken_at FROM dose_events "
+                "WHERE username = ? AND slot_date BETWEEN ? AND ? ORDER BY taken_at",
+                (username, _to_date_str(start_date), _to_date_str(end_date))
+            ).fetchall()
+            return [dict(row) for row in rows]
+    except Exception as e:
+        st.error(f"Error getting dose events: {str(e)}")
+        return []
+
+def get_taken_slots(username, day):
+    """
+    Get the (medication_id, scheduled_slot) pairs taken by a user on a day
+
+    Args:
+        username (str): Username
+        day (date or str): The day to check
+
+    Returns:
+        set: Set of (medication_id, scheduled_slot) tuples
+    """
+    return {
+        (event['medication_id'], event['scheduled_slot'])
+        for event in get_dose_events(username, day, day)
+    }
+
+def get_all_taken_slots(day):
+    """
+    Get the (medication_id, scheduled_slot) pairs taken on a day, for every user
+
+    Args:
+        day (date or str): The day to check
+
+    Returns:
+        dict: Mapping of username to set of (medication_id, scheduled_slot) tuples
+    """
+    taken = {}
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute(
+                "SELECT username, medication_id, scheduled_slot FROM dose_events WHERE slot_date = ?",
+                (_to_date_str(day),)
+            )
+            for row in rows:
+                taken.setdefault(row['username'], set()).add((row['medication_id'], row['scheduled_slot']))
+    except Exception as e:
+        print(f"Error getting dose events: {str(e)}")
+    return taken
+
+def get_taken_medication_ids(username, day):
+    """
+    Get the IDs of medications a user took at least one dose of on a day
+
+    Args:
+        username (str): Username
+        day (date or str): The day to check
+
+    Returns:
+        set: Set of medication IDs
+    """
+    return {medication_id for medication_id, _ in get_taken_slots(username, day)}
+
+def import_taken_flags(medications):
+    """
+    Backfill dose events from the legacy taken/taken_at medication fields
+
+    Args:
+        medications (list): Medication dictionaries
+
+    Returns:
+        int: Number of medications with a taken flag that were imported
+    """
+    imported = 0
+    for med in medications:
+        if med.get('taken') and med.get('taken_at'):
+            taken_at = datetime.strptime(med['taken_at'], "%Y-%m-%d %H:%M:%S")
+            if record_dose(med['username'], med['id'], "", taken_at):
+                imported += 1
+    return imported
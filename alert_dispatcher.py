@@ -0,0 +1,196 @@
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bounded pool shared by every dispatch in the process
+MAX_WORKERS = int(os.getenv("ALERT_MAX_WORKERS", 32))
+CALL_TIMEOUT = float(os.getenv("ALERT_CALL_TIMEOUT", 10))
+CALL_RETRIES = int(os.getenv("ALERT_CALL_RETRIES", 2))
+RETRY_BACKOFF = float(os.getenv("ALERT_RETRY_BACKOFF", 0.5))
+
+# Outcome of one call: the contact, whether it went through, and how
+CallResult = namedtuple("CallResult", ["contact", "ok", "sid", "attempts", "error"])
+
+_executor = None
+_transport = None
+_lock = threading.Lock()
+
+class FakeHttpTransport:
+    """
+    Transport that posts calls to a local HTTP stand-in instead of Twilio
+    """
+
+    def __init__(self, url, from_number="+10000000000"):
+        self.url = url
+        self.from_number = from_number
+
+    def place_call(self, to, message, timeout):
+        """
+        Place one call
+
+        Args:
+            to (str): Phone number to call
+            message (str): Message to read out
+            timeout (float): Seconds to wait for the call request
+
+        Returns:
+            str: Call SID
+        """
+        body = json.dumps({"to": to, "from": self.from_number, "message": message}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())["sid"]
+
+def run_fake_call_server(host="127.0.0.1", port=0, latency=0.05, failure_rate=0.0):
+    """
+    Start a local HTTP server that pretends to place calls
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+        latency (float): Seconds each call takes
+        failure_rate (float): Fraction of calls answered with HTTP 503
+
+    Returns:
+        ThreadingHTTPServer: The running server; its URL is
+            f"http://{host}:{server.server_port}/calls"
+    """
+    class CallHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            if random.random() < failure_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            payload = json.dumps({"sid": "CA" + uuid.uuid4().hex}).encode()
+            self.send_response(201)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), CallHandler)
+    server.daemon_threads = True
+    # Many simultaneous alerts connect at once
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def get_transport():
+    """
+    Get the process-wide call transport, creating it on first use
+
+    ALERT_TRANSPORT selects "twilio" (default) or "fake", which posts to
+    ALERT_FAKE_URL.
+
+    Returns:
+        object: Transport with a place_call(to, message, timeout) method
+    """
+    global _transport
+    with _lock:
+        if _transport is None:
+            if os.getenv("ALERT_TRANSPORT", "twilio") == "fake":
+                _transport = FakeHttpTransport(os.getenv("ALERT_FAKE_URL", "http://127.0.0.1:8765/calls"))
+            else:
+                import twilio_alert
+                _transport = twilio_alert.TwilioTransport()
+        return _transport
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="alert-call")
+        return _executor
+
+def _call_with_retries(transport, contact, message, timeout, retries, backoff):
+    """
+    Place one call, retrying failures with exponential backoff and jitter
+    """
+    error = None
+    for attempt in range(1, retries + 2):
+        try:
+            sid = transport.place_call(contact["phone"], message, timeout)
+            return CallResult(contact, True, sid, attempt, None)
+        except Exception as e:
+            error = e
+            if attempt <= retries:
+                time.sleep(backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+    return CallResult(contact, False, None, retries + 1, str(error))
+
+def dispatch_calls(contacts, message, transport=None, timeout=CALL_TIMEOUT, retries=CALL_RETRIES, backoff=RETRY_BACKOFF):
+    """
+    Call every contact concurrently on the shared bounded thread pool
+
+    Args:
+        contacts (list): Emergency contact dicts with at least "phone"
+        message (str): Message to read out
+        transport (object): Transport to use, defaults to get_transport()
+        timeout (float): Per-call request timeout in seconds
+        retries (int): Extra attempts per failed call
+        backoff (float): Base delay in seconds before the first retry
+
+    Returns:
+        list: CallResult for each contact, in the order given
+    """
+    transport = transport or get_transport()
+    executor = _get_executor()
+    futures = {
+        executor.submit(_call_with_retries, transport, contact, message, timeout, retries, backoff): i
+        for i, contact in enumerate(contacts)
+    }
+    results = [None] * len(contacts)
+    for future in as_completed(futures):
+        results[futures[future]] = future.result()
+    return results
+
+def load_test(count=1000, latency=0.05, failure_rate=0.0):
+    """
+    Dispatch simultaneous alerts against the local fake call server
+
+    Args:
+        count (int): Number of contacts to call
+        latency (float): Simulated seconds per call
+        failure_rate (float): Fraction of calls the fake server rejects
+
+    Returns:
+        dict: Call counts, elapsed seconds and calls per second
+    """
+    server = run_fake_call_server(latency=latency, failure_rate=failure_rate)
+    try:
+        transport = FakeHttpTransport(f"http://127.0.0.1:{server.server_port}/calls")
+        contacts = [{"name": f"Contact {i}", "phone": f"+1555{i:07d}"} for i in range(count)]
+        started = time.perf_counter()
+        results = dispatch_calls(contacts, "Load test alert", transport=transport, backoff=0.05)
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+    delivered = sum(result.ok for result in results)
+    return {
+        "calls": count,
+        "delivered": delivered,
+        "failed": count - delivered,
+        "seconds": round(elapsed, 3),
+        "calls_per_second": round(count / elapsed, 1),
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test emergency call dispatch against a local fake transport")
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    print(load_test(args.calls, args.latency, args.failure_rate))
@@ -0,0 +1,278 @@
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+import os
+import alert_dispatcher
+
+# Outgoing notifications are written here first and delivered by a worker
+DATA_DIR = "data"
+OUTBOX_DB_FILE = os.path.join(DATA_DIR, "alert_outbox.db")
+
+# Give up on an entry after this many delivery attempts
+MAX_ATTEMPTS = int(os.getenv("ALERT_OUTBOX_MAX_ATTEMPTS", 5))
+BATCH_SIZE = int(os.getenv("ALERT_OUTBOX_BATCH_SIZE", 50))
+POLL_INTERVAL = float(os.getenv("ALERT_OUTBOX_POLL_SECONDS", 5))
+RETRY_DELAY = timedelta(seconds=30)
+
+# A 'sending' entry whose claim is older than this belongs to a worker that
+# died mid-batch; it must stay well above the time a batch takes to dispatch
+# (up to alert_dispatcher.CALL_TIMEOUT per call)
+CLAIM_TIMEOUT = timedelta(seconds=float(os.getenv("ALERT_OUTBOX_CLAIM_TIMEOUT", 300)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    username TEXT NOT NULL,
+    contact TEXT NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    sid TEXT,
+    next_attempt_at TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    dedupe_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, next_attempt_at);
+"""
+
+# Applied after SCHEMA, once outboxes created before the column existed have it
+DEDUPE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_dedupe ON outbox (dedupe_key)"
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def initialize_outbox():
+    """
+    Initialize the outbox database if it doesn't exist
+    """
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        if not os.path.exists(DATA_DIR):
+            os.makedirs(DATA_DIR)
+        with closing(sqlite3.connect(OUTBOX_DB_FILE, timeout=10)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(outbox)")]
+            if 'dedupe_key' not in columns:
+                conn.execute("ALTER TABLE outbox ADD COLUMN dedupe_key TEXT")
+            conn.execute(DEDUPE_INDEX)
+        _schema_ready = True
+
+def _connect():
+    initialize_outbox()
+    conn = sqlite3.connect(OUTBOX_DB_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def enqueue_alert(kind, username, contacts, message, dedupe_key=None):
+    """
+    Durably queue a notification to one or more contacts
+
+    Args:
+        kind (str): "emergency" or "reminder"
+        username (str): User the notification is about
+        contacts (list): Contact dicts with at least "name" and "phone"
+        message (str): Message to deliver
+        dedupe_key (str): Identifies the event being notified, e.g. one
+            dose; a contact already queued for it is skipped
+
+    Returns:
+        list: Outbox entry IDs of the contacts queued
+    """
+    now = _now()
+    ids = []
+    with closing(_connect()) as conn, conn:
+        for contact in contacts:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO outbox "
+                "(kind, username, contact, message, next_attempt_at, created_at, updated_at, dedupe_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind, username, json.dumps(contact), message, now, now, now,
+                    f"{dedupe_key}:{contact['phone']}" if dedupe_key else None
+                )
+            )
+            if cursor.rowcount:
+                ids.append(cursor.lastrowid)
+    if _worker is not None:
+        _worker.kick()
+    return ids
+
+def recover_in_flight(claim_timeout=CLAIM_TIMEOUT):
+    """
+    Return entries left in 'sending' by a crashed worker to the queue
+
+    Several processes share the outbox, so only claims older than the
+    claim timeout are requeued; younger ones may still be in progress in
+    another worker. updated_at holds the claim time while an entry is
+    'sending'. Delivery is at-least-once: a call that went out just before
+    the crash may be placed again.
+
+    Args:
+        claim_timeout (timedelta): Age after which a claim counts as abandoned
+
+    Returns:
+        int: Number of entries requeued
+    """
+    stale_before = (datetime.now() - claim_timeout).strftime("%Y-%m-%d %H:%M:%S")
+    with closing(_connect()) as conn, conn:
+        cursor = conn.execute(
+            "UPDATE outbox SET status = 'pending', updated_at = ? WHERE status = 'sending' AND updated_at < ?",
+            (_now(), stale_before)
+        )
+        return cursor.rowcount
+
+def _claim_batch(batch_size):
+    """
+    Atomically move up to batch_size due entries from 'pending' to 'sending'
+    """
+    now = _now()
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, contact, message, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = 'sending', updated_at = ? WHERE id = ?",
+                [(now, row['id']) for row in rows]
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return [dict(row) for row in rows]
+
+def drain_once(batch_size=BATCH_SIZE, transport=None):
+    """
+    Deliver one batch of due entries and record the outcome of each
+
+    Args:
+        batch_size (int): Maximum number of entries to deliver
+        transport (object): Call transport, defaults to the configured one
+
+    Returns:
+        int: Number of entries processed
+    """
+    entries = _claim_batch(batch_size)
+    if not entries:
+        return 0
+
+    # Entries sharing a message go out as one concurrent dispatch
+    by_message = {}
+    for entry in entries:
+        by_message.setdefault(entry['message'], []).append(entry)
+
+    updates = []
+    for message, group in by_message.items():
+        contacts = [json.loads(entry['contact']) for entry in group]
+        results = alert_dispatcher.dispatch_calls(contacts, message, transport=transport, retries=0)
+        for entry, result in zip(group, results):
+            attempts = entry['attempts'] + 1
+            if result.ok:
+                status, next_attempt = 'delivered', None
+            elif attempts >= MAX_ATTEMPTS:
+                status, next_attempt = 'failed', None
+            else:
+                status = 'pending'
+                next_attempt = (datetime.now() + RETRY_DELAY * attempts).strftime("%Y-%m-%d %H:%M:%S")
+            updates.append((status, attempts, result.error, result.sid, next_attempt, _now(), entry['id']))
+
+    with closing(_connect()) as conn, conn:
+        conn.executemany(
+            "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, sid = ?, "
+            "next_attempt_at = COALESCE(?, next_attempt_at), updated_at = ? WHERE id = ?",
+            updates
+        )
+    return len(entries)
+
+def get_entries(status=None, limit=100):
+    """
+    List outbox entries, newest first
+
+    Args:
+        status (str): Only return entries with this status
+        limit (int): Maximum number of entries
+
+    Returns:
+        list: Outbox entries
+    """
+    with closing(_connect()) as conn:
+        if status:
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM outbox ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+class OutboxWorker:
+    """
+    Background thread that drains the outbox in batches
+
+    It wakes when an entry is enqueued in this process, and otherwise polls
+    for entries written by other processes or due for a retry.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL, transport=None):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.transport = transport
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def kick(self):
+        self._wake.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                # Also picks up claims abandoned by a worker that died while this one runs
+                recover_in_flight()
+                # Keep draining while full batches come back
+                while drain_once(self.batch_size, self.transport) == self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Error draining alert outbox: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="alert-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_worker():
+    """
+    Get the process-wide outbox worker, starting it on first use
+
+    Returns:
+        OutboxWorker: The running worker
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = OutboxWorker()
+            _worker.start()
+        return _worker
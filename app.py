@@ -2,9 +2,14 @@ import streamlit as st # type: ignore
 import auth
 import medication
 import database
+import adherence
+import reminder_scheduler
+import alert_outbox
+import nlp_processor
+from speech_to_text import model_registry
 import utils
+import os
 from datetime import datetime
-import twilio_alert
 
 # Initialize session state variables if they don't exist
 def initialize_session_state():
@@ -48,15 +53,17 @@ def render_main_content():
         show_help()
 
 # Display medications for a specific time of day
-def display_medications_by_time(meds, time_label, icon):
+def display_medications_by_time(meds, time_label, icon, taken_slots):
     if meds:
+        slot = time_label.lower()
         with st.expander(f"{icon} {time_label} Medications", expanded=True):
             for med in meds:
-                med_status = "✅ Taken" if med.get("taken", False) else "⏳ Pending"
+                taken = (med['id'], slot) in taken_slots
+                med_status = "✅ Taken" if taken else "⏳ Pending"
                 st.info(f"**{med['medicine_name']}** - {med['dosage']} - {med_status}")
-                if not med.get("taken", False):
-                    if st.button(f"Mark as taken: {med['medicine_name']}", key=f"take_{med['id']}"):
-                        medication.mark_medication_taken(med['id'])
+                if not taken:
+                    if st.button(f"Mark as taken: {med['medicine_name']}", key=f"take_{med['id']}_{slot}"):
+                        medication.mark_medication_taken(med['id'], st.session_state.username, slot)
                         st.rerun()
 
 # Dashboard page
@@ -67,17 +74,19 @@ def show_dashboard():
     todays_meds = medication.get_todays_medications(st.session_state.username)
     if todays_meds:
         st.write("### Today's Medications")
+        taken_slots = adherence.get_taken_slots(st.session_state.username, datetime.now().date())
+        dose_slots = medication.get_dose_slots(todays_meds, datetime.now().date())
         display_medications_by_time(
-            [med for med in todays_meds if "morning" in med["timing"].lower()], "Morning", "🌅"
+            [med for med in todays_meds if "morning" in dose_slots[med["id"]]], "Morning", "🌅", taken_slots
         )
         display_medications_by_time(
-            [med for med in todays_meds if "afternoon" in med["timing"].lower()], "Afternoon", "☀️"
+            [med for med in todays_meds if "afternoon" in dose_slots[med["id"]]], "Afternoon", "☀️", taken_slots
         )
         display_medications_by_time(
-            [med for med in todays_meds if "evening" in med["timing"].lower()], "Evening", "🌇"
+            [med for med in todays_meds if "evening" in dose_slots[med["id"]]], "Evening", "🌇", taken_slots
         )
         display_medications_by_time(
-            [med for med in todays_meds if "night" in med["timing"].lower()], "Night", "🌙"
+            [med for med in todays_meds if "night" in dose_slots[med["id"]]], "Night", "🌙", taken_slots
         )
     else:
         st.info("No medications scheduled for today.")
@@ -88,11 +97,13 @@ def show_dashboard():
     if st.button("🚨 Trigger Emergency Call to Contacts", use_container_width=True):
         contacts = database.get_emergency_contacts(st.session_state.username)
         if contacts:
-            twilio_alert.call_emergency_contacts(
+            alert_outbox.enqueue_alert(
+                'emergency',
+                st.session_state.username,
                 contacts,
-                message=f"This is an emergency notification for {st.session_state.username}. Please check on them immediately."
+                f"This is an emergency notification for {st.session_state.username}. Please check on them immediately."
             )
-            st.success("Emergency calls initiated.")
+            st.success("Emergency calls queued.")
         else:
             st.error("No emergency contacts found.")
 
@@ -252,6 +263,15 @@ def main():
     )
     initialize_session_state()
     database.initialize_database()
+    adherence.initialize_adherence_store()
+    reminder_scheduler.get_scheduler()
+    alert_outbox.get_worker()
+    # Optionally load the NLP models now instead of on the first extraction
+    if os.getenv("NLP_WARM_UP", "0") == "1":
+        nlp_processor.warm_up(background=True)
+    # Optionally load the speech recognition model now instead of on the first voice input
+    if os.getenv("ASR_WARM_UP", "0") == "1":
+        model_registry.warm_up(background=True)
     st.title("Medical Schedule Management System")
     st.subheader("Your voice-enabled medication assistant")
     if not st.session_state.logged_in:
@@ -3,12 +3,17 @@ import json
 from datetime import datetime, timedelta
 import uuid
 import os
+import dose_schedule
 
 # File to store data (in a real app, use a proper database)
 DATA_DIR = "data"
 USER_FILE = os.path.join(DATA_DIR, "users.json")
 MEDICATION_FILE = os.path.join(DATA_DIR, "medications.json")
 
+# Storage engine: "json" (the files above), "sqlite" (see database_sqlite.py)
+# or "journal" (medication writes appended to a log, see database_journal.py)
+STORAGE_BACKEND = os.getenv("MEDSCHEDULE_STORAGE", "json")
+
 def initialize_database():
     """
     Initialize database files if they don't exist
@@ -252,27 +257,41 @@ def add_medication(username, medication_data):
     Returns:
         bool: True if medication was added successfully, False otherwise
     """
+    return add_medications(username, [medication_data])
+
+def add_medications(username, medications_data):
+    """
+    Add several medications for a user in one write
+    
+    Args:
+        username (str): Username
+        medications_data (list): Medication information dictionaries
+        
+    Returns:
+        bool: True if all medications were added successfully, False otherwise
+    """
     try:
         with open(MEDICATION_FILE, 'r') as f:
             medications = json.load(f)
-        print("HIIII")
-        # Create n  ew medication entry
-        new_medication = {
-            'id': str(uuid.uuid4()),
-            'username': username,
-            'medicine_name': medication_data['medicine_name'],
-            'dosage': medication_data['dosage'],
-            'frequency': medication_data['frequency'],
-            'timing': medication_data['timing'],
-            'duration': medication_data['duration'],
-            'instructions': medication_data['instructions'],
-            'start_date': medication_data['start_date'],
-            'end_date': medication_data['end_date'],
-            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
         
-        medications.append(new_medication)
+        # Create the new medication entries
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for medication_data in medications_data:
+            medications.append({
+                'id': str(uuid.uuid4()),
+                'username': username,
+                'medicine_name': medication_data['medicine_name'],
+                'dosage': medication_data['dosage'],
+                'frequency': medication_data['frequency'],
+                'timing': medication_data['timing'],
+                'duration': medication_data['duration'],
+                'instructions': medication_data['instructions'],
+                'start_date': medication_data['start_date'],
+                'end_date': medication_data['end_date'],
+                'schedule': dose_schedule.parse_recurrence(medication_data['frequency'], medication_data['timing']),
+                'created_at': now,
+                'updated_at': now
+            })
         
         with open(MEDICATION_FILE, 'w') as f:
             json.dump(medications, f, indent=2)
@@ -300,6 +319,40 @@ def get_medications(username):
         st.error(f"Error getting medications: {str(e)}")
         return []
 
+def iter_all_medications():
+    """
+    Iterate over the medications of every user, reading the store once
+    
+    Yields:
+        dict: Medication information
+    """
+    try:
+        with open(MEDICATION_FILE, 'r') as f:
+            medications = json.load(f)
+    except Exception as e:
+        print(f"Error reading medications: {str(e)}")
+        return
+    yield from medications
+
+def medications_version():
+    """
+    Get a value that changes whenever the stored medications change
+
+    Long-running processes poll this to notice writes made by other processes.
+
+    Returns:
+        tuple: Modification time and size of each file backing the medications
+    """
+    versions = []
+    for path in (MEDICATION_FILE,):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            versions.append(None)
+            continue
+        versions.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(versions)
+
 def delete_medication(medication_id):
     """
     Delete a medication
@@ -353,3 +406,17 @@ def mark_medication_taken(medication_id):
     except Exception as e:
         st.error(f"Error marking medication as taken: {str(e)}")
         return False
+
+# Swap in the configured storage engine; callers keep using database.<function>
+if STORAGE_BACKEND == "sqlite":
+    from database_sqlite import ( # noqa: E402,F811
+        initialize_database, user_exists, verify_credentials, create_user,
+        get_user_profile, update_user_profile, add_emergency_contact,
+        get_emergency_contacts, add_medication, add_medications, get_medications,
+        iter_all_medications, medications_version, delete_medication, mark_medication_taken
+    )
+elif STORAGE_BACKEND == "journal":
+    from database_journal import ( # noqa: E402,F811
+        initialize_database, add_medication, add_medications, get_medications,
+        iter_all_medications, medications_version, delete_medication, mark_medication_taken
+    )
@@ -0,0 +1,347 @@
+import streamlit as st # type: ignore
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import uuid
+import os
+import dose_schedule
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows; writes are then only serialized within one process
+    fcntl = None
+
+# Journaled medication store: medications.json is the snapshot, and every
+# mutation is appended to medications.journal until compaction folds it in
+DATA_DIR = "data"
+USER_FILE = os.path.join(DATA_DIR, "users.json")
+SNAPSHOT_FILE = os.path.join(DATA_DIR, "medications.json")
+JOURNAL_FILE = os.path.join(DATA_DIR, "medications.journal")
+LOCK_FILE = os.path.join(DATA_DIR, "medications.journal.lock")
+
+# Compact once the journal grows past this many bytes
+COMPACT_THRESHOLD_BYTES = int(os.getenv("MEDSCHEDULE_JOURNAL_COMPACT_BYTES", 256 * 1024))
+
+_lock = threading.RLock()
+_compacting = threading.Event()
+_state = {"snapshot_mtime": None, "journal_offset": 0, "medications": {}}
+
+@contextmanager
+def _write_lock():
+    """
+    Serialize appends and compaction across threads and, where flock is
+    available, across processes sharing the data directory (the app, the
+    reminder scheduler daemon and the NLP service)
+    """
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        with open(LOCK_FILE, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def initialize_database():
+    """
+    Initialize the snapshot, journal and users files if they don't exist
+    """
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+
+    for path in (USER_FILE, SNAPSHOT_FILE):
+        if not os.path.exists(path):
+            with open(path, 'w') as f:
+                json.dump([], f)
+
+    if not os.path.exists(JOURNAL_FILE):
+        open(JOURNAL_FILE, 'a').close()
+
+def _apply(medications, entry):
+    """
+    Apply one journal entry to the in-memory medication map
+
+    Entries are idempotent, so replaying a journal that was already folded
+    into the snapshot (a crash between the two compaction steps) is harmless.
+
+    Args:
+        medications (dict): Medications keyed by id, in insertion order
+        entry (dict): Journal entry
+    """
+    op = entry.get('op')
+    if op == 'add':
+        med = entry['medication']
+        medications[med['id']] = med
+    elif op == 'add_many':
+        for med in entry['medications']:
+            medications[med['id']] = med
+    elif op == 'delete':
+        medications.pop(entry['id'], None)
+    elif op == 'taken':
+        med = medications.get(entry['id'])
+        if med is not None:
+            med['taken'] = True
+            med['taken_at'] = entry['taken_at']
+
+def _replay(medications, offset):
+    """
+    Replay journal entries written after the given byte offset
+
+    A trailing line without a newline is an append that is still in flight
+    (or was torn by a crash) and is left for the next read. A complete line
+    that does not parse is what a torn append becomes once the next append
+    starts a new line after it; it is skipped.
+
+    Args:
+        medications (dict): Medications keyed by id, updated in place
+        offset (int): Byte offset to start reading from
+
+    Returns:
+        int: Offset just past the last complete entry
+    """
+    with open(JOURNAL_FILE, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print(f"Skipping unreadable journal entry at byte {offset - len(line)}")
+                continue
+            _apply(medications, entry)
+    return offset
+
+def _load_state():
+    """
+    Bring the cached medication map up to date with the snapshot and journal
+
+    Only journal bytes appended since the previous call are parsed; the
+    snapshot is re-read when compaction (or another process) replaced it.
+
+    Returns:
+        dict: Medications keyed by id
+    """
+    with _lock:
+        snapshot_mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+        journal_size = os.path.getsize(JOURNAL_FILE)
+
+        if snapshot_mtime != _state["snapshot_mtime"] or journal_size < _state["journal_offset"]:
+            with open(SNAPSHOT_FILE, 'r') as f:
+                medications = {med['id']: med for med in json.load(f)}
+            _state["snapshot_mtime"] = snapshot_mtime
+            _state["journal_offset"] = 0
+            _state["medications"] = medications
+
+        if journal_size > _state["journal_offset"]:
+            _state["journal_offset"] = _replay(_state["medications"], _state["journal_offset"])
+
+        return _state["medications"]
+
+def _append(entry):
+    """
+    Durably append one entry to the journal and schedule compaction if needed
+
+    Args:
+        entry (dict): Journal entry
+    """
+    line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+    with _write_lock():
+        with open(JOURNAL_FILE, 'a+b') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # A crash tore the last append; end its line so this entry is not merged into it
+                    line = b'\n' + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        journal_size = os.path.getsize(JOURNAL_FILE)
+
+    if journal_size >= COMPACT_THRESHOLD_BYTES and not _compacting.is_set():
+        _compacting.set()
+        threading.Thread(target=_compact_in_background, daemon=True).start()
+
+def _compact_in_background():
+    try:
+        compact()
+    except Exception as e:
+        print(f"Journal compaction failed: {e}")
+    finally:
+        _compacting.clear()
+
+def compact():
+    """
+    Fold the journal into a new snapshot and truncate the journal
+
+    The snapshot is written to a temporary file and atomically renamed over
+    medications.json before the journal is emptied.
+    """
+    with _write_lock():
+        medications = _load_state()
+
+        tmp_file = SNAPSHOT_FILE + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(list(medications.values()), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, SNAPSHOT_FILE)
+
+        with open(JOURNAL_FILE, 'w') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+        _state["snapshot_mtime"] = os.stat(SNAPSHOT_FILE).st_mtime_ns
+        _state["journal_offset"] = 0
+
+def add_medication(username, medication_data):
+    """
+    Add medication for a user
+
+    Args:
+        username (str): Username
+        medication_data (dict): Medication information
+
+    Returns:
+        bool: True if medication was added successfully, False otherwise
+    """
+    return add_medications(username, [medication_data])
+
+def add_medications(username, medications_data):
+    """
+    Add several medications for a user as a single journal entry
+
+    The entry is one line with one fsync, so either every medication is
+    added or, after a crash mid-append, none is.
+
+    Args:
+        username (str): Username
+        medications_data (list): Medication information dictionaries
+
+    Returns:
+        bool: True if all medications were added successfully, False otherwise
+    """
+    try:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        new_medications = [
+            {
+                'id': str(uuid.uuid4()),
+                'username': username,
+                'medicine_name': medication_data['medicine_name'],
+                'dosage': medication_data['dosage'],
+                'frequency': medication_data['frequency'],
+                'timing': medication_data['timing'],
+                'duration': medication_data['duration'],
+                'instructions': medication_data['instructions'],
+                'start_date': medication_data['start_date'],
+                'end_date': medication_data['end_date'],
+                'schedule': dose_schedule.parse_recurrence(medication_data['frequency'], medication_data['timing']),
+                'created_at': now,
+                'updated_at': now
+            }
+            for medication_data in medications_data
+        ]
+
+        _append({'op': 'add_many', 'medications': new_medications})
+        return True
+    except Exception as e:
+        st.error(f"Error adding medication: {str(e)}")
+        return False
+
+def get_medications(username):
+    """
+    Get all medications for a user
+
+    Args:
+        username (str): Username
+
+    Returns:
+        list: List of medications
+    """
+    try:
+        medications = _load_state()
+        return [dict(med) for med in medications.values() if med['username'] == username]
+    except Exception as e:
+        st.error(f"Error getting medications: {str(e)}")
+        return []
+
+def iter_all_medications():
+    """
+    Iterate over the medications of every user from the replayed state
+
+    Yields:
+        dict: Medication information
+    """
+    try:
+        medications = list(_load_state().values())
+    except Exception as e:
+        print(f"Error reading medications: {str(e)}")
+        return
+    for med in medications:
+        yield dict(med)
+
+def medications_version():
+    """
+    Get a value that changes whenever a mutation is journaled or compacted
+
+    Returns:
+        tuple: Modification time and size of the snapshot and the journal
+    """
+    versions = []
+    for path in (SNAPSHOT_FILE, JOURNAL_FILE):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            versions.append(None)
+            continue
+        versions.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(versions)
+
+def delete_medication(medication_id):
+    """
+    Delete a medication
+
+    Args:
+        medication_id (str): Medication ID
+
+    Returns:
+        bool: True if medication was deleted successfully, False otherwise
+    """
+    try:
+        _append({'op': 'delete', 'id': medication_id})
+        return True
+    except Exception as e:
+        st.error(f"Error deleting medication: {str(e)}")
+        return False
+
+def mark_medication_taken(medication_id):
+    """
+    Mark a medication as taken
+
+    Args:
+        medication_id (str): Medication ID
+
+    Returns:
+        bool: True if medication was marked as taken successfully, False otherwise
+    """
+    try:
+        if medication_id not in _load_state():
+            return False
+
+        _append({
+            'op': 'taken',
+            'id': medication_id,
+            'taken_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        return True
+    except Exception as e:
+        st.error(f"Error marking medication as taken: {str(e)}")
+        return False
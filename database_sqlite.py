@@ -0,0 +1,509 @@
+import streamlit as st # type: ignore
+import sqlite3
+import json
+from contextlib import closing
+from datetime import datetime
+import uuid
+import os
+import dose_schedule
+
+# SQLite storage engine exposing the same functions as database.py
+DATA_DIR = "data"
+DB_FILE = os.path.join(DATA_DIR, "medschedule.db")
+USER_FILE = os.path.join(DATA_DIR, "users.json")
+MEDICATION_FILE = os.path.join(DATA_DIR, "medications.json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    name TEXT,
+    age INTEGER,
+    phone TEXT,
+    email TEXT,
+    blood_type TEXT,
+    allergies TEXT
+);
+CREATE TABLE IF NOT EXISTS emergency_contacts (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    name TEXT,
+    relationship TEXT,
+    phone TEXT,
+    email TEXT,
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_username ON emergency_contacts (username);
+CREATE TABLE IF NOT EXISTS medications (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    medicine_name TEXT,
+    dosage TEXT,
+    frequency TEXT,
+    timing TEXT,
+    duration TEXT,
+    instructions TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    taken INTEGER,
+    taken_at TEXT,
+    schedule TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_medications_username ON medications (username);
+"""
+
+MEDICATION_COLUMNS = [
+    'id', 'username', 'medicine_name', 'dosage', 'frequency', 'timing',
+    'duration', 'instructions', 'start_date', 'end_date', 'created_at',
+    'updated_at', 'taken', 'taken_at', 'schedule'
+]
+
+def _connect():
+    """
+    Open a connection to the SQLite database
+
+    Returns:
+        sqlite3.Connection: Connection with rows returned as sqlite3.Row
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _medication_from_row(row):
+    """
+    Convert a medications row into the dict shape used by the JSON store
+
+    Args:
+        row (sqlite3.Row): Row from the medications table
+
+    Returns:
+        dict: Medication information
+    """
+    med = {column: row[column] for column in MEDICATION_COLUMNS[:12]}
+    if row['schedule']:
+        med['schedule'] = json.loads(row['schedule'])
+    if row['taken'] is not None:
+        med['taken'] = bool(row['taken'])
+        med['taken_at'] = row['taken_at']
+    return med
+
+def initialize_database():
+    """
+    Initialize the SQLite schema if it doesn't exist
+    """
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+
+    with closing(_connect()) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+        # Databases created before recurrence rules were stored
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(medications)")}
+        if 'schedule' not in columns:
+            conn.execute("ALTER TABLE medications ADD COLUMN schedule TEXT")
+
+def user_exists(username):
+    """
+    Check if a user exists
+
+    Args:
+        username (str): Username to check
+
+    Returns:
+        bool: True if user exists, False otherwise
+    """
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone()
+            return row is not None
+    except Exception as e:
+        st.error(f"Error checking if user exists: {str(e)}")
+        return False
+
+def verify_credentials(username, password_hash):
+    """
+    Verify user credentials
+
+    Args:
+        username (str): Username
+        password_hash (str): Hashed password
+
+    Returns:
+        bool: True if credentials are valid, False otherwise
+    """
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM users WHERE username = ? AND password = ?",
+                (username, password_hash)
+            ).fetchone()
+            return row is not None
+    except Exception as e:
+        st.error(f"Error verifying credentials: {str(e)}")
+        return False
+
+def create_user(username, password_hash, name, age, phone, email, blood_type, allergies):
+    """
+    Create a new user
+
+    Args:
+        username (str): Username
+        password_hash (str): Hashed password
+        name (str): Full name
+        age (int): Age
+        phone (str): Phone number
+        email (str): Email address
+        blood_type (str): Blood type
+        allergies (str): Allergies
+
+    Returns:
+        bool: True if user was created successfully, False otherwise
+    """
+    try:
+        with closing(_connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (username, password, name, age, phone, email, blood_type, allergies) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (username, password_hash, name, age, phone, email, blood_type, allergies)
+            )
+            # rowcount is 0 when the username already exists
+            return cursor.rowcount == 1
+    except Exception as e:
+        st.error(f"Error creating user: {str(e)}")
+        return False
+
+def get_user_profile(username):
+    """
+    Get user profile information
+
+    Args:
+        username (str): Username
+
+    Returns:
+        dict: User profile information
+    """
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                "SELECT username, name, age, phone, email, blood_type, allergies FROM users WHERE username = ?",
+                (username,)
+            ).fetchone()
+            if row is None:
+                return None
+            user = dict(row)
+            user['emergency_contacts'] = _get_contacts(conn, username)
+            return user
+    except Exception as e:
+        st.error(f"Error getting user profile: {str(e)}")
+        return None
+
+def update_user_profile(username, name, age, phone, email, blood_type, allergies):
+    """
+    Update user profile
+
+    Args:
+        username (str): Username
+        name (str): Full name
+        age (int): Age
+        phone (str): Phone number
+        email (str): Email address
+        blood_type (str): Blood type
+        allergies (str): Allergies
+
+    Returns:
+        bool: True if profile was updated successfully, False otherwise
+    """
+    try:
+        with closing(_connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE users SET name = ?, age = ?, phone = ?, email = ?, blood_type = ?, allergies = ? "
+                "WHERE username = ?",
+                (name, age, phone, email, blood_type, allergies, username)
+            )
+            return cursor.rowcount == 1
+    except Exception as e:
+        st.error(f"Error updating user profile: {str(e)}")
+        return False
+
+def add_emergency_contact(username, name, relationship, phone, email):
+    """
+    Add emergency contact for a user
+
+    Args:
+        username (str): Username
+        name (str): Contact name
+        relationship (str): Relationship to user
+        phone (str): Contact phone
+        email (str): Contact email
+
+    Returns:
+        bool: True if contact was added successfully, False otherwise
+    """
+    try:
+        with closing(_connect()) as conn, conn:
+            if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is None:
+                return False
+            position = conn.execute(
+                "SELECT COUNT(*) FROM emergency_contacts WHERE username = ?", (username,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO emergency_contacts (id, username, name, relationship, phone, email, position) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(uuid.uuid4()), username, name, relationship, phone, email, position)
+            )
+            return True
+    except Exception as e:
+        st.error(f"Error adding emergency contact: {str(e)}")
+        return False
+
+def _get_contacts(conn, username):
+    """
+    Read emergency contacts for a user in insertion order
+
+    Args:
+        conn (sqlite3.Connection): Open connection
+        username (str): Username
+
+    Returns:
+        list: List of emergency contacts
+    """
+    rows = conn.execute(
+        "SELECT id, name, relationship, phone, email FROM emergency_contacts "
+        "WHERE username = ? ORDER BY position",
+        (username,)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+def get_emergency_contacts(username):
+    """
+    Get emergency contacts for a user
+
+    Args:
+        username (str): Username
+
+    Returns:
+        list: List of emergency contacts
+    """
+    try:
+        with closing(_connect()) as conn:
+            return _get_contacts(conn, username)
+    except Exception as e:
+        st.error(f"Error getting emergency contacts: {str(e)}")
+        return []
+
+def add_medication(username, medication_data):
+    """
+    Add medication for a user
+
+    Args:
+        username (str): Username
+        medication_data (dict): Medication information
+
+    Returns:
+        bool: True if medication was added successfully, False otherwise
+    """
+    return add_medications(username, [medication_data])
+
+def add_medications(username, medications_data):
+    """
+    Add several medications for a user in one transaction
+
+    Args:
+        username (str): Username
+        medications_data (list): Medication information dictionaries
+
+    Returns:
+        bool: True if all medications were added successfully, False otherwise
+    """
+    try:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with closing(_connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO medications (id, username, medicine_name, dosage, frequency, timing, duration, "
+                "instructions, start_date, end_date, created_at, updated_at, schedule) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        str(uuid.uuid4()),
+                        username,
+                        medication_data['medicine_name'],
+                        medication_data['dosage'],
+                        medication_data['frequency'],
+                        medication_data['timing'],
+                        medication_data['duration'],
+                        medication_data['instructions'],
+                        medication_data['start_date'],
+                        medication_data['end_date'],
+                        now,
+                        now,
+                        json.dumps(dose_schedule.parse_recurrence(
+                            medication_data['frequency'], medication_data['timing']
+                        ))
+                    )
+                    for medication_data in medications_data
+                ]
+            )
+        return True
+    except Exception as e:
+        st.error(f"Error adding medication: {str(e)}")
+        return False
+
+def get_medications(username):
+    """
+    Get all medications for a user
+
+    Args:
+        username (str): Username
+
+    Returns:
+        list: List of medications
+    """
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM medications WHERE username = ? ORDER BY rowid", (username,)
+            ).fetchall()
+            return [_medication_from_row(row) for row in rows]
+    except Exception as e:
+        st.error(f"Error getting medications: {str(e)}")
+        return []
+
+def iter_all_medications():
+    """
+    Iterate over the medications of every user, grouped by username
+
+    Yields:
+        dict: Medication information
+    """
+    try:
+        with closing(_connect()) as conn:
+            for row in conn.execute("SELECT * FROM medications ORDER BY username, rowid"):
+                yield _medication_from_row(row)
+    except Exception as e:
+        print(f"Error reading medications: {str(e)}")
+
+def medications_version():
+    """
+    Get a value that changes whenever the database is written
+
+    Writes land in the WAL file until a checkpoint, so both files count.
+
+    Returns:
+        tuple: Modification time and size of the database and its WAL file
+    """
+    versions = []
+    for path in (DB_FILE, DB_FILE + "-wal"):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            versions.append(None)
+            continue
+        versions.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(versions)
+
+def delete_medication(medication_id):
+    """
+    Delete a medication
+
+    Args:
+        medication_id (str): Medication ID
+
+    Returns:
+        bool: True if medication was deleted successfully, False otherwise
+    """
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute("DELETE FROM medications WHERE id = ?", (medication_id,))
+        return True
+    except Exception as e:
+        st.error(f"Error deleting medication: {str(e)}")
+        return False
+
+def mark_medication_taken(medication_id):
+    """
+    Mark a medication as taken
+
+    Args:
+        medication_id (str): Medication ID
+
+    Returns:
+        bool: True if medication was marked as taken successfully, False otherwise
+    """
+    try:
+        with closing(_connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE medications SET taken = 1, taken_at = ? WHERE id = ?",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), medication_id)
+            )
+            return cursor.rowcount == 1
+    except Exception as e:
+        st.error(f"Error marking medication as taken: {str(e)}")
+        return False
+
+def migrate_from_json(user_file=USER_FILE, medication_file=MEDICATION_FILE):
+    """
+    Copy users, emergency contacts and medications from the JSON files into SQLite
+
+    Existing rows with the same username or id are replaced, so the migration
+    can be re-run safely.
+
+    Args:
+        user_file (str): Path to users.json
+        medication_file (str): Path to medications.json
+
+    Returns:
+        tuple: Number of users and medications migrated
+    """
+    initialize_database()
+
+    users = []
+    if os.path.exists(user_file):
+        with open(user_file, 'r') as f:
+            users = json.load(f)
+
+    medications = []
+    if os.path.exists(medication_file):
+        with open(medication_file, 'r') as f:
+            medications = json.load(f)
+
+    with closing(_connect()) as conn, conn:
+        for user in users:
+            conn.execute(
+                "INSERT OR REPLACE INTO users (username, password, name, age, phone, email, blood_type, allergies) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    user['username'], user['password'], user.get('name'), user.get('age'),
+                    user.get('phone'), user.get('email'), user.get('blood_type'), user.get('allergies')
+                )
+            )
+            conn.execute("DELETE FROM emergency_contacts WHERE username = ?", (user['username'],))
+            for position, contact in enumerate(user.get('emergency_contacts', [])):
+                conn.execute(
+                    "INSERT OR REPLACE INTO emergency_contacts (id, username, name, relationship, phone, email, position) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        contact.get('id') or str(uuid.uuid4()), user['username'], contact.get('name'),
+                        contact.get('relationship'), contact.get('phone'), contact.get('email'), position
+                    )
+                )
+
+        for med in medications:
+            taken = med.get('taken')
+            conn.execute(
+                "INSERT OR REPLACE INTO medications (" + ", ".join(MEDICATION_COLUMNS) + ") "
+                "VALUES (" + ", ".join("?" * len(MEDICATION_COLUMNS)) + ")",
+                tuple(med.get(column, '') for column in MEDICATION_COLUMNS[:12]) + (
+                    None if taken is None else int(bool(taken)),
+                    med.get('taken_at'),
+                    json.dumps(dose_schedule.get_rule(med))
+                )
+            )
+
+    return len(users), len(medications)
+
+if __name__ == "__main__":
+    user_count, medication_count = migrate_from_json()
+    print(f"Migrated {user_count} users and {medication_count} medications to {DB_FILE}")
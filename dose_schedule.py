@@ -0,0 +1,345 @@
+import re
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+import json
+import utils
+
+# Reminder time for a single daily dose, by period of the day
+PERIOD_TIMES = {
+    'morning': '08:00',
+    'afternoon': '12:00',
+    'evening': '18:00',
+    'night': '20:00',
+    None: '09:00',
+}
+
+# Meal-related timing overrides the period
+EVENT_TIMES = {
+    'breakfast': '07:30',
+    'lunch': '12:30',
+    'dinner': '18:30',
+}
+
+# After this time a single daily dose counts as missed, by period of the day
+PERIOD_CUTOFFS = {
+    'morning': '11:00',
+    'afternoon': '15:00',
+    'evening': '21:00',
+    'night': '23:59',
+    None: '22:00',
+}
+
+# Default spread for several doses a day
+DAILY_TIMES = {
+    2: ['08:00', '20:00'],
+    3: ['08:00', '14:00', '20:00'],
+    4: ['08:00', '12:00', '16:00', '20:00'],
+}
+
+MEAL_TIMES = ['07:30', '12:30', '18:30']
+
+# A dose in a multi-dose schedule is missed this long after it is due
+MISSED_AFTER = timedelta(hours=3)
+
+COUNT_WORDS = {
+    'once': 1, 'one time': 1, 'twice': 2, 'two times': 2, 'thrice': 3,
+    'three times': 3, 'four times': 4, 'five times': 5, 'six times': 6,
+}
+
+COUNT_PATTERN = re.compile(r'\b(' + '|'.join(COUNT_WORDS) + r'|\d+\s+times)\b')
+HOURS_PATTERN = re.compile(r'\bevery\s+(\d+)\s*(?:hours?|hrs?)\b')
+EVERY_PATTERN = re.compile(r'\bevery\s+(other|\d+)\s*(days?|weeks?|months?)\b')
+PER_DAY_PATTERN = re.compile(r'\b(?:a|per|each|every)\s+day\b|\bdaily\b')
+
+# Length in days of the units "every N ..." can count in
+UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30}
+
+# Periods of the day in order; "bedtime" counts as night, as in utils.parse_medication_time
+PERIODS = ['morning', 'afternoon', 'evening', 'night']
+
+# Bump when parsing changes, so rules stored on medications are parsed again
+RULE_VERSION = 2
+
+# One concrete dose: when it is due, when it counts as missed, and its day slot
+Occurrence = namedtuple("Occurrence", ["medication_id", "due", "cutoff", "slot"])
+
+def _shift(clock, delta):
+    """
+    Shift an "HH:MM" time by a timedelta, wrapping around midnight
+    """
+    moment = datetime.combine(date.min, time.fromisoformat(clock)) + delta
+    return moment.strftime("%H:%M")
+
+def slot_for_time(clock):
+    """
+    Map an "HH:MM" time to the calendar slot it belongs to
+
+    Args:
+        clock (str): Time of day
+
+    Returns:
+        str: "morning", "afternoon", "evening" or "night"
+    """
+    hour = int(clock[:2])
+    if 4 <= hour < 12:
+        return 'morning'
+    if 12 <= hour < 17:
+        return 'afternoon'
+    if 17 <= hour < 20:
+        return 'evening'
+    return 'night'
+
+def _single_dose_time(timing_info):
+    """
+    Reminder time for a once-a-day dose, from the parsed timing
+    """
+    clock = PERIOD_TIMES[timing_info['period']]
+    if timing_info['event'] in EVENT_TIMES:
+        clock = EVENT_TIMES[timing_info['event']]
+    if timing_info['event'] and timing_info['relation'] == 'before':
+        clock = _shift(clock, -timedelta(minutes=30))
+    elif timing_info['event'] and timing_info['relation'] == 'after':
+        clock = _shift(clock, timedelta(minutes=30))
+    return clock
+
+def timing_periods(timing):
+    """
+    List every period of the day named in timing text, in day order
+
+    Args:
+        timing (str): Timing text (e.g. "morning and night")
+
+    Returns:
+        list: Periods such as "morning" and "night"
+    """
+    timing = (timing or '').lower()
+    return [
+        period for period in PERIODS
+        if period in timing or (period == 'night' and 'bedtime' in timing)
+    ]
+
+def _interval_days(frequency):
+    """
+    Days between dosing cycles, from "every N days/weeks/months", "weekly" or "monthly"
+    """
+    every = EVERY_PATTERN.search(frequency)
+    if every:
+        count = 2 if every.group(1) == 'other' else int(every.group(1))
+        return max(1, count * UNIT_DAYS[every.group(2).rstrip('s')])
+    if 'week' in frequency:
+        return 7
+    if 'month' in frequency:
+        return 30
+    return 1
+
+def _timed_dose(minutes, day=0):
+    """
+    Dose at a number of minutes after midnight of its cycle day, missed
+    MISSED_AFTER later; times past midnight move to the following days
+    """
+    day += minutes // (24 * 60)
+    clock = _shift('00:00', timedelta(minutes=minutes % (24 * 60)))
+    cutoff = datetime.combine(date.min, time.fromisoformat(clock)) + MISSED_AFTER
+    return {
+        'time': clock,
+        'cutoff': '23:59' if cutoff.date() > date.min else cutoff.strftime("%H:%M"),
+        'slot': slot_for_time(clock),
+        'day': day,
+    }
+
+def _minutes(clock):
+    due = time.fromisoformat(clock)
+    return due.hour * 60 + due.minute
+
+@lru_cache(maxsize=1024)
+def _parse(frequency, timing):
+    frequency = (frequency or '').lower()
+    timing_info = utils.parse_medication_time(timing or '')
+    periods = timing_periods(timing)
+    interval_days = _interval_days(frequency)
+
+    hours = HOURS_PATTERN.search(frequency)
+    count = COUNT_PATTERN.search(frequency)
+    if count:
+        count = COUNT_WORDS.get(count.group(1)) or int(count.group(1).split()[0])
+
+    # Meal timing shifts every period's dose the same way a single dose is shifted
+    shift = {'before': -30, 'after': 30}.get(timing_info['relation'], 0) if timing_info['event'] else 0
+    anchor = _single_dose_time(timing_info)
+
+    if hours and 0 < int(hours.group(1)) < 24:
+        # Around the clock from the timing's dose time; doses past midnight belong to the next day
+        step = int(hours.group(1)) * 60
+        return json.dumps({
+            'version': RULE_VERSION,
+            'interval_days': interval_days,
+            'doses': [_timed_dose(_minutes(anchor) + step * k) for k in range(24 * 60 // step)],
+        })
+
+    cycle_days = [0]
+    if count and count > 1 and interval_days > 1 and not PER_DAY_PATTERN.search(frequency):
+        # "Twice a week": spread the doses over the cycle, one a day at the usual time
+        cycle_days = sorted({round(k * interval_days / count) for k in range(count)})
+        count = 1
+
+    if len(periods) > 1 and not (count and count > len(periods)):
+        day_doses = [
+            {
+                'time': _shift(PERIOD_TIMES[period], timedelta(minutes=shift)),
+                'cutoff': PERIOD_CUTOFFS[period],
+                'slot': period,
+            }
+            for period in periods
+        ]
+    elif count and count > 1:
+        if timing_info['event'] == 'meals' and count <= len(MEAL_TIMES):
+            times = [_shift(clock, timedelta(minutes=shift)) for clock in MEAL_TIMES[:count]]
+        elif count in DAILY_TIMES:
+            times = DAILY_TIMES[count]
+        else:
+            # Spread evenly between 08:00 and 20:00
+            step = 12 * 60 // (count - 1)
+            times = [_shift('08:00', timedelta(minutes=step * k)) for k in range(count)]
+        day_doses = [_timed_dose(_minutes(clock)) for clock in times]
+    else:
+        day_doses = [{
+            'time': anchor,
+            'cutoff': PERIOD_CUTOFFS[timing_info['period']],
+            'slot': timing_info['period'] or slot_for_time(anchor),
+        }]
+
+    doses = [dict(dose, day=day) for day in cycle_days for dose in day_doses]
+    return json.dumps({'version': RULE_VERSION, 'interval_days': interval_days, 'doses': doses})
+
+def parse_recurrence(frequency, timing):
+    """
+    Parse free-text frequency and timing into a normalized recurrence rule
+
+    Args:
+        frequency (str): Frequency text (e.g. "twice a day", "every 8 hours")
+        timing (str): Timing text (e.g. "in the morning", "after breakfast")
+
+    Returns:
+        dict: Rule with "interval_days" and a list of "doses", each with
+            "time", "cutoff" (both "HH:MM"), "slot" and "day", the dose's
+            day within the cycle (0 for the cycle's first day)
+    """
+    return json.loads(_parse(frequency, timing))
+
+def get_rule(med):
+    """
+    Get the recurrence rule stored on a medication, parsing it if missing
+    or stored by an older parser
+
+    Args:
+        med (dict): Medication dictionary
+
+    Returns:
+        dict: Recurrence rule
+    """
+    rule = med.get('schedule')
+    if rule and rule.get('version') == RULE_VERSION:
+        return rule
+    return parse_recurrence(med.get('frequency', ''), med.get('timing', ''))
+
+def doses_on(rule, elapsed_days):
+    """
+    Get the doses of a rule that fall on a given day of the medication
+
+    Args:
+        rule (dict): Recurrence rule
+        elapsed_days (int): Days since the start date
+
+    Returns:
+        list: Doses due that day, in rule order
+    """
+    return [
+        dose for dose in rule['doses']
+        if elapsed_days >= dose.get('day', 0) and (elapsed_days - dose.get('day', 0)) % rule['interval_days'] == 0
+    ]
+
+def get_slots(med):
+    """
+    Get the calendar slots a medication is taken in
+
+    Args:
+        med (dict): Medication dictionary
+
+    Returns:
+        list: Distinct slots in dose order
+    """
+    slots = []
+    for dose in get_rule(med)['doses']:
+        if dose['slot'] not in slots:
+            slots.append(dose['slot'])
+    return slots
+
+def iter_occurrences(med, window_start, window_end):
+    """
+    Lazily expand the concrete doses of a medication within a time window
+
+    Args:
+        med (dict): Medication dictionary
+        window_start (datetime): Start of the window (inclusive)
+        window_end (datetime): End of the window (exclusive)
+
+    Yields:
+        Occurrence: Doses in chronological order
+    """
+    rule = get_rule(med)
+    first_day = date.fromisoformat(med['start_date'])
+    last_day = date.fromisoformat(med['end_date'])
+
+    day = max(first_day, window_start.date())
+    while day <= last_day and day <= window_end.date():
+        doses = sorted(
+            (time.fromisoformat(dose['time']), time.fromisoformat(dose['cutoff']), dose['slot'])
+            for dose in doses_on(rule, (day - first_day).days)
+        )
+        for due_time, cutoff_time, slot in doses:
+            due = datetime.combine(day, due_time)
+            if window_start <= due < window_end:
+                yield Occurrence(med['id'], due, datetime.combine(day, cutoff_time), slot)
+        day += timedelta(days=1)
+
+@lru_cache(maxsize=4096)
+def _cached_occurrences(medication_id, start_date, end_date, rule_json, window_start, window_end):
+    med = {
+        'id': medication_id,
+        'start_date': start_date,
+        'end_date': end_date,
+        'schedule': json.loads(rule_json),
+    }
+    return tuple(iter_occurrences(med, window_start, window_end))
+
+def occurrences(med, window_start, window_end):
+    """
+    Get the doses of a medication within a time window, cached per (medication, window)
+
+    Args:
+        med (dict): Medication dictionary
+        window_start (datetime): Start of the window (inclusive)
+        window_end (datetime): End of the window (exclusive)
+
+    Returns:
+        tuple: Occurrences in chronological order
+    """
+    rule_json = json.dumps(get_rule(med), sort_keys=True)
+    return _cached_occurrences(
+        med['id'], med['start_date'], med['end_date'], rule_json, window_start, window_end
+    )
+
+def occurrences_on(med, day):
+    """
+    Get the doses of a medication due on a given day
+
+    Args:
+        med (dict): Medication dictionary
+        day (date): The day
+
+    Returns:
+        tuple: Occurrences in chronological order
+    """
+    window_start = datetime.combine(day, time.min)
+    return occurrences(med, window_start, window_start + timedelta(days=1))
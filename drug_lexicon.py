@@ -0,0 +1,417 @@
+import hashlib
+import os
+import re
+import threading
+from collections import deque, namedtuple
+from functools import lru_cache
+
+# One drug name per line; lines starting with "#" are comments. The bundled
+# file is found next to this module, whatever the working directory
+DRUG_LEXICON_FILE = os.getenv(
+    "DRUG_LEXICON_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "drug_lexicon.txt")
+)
+
+# Used when the lexicon file is missing
+DEFAULT_MEDICINES = [
+    "lisinopril", "metformin", "amlodipine", "atorvastatin", "metoprolol",
+    "omeprazole", "losartan", "albuterol", "gabapentin", "hydrochlorothiazide",
+    "simvastatin", "levothyroxine", "montelukast", "pantoprazole", "furosemide",
+    "citalopram", "sertraline", "fluoxetine", "tramadol", "amoxicillin",
+    "azithromycin", "ibuprofen", "acetaminophen", "aspirin", "naproxen",
+    "clonazepam", "alprazolam", "zolpidem", "prednisone", "hydrocortisone",
+    "insulin", "warfarin", "xarelto", "eliquis", "plavix",
+    "crestor", "lipitor", "zocor", "nexium", "prilosec",
+    "protonix", "synthroid", "ventolin", "advair", "spiriva",
+    "flovent", "lantus", "humalog", "novolog", "tresiba",
+    "januvia", "jardiance", "trulicity", "ozempic", "farxiga",
+    "pradaxa", "savaysa", "brilinta", "effient", "multivitamin", "vitamin d",
+    "calcium", "iron", "zinc", "magnesium", "potassium",
+    "coq10", "fish oil", "omega-3", "probiotics", "melatonin"
+]
+
+# A lexicon hit: canonical name, span in the text, and the text as written
+DrugMatch = namedtuple("DrugMatch", ["name", "start", "end", "text"])
+
+# An approximate hit, with a confidence between 0 and 1
+FuzzyDrugMatch = namedtuple("FuzzyDrugMatch", ["name", "confidence", "start", "end", "text"])
+
+# Approximate matches below this confidence are ignored
+FUZZY_MIN_CONFIDENCE = float(os.getenv("FUZZY_MIN_CONFIDENCE", 0.85))
+
+# Most edits between the phonetic keys of an approximate match and the name.
+# Distinct drugs are often two edits apart (Lorazepam and Clonazepam,
+# Prednisolone and Prednisone), while misheard names are rarely more than one
+FUZZY_MAX_EDITS = int(os.getenv("FUZZY_MAX_EDITS", 1))
+
+# Spelling differences ASR output tends to make that sound the same
+PHONETIC_RULES = [
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"ck|q"), "k"),
+    (re.compile(r"c(?=[eiy])"), "s"),
+    (re.compile(r"c"), "k"),
+    (re.compile(r"z"), "s"),
+    (re.compile(r"y"), "i"),
+    (re.compile(r"(?<=[a-z])h"), ""),
+    (re.compile(r"([a-z])\1+"), r"\1"),
+]
+
+WORD_PATTERN = re.compile(r"[A-Za-z][\w-]*")
+
+_lexicon = None
+_fuzzy_matcher = None
+_lexicon_lock = threading.Lock()
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+class DrugLexicon:
+    """
+    Aho-Corasick automaton over a drug name lexicon
+
+    The automaton is built once from the lowercased names. A search walks
+    the text a single time, following failure links on mismatches, so its
+    cost depends on the text length and the number of hits, not on the
+    size of the lexicon. Hits must start and end on word boundaries, as
+    with a \\b...\\b regex.
+    """
+
+    def __init__(self, names):
+        self.names = {}
+        self._goto = [{}]
+        self._fail = [0]
+        # Lengths of the names ending at each state, including via failure links
+        self._outputs = [[]]
+
+        for name in names:
+            key = name.strip().lower()
+            if not key or key in self.names:
+                continue
+            self.names[key] = name.strip()
+            state = 0
+            for char in key:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append(len(key))
+
+        # Breadth-first over the trie, so a state's failure target is finished first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+        # Identifies the set of names, e.g. to tell results from another lexicon apart
+        self.fingerprint = hashlib.sha1("\n".join(sorted(self.names)).encode("utf-8")).hexdigest()[:12]
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Build a lexicon from a file with one name per line
+
+        Args:
+            path (str): Path to the lexicon file
+
+        Returns:
+            DrugLexicon: The built lexicon
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            names = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        return cls(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def find_all(self, text):
+        """
+        Find every lexicon name in a text
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            list: DrugMatch for each hit, in order of end position
+        """
+        lowered = text.lower()
+        # Lowercasing can change the length of some characters; fall back to a safe copy
+        if len(lowered) != len(text):
+            lowered = "".join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+        matches = []
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for position, char in enumerate(lowered):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not outputs[state]:
+                continue
+            end = position + 1
+            if end < len(text) and _is_word_char(text[end]):
+                continue
+            for length in outputs[state]:
+                start = end - length
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                matches.append(DrugMatch(self.names[lowered[start:end]], start, end, text[start:end]))
+        return matches
+
+    def find_mentions(self, text):
+        """
+        Find the lexicon names in a text without overlaps, preferring longer names
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            list: DrugMatch for each mention, in text order
+        """
+        chosen = []
+        for match in sorted(self.find_all(text), key=lambda match: (match.start - match.end, match.start)):
+            if all(match.end <= other.start or match.start >= other.end for other in chosen):
+                chosen.append(match)
+        return sorted(chosen, key=lambda match: match.start)
+
+    def longest_match(self, text):
+        """
+        Find the longest lexicon name in a text, preferring the earliest on ties
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            DrugMatch: The best hit, or None if no name occurs in the text
+        """
+        best = None
+        for match in self.find_all(text):
+            length = match.end - match.start
+            if best is None or length > best.end - best.start or (
+                length == best.end - best.start and match.start < best.start
+            ):
+                best = match
+        return best
+
+def phonetic_key(text):
+    """
+    Reduce a name to a rough phonetic spelling, so that sound-alike
+    misspellings are close together
+
+    Args:
+        text (str): Name or word
+
+    Returns:
+        str: Phonetic key
+    """
+    key = text.lower()
+    for pattern, replacement in PHONETIC_RULES:
+        key = pattern.sub(replacement, key)
+    return key
+
+def _max_distance(length):
+    """
+    Edits allowed for a key of this length; short words must match exactly
+    """
+    if length <= 4:
+        return 0
+    if length <= 8:
+        return min(1, FUZZY_MAX_EDITS)
+    return min(2, FUZZY_MAX_EDITS)
+
+def _deletes(key, distance):
+    """
+    Every string reachable from key by deleting up to distance characters
+    """
+    variants = {key}
+    frontier = {key}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier if len(word) > 1 for i in range(len(word))}
+        variants |= frontier
+    return variants
+
+def _edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance, or limit + 1 once it exceeds limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+class FuzzyDrugMatcher:
+    """
+    SymSpell-style approximate matcher over the drug lexicon
+
+    Every name is indexed under its phonetic key and each variant of that
+    key with as many characters deleted as the edit limit allows. A query
+    generates the same deletions of its own key, so candidates within the
+    limit are found with dictionary lookups instead of comparing against
+    every name, and only those starting with the same sound get an exact
+    distance check.
+    """
+
+    def __init__(self, names):
+        self.names = {}
+        self._index = {}
+        self._max_words = 1
+        for name in names:
+            canonical = name.strip()
+            key = phonetic_key(canonical)
+            if not key or key in self.names:
+                continue
+            self.names[key] = canonical
+            self._max_words = max(self._max_words, len(canonical.split()))
+            for variant in _deletes(key, _max_distance(len(key))):
+                self._index.setdefault(variant, set()).add(key)
+        # Queries outside this key length range cannot be within the edit limit of any name
+        lengths = [len(key) for key in self.names] or [0]
+        self._min_length = min(lengths) - 2
+        self._max_length = max(lengths) + 2
+        # The same words recur across utterances
+        self.lookup = lru_cache(maxsize=16384)(self.lookup)
+
+    def lookup(self, word):
+        """
+        Find the closest lexicon name to a single word or phrase
+
+        Args:
+            word (str): The possibly misspelled name
+
+        Returns:
+            tuple: (canonical name, confidence), or None if nothing is close enough
+        """
+        query = phonetic_key(word)
+        if not query or not self._min_length <= len(query) <= self._max_length:
+            return None
+        limit = _max_distance(len(query))
+        best = None
+        candidates = set()
+        for variant in _deletes(query, limit):
+            candidates.update(self._index.get(variant, ()))
+        for key in candidates:
+            # Mishearings keep the first sound; other drugs often differ there (Escitalopram, Citalopram)
+            if key[0] != query[0]:
+                continue
+            key_limit = min(limit, _max_distance(len(key)))
+            distance = _edit_distance(query, key, key_limit)
+            if distance > key_limit:
+                continue
+            # Average how alike the names sound and how alike they are spelled
+            spelled, written = self.names[key].lower(), word.lower()
+            spelling_distance = _edit_distance(written, spelled, max(len(written), len(spelled)))
+            confidence = (
+                (1 - distance / max(len(query), len(key)))
+                + (1 - spelling_distance / max(len(written), len(spelled)))
+            ) / 2
+            if best is None or confidence > best[1]:
+                best = (self.names[key], confidence)
+        return best
+
+    def _candidates(self, text, min_confidence):
+        """
+        Look up every run of up to as many words as the longest name, so
+        multi-word names are found too
+        """
+        words = [(match.start(), match.end()) for match in WORD_PATTERN.finditer(text)]
+        candidates = []
+        for i in range(len(words)):
+            for count in range(1, min(self._max_words, len(words) - i) + 1):
+                start, end = words[i][0], words[i + count - 1][1]
+                phrase = " ".join(text[s:e] for s, e in words[i:i + count])
+                hit = self.lookup(phrase)
+                if hit is not None and hit[1] >= min_confidence:
+                    candidates.append(FuzzyDrugMatch(hit[0], hit[1], start, end, text[start:end]))
+        # Most confident first, then longest, then earliest
+        candidates.sort(key=lambda match: (-match.confidence, match.start - match.end, match.start))
+        return candidates
+
+    def best_match(self, text, min_confidence=FUZZY_MIN_CONFIDENCE):
+        """
+        Find the most confident approximate lexicon name among the words of a text
+
+        Args:
+            text (str): Text to search
+            min_confidence (float): Ignore matches below this confidence
+
+        Returns:
+            FuzzyDrugMatch: The best match, longest on ties, or None
+        """
+        candidates = self._candidates(text, min_confidence)
+        return candidates[0] if candidates else None
+
+    def find_all(self, text, min_confidence=FUZZY_MIN_CONFIDENCE):
+        """
+        Find every approximate lexicon name in a text, without overlaps
+
+        Overlapping candidates are resolved in favour of the most confident.
+
+        Args:
+            text (str): Text to search
+            min_confidence (float): Ignore matches below this confidence
+
+        Returns:
+            list: FuzzyDrugMatch for each name, in text order
+        """
+        chosen = []
+        for candidate in self._candidates(text, min_confidence):
+            if all(candidate.end <= match.start or candidate.start >= match.end for match in chosen):
+                chosen.append(candidate)
+        return sorted(chosen, key=lambda match: match.start)
+
+def get_fuzzy_matcher():
+    """
+    Get the process-wide fuzzy matcher over the drug lexicon, building it on first use
+
+    Returns:
+        FuzzyDrugMatcher: Matcher over the same names as get_lexicon()
+    """
+    global _fuzzy_matcher
+    lexicon = get_lexicon()
+    if _fuzzy_matcher is None:
+        with _lexicon_lock:
+            if _fuzzy_matcher is None:
+                _fuzzy_matcher = FuzzyDrugMatcher(lexicon.names.values())
+    return _fuzzy_matcher
+
+def get_lexicon():
+    """
+    Get the process-wide drug lexicon, loading it on first use
+
+    Returns:
+        DrugLexicon: Lexicon built from DRUG_LEXICON_FILE, or from the
+            built-in list if the file does not exist
+    """
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                if os.path.exists(DRUG_LEXICON_FILE):
+                    _lexicon = DrugLexicon.from_file(DRUG_LEXICON_FILE)
+                else:
+                    print(
+                        f"Warning: drug lexicon {DRUG_LEXICON_FILE} not found, "
+                        f"using the {len(DEFAULT_MEDICINES)} built-in names"
+                    )
+                    _lexicon = DrugLexicon(DEFAULT_MEDICINES)
+    return _lexicon
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+def normalize_text(text):
+    """
+    Normalize an utterance for caching: Unicode NFC with whitespace runs collapsed
+
+    Args:
+        text (str): Raw input text
+
+    Returns:
+        str: Normalized text
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class ExtractionCache:
+    """
+    Bounded LRU of extraction results keyed by (version, normalized text)
+
+    With a path, results are also appended to a JSON-lines file and loaded
+    back on first use, so repeated utterances stay fast across restarts.
+    Entries written under another version are ignored, and the file is
+    rewritten with just the cached entries whenever it grows to twice as
+    many lines as the cache keeps, so it stays bounded like the cache.
+    """
+
+    def __init__(self, max_size=1024, path=None):
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = not path
+        self._file_lines = 0
+
+    def _load(self, version):
+        """
+        Read persisted entries for this version, oldest first
+        """
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append
+                    continue
+                if entry.get("version") != version:
+                    continue
+                key = (version, entry["text"])
+                self._entries[key] = entry["result"]
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        self._file_lines = lines
+        if lines > 2 * self.max_size:
+            self._rewrite()
+
+    def _rewrite(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for (version, text), result in self._entries.items():
+                f.write(json.dumps({"version": version, "text": text, "result": result}) + "\n")
+        os.replace(temp_path, self.path)
+        self._file_lines = len(self._entries)
+
+    def get(self, version, text):
+        """
+        Look up a cached result
+
+        Args:
+            version (str): Extractor version the result must come from
+            text (str): Normalized text
+
+        Returns:
+            dict: A copy of the cached result, or None on a miss
+        """
+        key = (version, text)
+        with self._lock:
+            if not self._loaded:
+                self._load(version)
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, version, text, result):
+        """
+        Store a result, evicting the least recently used one if full
+
+        Args:
+            version (str): Extractor version that produced the result
+            text (str): Normalized text
+            result (dict): Extraction result
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load(version)
+            self._entries[(version, text)] = dict(result)
+            self._entries.move_to_end((version, text))
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            if self.path:
+                directory = os.path.dirname(self.path)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"version": version, "text": text, "result": result}) + "\n")
+                self._file_lines += 1
+                if self._file_lines > 2 * self.max_size:
+                    self._rewrite()
+
+    def clear(self):
+        """
+        Drop every in-memory entry and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: Hits, misses, hit rate and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
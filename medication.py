@@ -2,8 +2,13 @@ import streamlit as st # type: ignore
 import speech_recognition_helper as sr_helper
 import nlp_processor
 import database
+import schedule_index
+import dose_schedule
+import reminder_scheduler
+import adherence
 import datetime
 import pandas as pd # type: ignore
+import numpy as np # type: ignore
 import plotly.express as px # type: ignore
 from datetime import datetime, timedelta
 import calendar
@@ -78,7 +83,7 @@ def process_real_time_audio():
     """
     with st.spinner("Recording and processing your voice input..."):
         try:
-            text = test_audio_live(duration=5, sample_rate=16000)
+            text = test_audio_live(duration=30, sample_rate=16000)
             text = text.lower()
             if text:
                 st.session_state.transcribed_text = text
@@ -114,21 +119,29 @@ def display_transcribed_text(transcribed_text):
     """
     st.subheader("Transcribed Text")
     st.write(transcribed_text)
-    with st.spinner("Analyzing medication details..."):
-        medication_info = nlp_processor.extract_medication_info(transcribed_text)
-        display_and_confirm_medication(medication_info, "voice")
+    if st.session_state.get("extracted_voice_source") != transcribed_text:
+        with st.spinner("Analyzing medication details..."):
+            try:
+                st.session_state.extracted_voice = nlp_processor.extract_medications(transcribed_text)
+            except nlp_processor.NLPResourceError as e:
+                st.error(str(e))
+                return
+        st.session_state.extracted_voice_source = transcribed_text
+    display_and_confirm_medications(st.session_state.extracted_voice, "voice")
 
 def text_input_section():
     """
     Section for adding medications through text input
     """
     st.subheader("Text Input")
-    st.write("Please enter details about your medication:")
+    st.write("Please enter details about your medications. You can list several in one go:")
     with st.expander("Example of what to write"):
-        st.write("*I need to take Lisinopril 10mg once daily in the morning for my blood pressure.*")
+        st.write("*I need to take Lisinopril 10mg once daily in the morning and Metformin 500mg twice daily with meals.*")
     medication_text = st.text_area("Medication Instructions", height=150, placeholder="Enter medication details here...")
     if st.button("Process Text Input", key="process_text", use_container_width=True):
         process_text_input(medication_text)
+    if st.session_state.get("extracted_text"):
+        display_and_confirm_medications(st.session_state.extracted_text, "text")
 
 def process_text_input(medication_text):
     """
@@ -138,99 +151,142 @@ def process_text_input(medication_text):
         st.error("Please enter some text about your medication.")
         return
     with st.spinner("Analyzing medication details..."):
-        medication_info = nlp_processor.extract_medication_info(medication_text)
-        print(medication_info)
-        display_and_confirm_medication(medication_info, "text")
+        try:
+            st.session_state.extracted_text = nlp_processor.extract_medications(medication_text)
+        except nlp_processor.NLPResourceError as e:
+            st.error(str(e))
 
-def display_and_confirm_medication(medication_info, input_type):
+def clear_extracted_medications(input_type):
     """
-    Display extracted medication information and ask for confirmation
+    Forget the medications extracted from one input source
     
     Args:
-        medication_info (dict): The extracted medication details
-        input_type (str): Either "voice" or "text" to identify the source
+        input_type (str): Either "voice" or "text"
+    """
+    st.session_state.pop(f"extracted_{input_type}", None)
+    if input_type == "voice":
+        st.session_state.transcribed_text = ""
+        st.session_state.pop("extracted_voice_source", None)
+
+def default_duration_days(duration_text):
     """
-    st.subheader("Extracted Medication Information")
+    Estimate how many days a spoken duration covers
     
-    # Display the extracted information with editable fields
-    medicine_name = st.text_input("Medicine Name", value=medication_info.get("medicine_name", ""), key=f"medicine_name_{input_type}")
-    dosage = st.text_input("Dosage", value=medication_info.get("dosage", ""), key=f"dosage_{input_type}")
-    frequency = st.text_input("Frequency", value=medication_info.get("frequency", ""), key=f"frequency_{input_type}")
-    timing = st.text_input("Timing", value=medication_info.get("timing", ""), key=f"timing_{input_type}")
-    duration = st.text_input("Duration", value=medication_info.get("duration", ""), key=f"duration_{input_type}")
-    instructions = st.text_area("Special Instructions", value=medication_info.get("instructions", ""), key=f"instructions_{input_type}")
+    Args:
+        duration_text (str): Duration such as "for 2 weeks"
+        
+    Returns:
+        int: Number of days, 30 if it can't be worked out
+    """
+    duration_text = duration_text.lower()
+    digits = ''.join(filter(str.isdigit, duration_text))
+    if not digits:
+        return 30
+    if "day" in duration_text:
+        return int(digits)
+    if "week" in duration_text:
+        return int(digits) * 7
+    if "month" in duration_text:
+        return int(digits) * 30
+    return 30
+
+def display_medication_fields(medication_info, input_type, index):
+    """
+    Display editable fields for one extracted medication
     
-    # Date inputs for start and end dates
-    start_date = st.date_input("Start Date", value=datetime.now(), key=f"start_date_{input_type}")
+    Args:
+        medication_info (dict): The extracted medication details
+        input_type (str): Either "voice" or "text" to identify the source
+        index (int): Position of the medication in the utterance
+        
+    Returns:
+        dict: The medication data as edited, or None if it was left out
+    """
+    suffix = f"{input_type}_{index}"
+    include = st.checkbox("Include this medication", value=True, key=f"include_{suffix}")
+    medicine_name = medication_info.get("medicine_name", "")
+    
+    # A close lexicon name is only used once the user confirms it
+    suggested_name = medication_info.get("suggested_name", "")
+    use_suggestion = False
+    if suggested_name:
+        st.warning(f'"{medicine_name}" is not a medicine we know. Did you mean {suggested_name}?')
+        use_suggestion = st.checkbox(f"Use {suggested_name}", value=False, key=f"use_suggestion_{suffix}")
+        if use_suggestion:
+            medicine_name = suggested_name
+    medicine_name = st.text_input(
+        "Medicine Name", value=medicine_name, key=f"medicine_name_{suffix}_{int(use_suggestion)}"
+    )
+    dosage = st.text_input("Dosage", value=medication_info.get("dosage", ""), key=f"dosage_{suffix}")
+    frequency = st.text_input("Frequency", value=medication_info.get("frequency", ""), key=f"frequency_{suffix}")
+    timing = st.text_input("Timing", value=medication_info.get("timing", ""), key=f"timing_{suffix}")
+    duration = st.text_input("Duration", value=medication_info.get("duration", ""), key=f"duration_{suffix}")
+    instructions = st.text_area("Special Instructions", value=medication_info.get("instructions", ""), key=f"instructions_{suffix}")
     
-    # Calculate default end date
-    default_days = 30
-    duration_text = medication_info.get("duration", "").lower()
-    if "day" in duration_text:
-        try:
-            default_days = int(''.join(filter(str.isdigit, duration_text)))
-        except:
-            pass
-    elif "week" in duration_text:
-        try:
-            default_days = int(''.join(filter(str.isdigit, duration_text))) * 7
-        except:
-            pass
-    elif "month" in duration_text:
-        try:
-            default_days = int(''.join(filter(str.isdigit, duration_text))) * 30
-        except:
-            pass
+    # Date inputs for start and end dates
+    start_date = st.date_input("Start Date", value=datetime.now(), key=f"start_date_{suffix}")
+    default_days = default_duration_days(medication_info.get("duration", ""))
+    end_date = st.date_input("End Date", value=datetime.now() + timedelta(days=default_days), key=f"end_date_{suffix}")
+    
+    if not include:
+        return None
+    return {
+        "medicine_name": medicine_name.strip(),
+        "dosage": dosage.strip(),
+        "frequency": frequency.strip(),
+        "timing": timing.strip(),
+        "duration": duration.strip(),
+        "instructions": instructions.strip(),
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+    }
+
+def display_and_confirm_medications(medications_info, input_type):
+    """
+    Display extracted medications and save the confirmed ones in one write
     
-    end_date = st.date_input("End Date", value=datetime.now() + timedelta(days=default_days), key=f"end_date_{input_type}")
-    print("input type:", input_type)
-    print("session state:", st.session_state)
+    Args:
+        medications_info (list): The extracted medication details, one dict per medication
+        input_type (str): Either "voice" or "text" to identify the source
+    """
+    if len(medications_info) == 1:
+        st.subheader("Extracted Medication Information")
+    else:
+        st.subheader(f"Extracted Information for {len(medications_info)} Medications")
     
+    medications_data = []
+    for index, medication_info in enumerate(medications_info):
+        with st.expander(medication_info.get("medicine_name") or f"Medication {index + 1}", expanded=True):
+            medication_data = display_medication_fields(medication_info, input_type, index)
+        if medication_data is not None:
+            medications_data.append(medication_data)
     
     # Confirm and save
     col1, col2 = st.columns(2)
     with col1:
-        save_clicked = st.button("Save Medication", key=f"save_{input_type}", use_container_width=True)
-        st.session_state[f"save_clicked_{input_type}"] = True
-        print("save clicked:", save_clicked)
-        
-        if st.session_state[f"save_clicked_{input_type}"]:
-            
-            if not medicine_name.strip():
+        label = "Save Medication" if len(medications_info) == 1 else "Save All Medications"
+        if st.button(label, key=f"save_{input_type}", use_container_width=True):
+            if not medications_data:
+                st.error("Select at least one medication to save.")
+                return
+            if any(not medication_data["medicine_name"] for medication_data in medications_data):
                 st.error("Medicine name is required.")
-                st.session_state[f"save_clicked_{input_type}"] = False
                 return
             
-            # Format the medication data
-            print("medicine name:", medicine_name.strip())
-            medication_data = {
-                "medicine_name": medicine_name.strip(),
-                "dosage": dosage.strip(),
-                "frequency": frequency.strip(),
-                "timing": timing.strip(),
-                "duration": duration.strip(),
-                "instructions": instructions.strip(),
-                "start_date": start_date.strftime("%Y-%m-%d"),
-                "end_date": end_date.strftime("%Y-%m-%d"),
-            }
-            
-            # Save to database
-            success = database.add_medication(st.session_state.username, medication_data)
+            # Save every medication in one write
+            success = database.add_medications(st.session_state.username, medications_data)
             if success:
-                st.success("Medication added successfully!")
-                if input_type == "voice":
-                    st.session_state.transcribed_text = ""
-                st.session_state[f"save_clicked_{input_type}"] = False
+                reminder_scheduler.refresh_user(st.session_state.username)
+                st.success("Medications added successfully!" if len(medications_data) > 1 else "Medication added successfully!")
+                clear_extracted_medications(input_type)
                 st.session_state.page = "medication_schedule"
                 st.rerun()
             else:
                 st.error("Failed to save medication. Please try again.")
-                st.session_state[f"save_clicked_{input_type}"] = False
     
     with col2:
         if st.button("Cancel", key=f"cancel_{input_type}", use_container_width=True):
-            if input_type == "voice":
-                st.session_state.transcribed_text = ""
+            clear_extracted_medications(input_type)
             st.rerun()
 
 def view_medication_schedule():
@@ -289,6 +345,7 @@ def view_medication_schedule():
             with col2:
                 if st.button("Delete", key=f"delete_{med['id']}", use_container_width=True):
                     if database.delete_medication(med['id']): 
+                        reminder_scheduler.refresh_user(st.session_state.username)
                         st.success("Medication deleted successfully!")
                         st.rerun()
                     else:
@@ -305,24 +362,18 @@ def display_day_view(selected_date, medications):
     st.write(f"### Medications for {selected_date.strftime('%A, %B %d, %Y')}")
     
     # Filter medications for the selected date
-    day_meds = []
-    for med in medications:
-        start_date = datetime.strptime(med['start_date'], "%Y-%m-%d").date()
-        end_date = datetime.strptime(med['end_date'], "%Y-%m-%d").date()
-        
-        if start_date <= selected_date <= end_date:
-            day_meds.append(med)
+    day_meds = schedule_index.get_index(medications).active_on(selected_date)
+    day_slots = get_dose_slots(day_meds, selected_date)
     
-    if not day_meds:
+    if not any(day_slots.values()):
         st.info("No medications scheduled for this day.")
         return
     
     # Organize by time of day
-    morning_meds = [med for med in day_meds if "morning" in med["timing"].lower()]
-    afternoon_meds = [med for med in day_meds if "afternoon" in med["timing"].lower()]
-    evening_meds = [med for med in day_meds if "evening" in med["timing"].lower()]
-    night_meds = [med for med in day_meds if "night" in med["timing"].lower()]
-    other_meds = [med for med in day_meds if not any(time in med["timing"].lower() for time in ["morning", "afternoon", "evening", "night"])]
+    morning_meds = [med for med in day_meds if "morning" in day_slots[med["id"]]]
+    afternoon_meds = [med for med in day_meds if "afternoon" in day_slots[med["id"]]]
+    evening_meds = [med for med in day_meds if "evening" in day_slots[med["id"]]]
+    night_meds = [med for med in day_meds if "night" in day_slots[med["id"]]]
     
     # Display medications by time
     if morning_meds:
@@ -344,11 +395,6 @@ def display_day_view(selected_date, medications):
         st.write("#### 🌙 Night")
         for med in night_meds:
             st.info(f"**{med['medicine_name']}** - {med['dosage']} - {med['instructions']}")
-    
-    if other_meds:
-        st.write("#### ⏰ Other Times")
-        for med in other_meds:
-            st.info(f"**{med['medicine_name']}** - {med['dosage']} - {med['timing']} - {med['instructions']}")
 
 def display_week_view(selected_date, medications):
     """
@@ -366,49 +412,16 @@ def display_week_view(selected_date, medications):
     
     st.write(f"### Week of {start_of_week.strftime('%B %d')} - {(start_of_week + timedelta(days=6)).strftime('%B %d, %Y')}")
     
-    # Create a heatmap-style calendar
-    data = []
+    # Create a heatmap-style calendar from the materialized schedule
+    schedule = schedule_index.get_index(medications).materialize(week_dates[0], week_dates[-1])
+    day_names = [date.strftime("%a %m/%d") for date in week_dates]
     
-    # For each day in the week
-    for date in week_dates:
-        day_meds = []
-        for med in medications:
-            start_date = datetime.strptime(med['start_date'], "%Y-%m-%d").date()
-            end_date = datetime.strptime(med['end_date'], "%Y-%m-%d").date()
-            
-            if start_date <= date <= end_date:
-                day_meds.append(med)
-        
-        # Count medications by time of day
-        morning_count = sum(1 for med in day_meds if "morning" in med["timing"].lower())
-        afternoon_count = sum(1 for med in day_meds if "afternoon" in med["timing"].lower())
-        evening_count = sum(1 for med in day_meds if "evening" in med["timing"].lower())
-        night_count = sum(1 for med in day_meds if "night" in med["timing"].lower())
-        
-        # Add to data
-        day_name = date.strftime("%a %m/%d")
-        if morning_count > 0:
-            data.append({"Day": day_name, "Time": "Morning", "Medications": morning_count})
-        else:
-            data.append({"Day": day_name, "Time": "Morning", "Medications": 0})
-            
-        if afternoon_count > 0:
-            data.append({"Day": day_name, "Time": "Afternoon", "Medications": afternoon_count})
-        else:
-            data.append({"Day": day_name, "Time": "Afternoon", "Medications": 0})
-            
-        if evening_count > 0:
-            data.append({"Day": day_name, "Time": "Evening", "Medications": evening_count})
-        else:
-            data.append({"Day": day_name, "Time": "Evening", "Medications": 0})
-            
-        if night_count > 0:
-            data.append({"Day": day_name, "Time": "Night", "Medications": night_count})
-        else:
-            data.append({"Day": day_name, "Time": "Night", "Medications": 0})
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
+    # Create DataFrame (one row per day and time of day)
+    df = pd.DataFrame({
+        "Day": np.repeat(day_names, len(schedule_index.BUCKETS)),
+        "Time": np.tile(schedule_index.BUCKETS, len(week_dates)),
+        "Medications": schedule.buckets.ravel(),
+    })
     
     # Create heatmap
     fig = px.density_heatmap(
@@ -464,6 +477,9 @@ def display_month_view(selected_date, medications):
         with cols[i]:
             st.write(f"**{day}**")
     
+    # Count medications for every day of the month in one pass
+    month_schedule = schedule_index.get_index(medications).materialize(first_day, last_day)
+    
     # Display calendar with medication counts
     for week in cal:
         cols = st.columns(7)
@@ -475,13 +491,7 @@ def display_month_view(selected_date, medications):
                     date = first_day.replace(day=day)
                     
                     # Count medications for this day
-                    med_count = 0
-                    for med in medications:
-                        start_date = datetime.strptime(med['start_date'], "%Y-%m-%d").date()
-                        end_date = datetime.strptime(med['end_date'], "%Y-%m-%d").date()
-                        
-                        if start_date <= date <= end_date:
-                            med_count += 1
+                    med_count = int(month_schedule.totals[day - 1])
                     
                     # Style based on date and medication count
                     if date == datetime.now().date():
@@ -517,24 +527,37 @@ def get_todays_medications(username):
     all_meds = database.get_medications(username)
     
     # Filter for today
-    todays_meds = []
-    for med in all_meds:
-        start_date = datetime.strptime(med['start_date'], "%Y-%m-%d").date()
-        end_date = datetime.strptime(med['end_date'], "%Y-%m-%d").date()
-        
-        if start_date <= today <= end_date:
-            todays_meds.append(med)
+    return schedule_index.get_index(all_meds).active_on(today)
+
+def get_dose_slots(medications, day):
+    """
+    Get the time-of-day slots each medication has a dose in on a given day
+    
+    Args:
+        medications (list): List of medication dictionaries
+        day (date): The day
     
-    return todays_meds
+    Returns:
+        dict: Mapping of medication ID to set of slots
+    """
+    return {
+        med['id']: {occurrence.slot for occurrence in dose_schedule.occurrences_on(med, day)}
+        for med in medications
+    }
 
-def mark_medication_taken(medication_id):
+def mark_medication_taken(medication_id, username, scheduled_slot=""):
     """
-    Mark a medication as taken
+    Record a taken dose of a medication
     
     Args:
-        medication_id (int): The medication ID
+        medication_id (str): The medication ID
+        username (str): The username
+        scheduled_slot (str): The dose slot being taken (e.g. "morning")
     
     Returns:
         bool: Success status
     """
-    return database.mark_medication_taken(medication_id)
+    success = adherence.record_dose(username, medication_id, scheduled_slot)
+    if success:
+        reminder_scheduler.mark_taken(medication_id, scheduled_slot)
+    return success
@@ -0,0 +1,215 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import numpy as np # type: ignore
+import drug_lexicon
+import nlp_processor
+
+# Bundled corpus and gold labels
+CORPUS_DIR = "speech_to_text"
+GOLD_FILE = os.path.join(CORPUS_DIR, "extraction_gold.jsonl")
+
+FIELDS = ["medicine_name", "dosage", "frequency", "timing", "duration", "instructions"]
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """
+    Load every utterance from data.csv, training_sentences.txt and transcriptions.txt
+
+    Args:
+        corpus_dir (str): Directory holding the corpus files
+
+    Returns:
+        list: Utterances, duplicates included, in file order
+    """
+    texts = []
+    with open(os.path.join(corpus_dir, "data.csv"), "r", encoding="utf-8") as f:
+        texts.extend(row["transcript"] for row in csv.DictReader(f))
+    with open(os.path.join(corpus_dir, "training_sentences.txt"), "r", encoding="utf-8") as f:
+        texts.extend(line.strip() for line in f if line.strip())
+    with open(os.path.join(corpus_dir, "transcriptions.txt"), "r", encoding="utf-8") as f:
+        # Lines are "<clip file> <transcript>"
+        texts.extend(line.strip().split(" ", 1)[1] for line in f if " " in line.strip())
+    return texts
+
+def load_gold(path=GOLD_FILE):
+    """
+    Load gold labels, one JSON object per line with "text" and every field
+
+    Returns:
+        list: Gold label dictionaries
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _normalize(value):
+    return " ".join(value.lower().split()).strip(" .,;")
+
+def _percentiles(seconds):
+    values = np.array(seconds) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "mean_ms": round(float(values.mean()), 4),
+    }
+
+def _time_each(function, items):
+    timings = []
+    for item in items:
+        started = time.perf_counter()
+        function(item)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def benchmark_latency(texts, repeats=3):
+    """
+    Time extract_medication_info over the corpus
+
+    The cache is cleared first, so the first pass over each distinct text
+    measures real extraction and later passes measure cache hits.
+
+    Args:
+        texts (list): Utterances to extract from
+        repeats (int): Passes over the corpus
+
+    Returns:
+        dict: Percentiles and throughput for uncached and cached calls, and tier counts
+    """
+    nlp_processor.clear_cache()
+    nlp_processor.reset_tier_stats()
+    distinct = list(dict.fromkeys(texts))
+    uncached = _time_each(nlp_processor.extract_medication_info, distinct)
+    cached = []
+    for _ in range(repeats):
+        cached.extend(_time_each(nlp_processor.extract_medication_info, texts))
+    return {
+        "uncached": dict(_percentiles(uncached), texts_per_second=round(len(uncached) / sum(uncached), 1)),
+        "cached": dict(_percentiles(cached), texts_per_second=round(len(cached) / sum(cached), 1)),
+        "tiers": nlp_processor.get_tier_stats(),
+        "cache": nlp_processor.get_cache_stats(),
+    }
+
+def benchmark_stages(texts):
+    """
+    Time each extraction stage on its own over the distinct utterances
+
+    Returns:
+        dict: Percentiles per stage
+    """
+    distinct = list(dict.fromkeys(texts))
+    nlp = nlp_processor.get_nlp()
+    lexicon = drug_lexicon.get_lexicon()
+    docs = [nlp(text) for text in distinct]
+    lowered = [text.lower() for text in distinct]
+    stages = {
+        "parse": _time_each(nlp, distinct),
+        "tokenize": _time_each(nlp_processor.get_tokenizer(), distinct),
+        "lexicon": _time_each(lexicon.longest_match, distinct),
+        "extract_medicine_name": _time_each(nlp_processor.extract_medicine_name, docs),
+        "extract_fields": _time_each(nlp_processor.extract_fields, docs),
+        "field_scan": _time_each(nlp_processor.FIELD_SCANNER.scan, lowered),
+    }
+    return {stage: _percentiles(timings) for stage, timings in stages.items()}
+
+def evaluate_accuracy(gold, show_errors=False):
+    """
+    Compare extraction against gold labels, field by field
+
+    Values match when equal after lowercasing, collapsing whitespace and
+    trimming surrounding punctuation.
+
+    Args:
+        gold (list): Gold label dictionaries
+        show_errors (bool): Print each mismatch
+
+    Returns:
+        dict: Accuracy per field, and the share of texts with every field right
+    """
+    correct = {field: 0 for field in FIELDS}
+    all_correct = 0
+    for label in gold:
+        result = nlp_processor.extract_medication_info(label["text"])
+        wrong = [field for field in FIELDS if _normalize(result[field]) != _normalize(label[field])]
+        for field in FIELDS:
+            if field not in wrong:
+                correct[field] += 1
+        if not wrong:
+            all_correct += 1
+        if show_errors:
+            for field in wrong:
+                print(f"{field}: expected {label[field]!r}, got {result[field]!r} in {label['text']!r}")
+    accuracy = {field: round(correct[field] / len(gold), 4) for field in FIELDS}
+    accuracy["all_fields"] = round(all_correct / len(gold), 4)
+    return accuracy
+
+def run(repeats=3, show_errors=False):
+    """
+    Run the full benchmark: model load, latency, stage timings and accuracy
+
+    Returns:
+        dict: All results
+    """
+    started = time.perf_counter()
+    nlp_processor.get_nlp()
+    model_load = time.perf_counter() - started
+    started = time.perf_counter()
+    drug_lexicon.get_lexicon()
+    lexicon_load = time.perf_counter() - started
+
+    texts = load_corpus()
+    return {
+        "corpus_size": len(texts),
+        "load_seconds": {"model": round(model_load, 3), "lexicon": round(lexicon_load, 3)},
+        "latency": benchmark_latency(texts, repeats),
+        "stages": benchmark_stages(texts),
+        "accuracy": evaluate_accuracy(load_gold(), show_errors),
+    }
+
+def find_regressions(results, baseline, tolerance=0.1):
+    """
+    List the ways results are worse than a saved baseline
+
+    Accuracy may not drop at all; uncached p50 and p99 may grow by at most
+    the tolerance.
+
+    Args:
+        results (dict): Results from run()
+        baseline (dict): Earlier results from run()
+        tolerance (float): Allowed relative latency increase
+
+    Returns:
+        list: Descriptions of each regression
+    """
+    regressions = []
+    for field, value in baseline["accuracy"].items():
+        if results["accuracy"].get(field, 0) < value:
+            regressions.append(f"accuracy of {field} fell from {value} to {results['accuracy'].get(field, 0)}")
+    for key in ["p50_ms", "p99_ms"]:
+        before = baseline["latency"]["uncached"][key]
+        after = results["latency"]["uncached"][key]
+        if after > before * (1 + tolerance):
+            regressions.append(f"uncached {key} rose from {before} to {after}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark medication extraction speed and accuracy on the bundled corpus")
+    parser.add_argument("--repeats", type=int, default=3, help="Cached passes over the corpus")
+    parser.add_argument("--show-errors", action="store_true", help="Print every field that disagrees with the gold labels")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Fail if accuracy or latency regressed against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative latency increase over the baseline")
+    args = parser.parse_args()
+
+    results = run(args.repeats, args.show_errors)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
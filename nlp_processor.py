@@ -1,81 +1,450 @@
-import spacy
+import os
 import re
-from nltk.tokenize import word_tokenize
-import nltk
-
-# Download required NLTK resources
-import nltk
-nltk.download('punkt')
-
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-# Load spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    # If model is not available, download it
-    import os
-    os.system("python -m spacy download en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+import threading
+from collections import Counter
+import drug_lexicon
+import extraction_cache
+
+# spaCy pipeline used for extraction
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+
+# Components only the medicine name fallbacks need, and the annotation each one sets
+BATCH_DISABLED_COMPONENTS = ["parser", "ner"]
+COMPONENT_ANNOTATIONS = {"parser": "DEP", "ner": "ENT_IOB"}
+
+# Bump whenever a change to the extractor changes its output, so cached results are not reused
+EXTRACTOR_VERSION = "6"
+
+# Results of recent extractions; set EXTRACTION_CACHE_FILE to keep them across restarts
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", 1024))
+EXTRACTION_CACHE_FILE = os.getenv("EXTRACTION_CACHE_FILE", "")
+
+# Set NLP_SERVICE_URL (e.g. http://127.0.0.1:8766) to extract in a running
+# nlp_service instead of in this process; extraction falls back to this process
+# if the service is unavailable
+NLP_SERVICE_URL = os.getenv("NLP_SERVICE_URL", "")
+NLP_SERVICE_TIMEOUT = float(os.getenv("NLP_SERVICE_TIMEOUT", 10))
+
+# Separates one medication's clause from the next; a period only outside decimals
+CLAUSE_SEPARATOR = re.compile(r"[,;]|\.(?!\d)|\b(?:and|then|plus|also)\b", re.IGNORECASE)
+
+# Separators and joiners left at either end of a clause, e.g. ", and" before "also"
+CLAUSE_EDGES = re.compile(
+    r"^(?:[\s,;]|\b(?:and|then|plus|also)\b)+|(?:[\s,;]|\b(?:and|then|plus|also)\b)+$", re.IGNORECASE
+)
+
+# Extraction tiers, cheapest first
+TIERS = ["rules", "tokens", "spacy"]
+
+# Models are loaded on first use, once per process
+_nlp = None
+_tokenizer = None
+_load_lock = threading.Lock()
+_warm_up_thread = None
+_tier_counts = Counter()
+_stats_lock = threading.Lock()
+_cache = extraction_cache.ExtractionCache(EXTRACTION_CACHE_SIZE, EXTRACTION_CACHE_FILE or None)
+
+class NLPResourceError(RuntimeError):
+    """
+    Raised when the spaCy model needed for extraction is not installed
+    """
+
+def get_nlp():
+    """
+    Get the spaCy pipeline, loading it on first use
+
+    Returns:
+        spacy.language.Language: The loaded pipeline
+
+    Raises:
+        NLPResourceError: If spaCy or the model is not installed
+    """
+    global _nlp
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                try:
+                    import spacy # type: ignore
+                    _nlp = spacy.load(SPACY_MODEL)
+                except (ImportError, OSError) as e:
+                    raise NLPResourceError(
+                        f"spaCy model '{SPACY_MODEL}' is not available. "
+                        f"Install it with: python -m spacy download {SPACY_MODEL}"
+                    ) from e
+    return _nlp
+
+def get_tokenizer():
+    """
+    Get a blank English tokenizer, for the tiers that only need tokens
+
+    Returns:
+        spacy.tokenizer.Tokenizer: The tokenizer, loaded on first use
+
+    Raises:
+        NLPResourceError: If spaCy is not installed
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _load_lock:
+            if _tokenizer is None:
+                try:
+                    import spacy # type: ignore
+                    _tokenizer = spacy.blank("en").tokenizer
+                except ImportError as e:
+                    raise NLPResourceError("spaCy is not installed. Install it with: pip install spacy") from e
+    return _tokenizer
+
+def warm_up(background=False):
+    """
+    Load the NLP model and drug lexicon matchers ahead of the first extraction
+
+    Args:
+        background (bool): Load in a daemon thread and return immediately
+
+    Raises:
+        NLPResourceError: If a resource is missing (foreground only)
+    """
+    global _warm_up_thread
+    if background:
+        with _load_lock:
+            if _warm_up_thread is None:
+                _warm_up_thread = threading.Thread(target=_warm_up_quietly, name="nlp-warm-up", daemon=True)
+                _warm_up_thread.start()
+        return
+    get_nlp()("Take one tablet of aspirin daily.")
+    drug_lexicon.get_fuzzy_matcher()
+
+def _warm_up_quietly():
+    try:
+        warm_up()
+    except NLPResourceError as e:
+        print(f"NLP warm-up failed: {e}")
 
 def extract_medication_info(text):
     """
     Extract medication information from text using NLP techniques
     
+    Results are cached by normalized text, so reruns and repeated
+    utterances skip extraction entirely. With NLP_SERVICE_URL set, cache
+    misses are extracted by the NLP service.
+    
     Args:
         text (str): The input text containing medication information
         
     Returns:
         dict: A dictionary containing extracted medication details
     """
-    # Process the text with spaCy
-    doc = nlp(text)
+    normalized = extraction_cache.normalize_text(text)
+    version = _cache_version()
+    medication_info = _cache.get(version, normalized)
+    if medication_info is None:
+        if NLP_SERVICE_URL:
+            medication_info = _extract_in_service(normalized)
+        else:
+            medication_info = extract_medication_info_tiered(normalized)[0]
+        _cache.put(version, normalized, medication_info)
+    return medication_info
+
+def _cache_version():
+    """
+    Key identifying what extraction results depend on: the extractor, the
+    spaCy model, the drug lexicon's names and the fuzzy matcher's settings
+    """
+    return (
+        f"{EXTRACTOR_VERSION}/{SPACY_MODEL}/{drug_lexicon.get_lexicon().fingerprint}/"
+        f"{drug_lexicon.FUZZY_MIN_CONFIDENCE}/{drug_lexicon.FUZZY_MAX_EDITS}"
+    )
+
+def _extract_in_service(text):
+    """
+    Extract through the NLP service, or in this process if it is unavailable
+    """
+    import nlp_service
+    try:
+        return nlp_service.extract_remote([text], NLP_SERVICE_URL, NLP_SERVICE_TIMEOUT)[0]
+    except nlp_service.NLPServiceError as e:
+        print(f"Extracting in-process: {e}")
+        return extract_medication_info_tiered(text)[0]
+
+def get_cache_stats():
+    """
+    Get the extraction cache's hit and miss counters
     
-    # Initialize result dictionary
-    medication_info = {
-        "medicine_name": "",
-        "dosage": "",
-        "frequency": "",
-        "timing": "",
-        "duration": "",
-        "instructions": ""
-    }
+    Returns:
+        dict: Hits, misses, hit rate and current size
+    """
+    return _cache.stats()
+
+def clear_cache():
+    """
+    Empty the in-memory extraction cache and reset its counters
+    """
+    _cache.clear()
+
+def find_medicine_mentions(text):
+    """
+    Find where medicines are named in text, exactly or approximately
     
-    # Extract medicine name (look for medication names)
-    medicine_name = extract_medicine_name(doc)
-    if medicine_name:
-        medication_info["medicine_name"] = medicine_name
+    Names separated only by whitespace (e.g. "Lantus insulin") count as
+    one mention.
     
-    # Extract dosage (look for numbers followed by units like mg, ml, etc.)
-    dosage = extract_dosage(doc)
-    if dosage:
-        medication_info["dosage"] = dosage
+    Args:
+        text (str): The input text
+        
+    Returns:
+        list: (start, end) spans in text order
+    """
+    spans = [(match.start, match.end) for match in drug_lexicon.get_lexicon().find_mentions(text)]
+    for match in drug_lexicon.get_fuzzy_matcher().find_all(text):
+        if all(match.end <= start or match.start >= end for start, end in spans):
+            spans.append((match.start, match.end))
+    spans.sort()
+
+    mentions = []
+    for start, end in spans:
+        if mentions and not text[mentions[-1][1]:start].strip():
+            mentions[-1] = (mentions[-1][0], end)
+        else:
+            mentions.append((start, end))
+    return mentions
+
+def segment_medications(text):
+    """
+    Split an utterance into one clause per medication it names
     
-    # Extract frequency (how often to take the medication)
-    frequency = extract_frequency(doc)
-    if frequency:
-        medication_info["frequency"] = frequency
+    Each clause runs up to the last separator ("and", "then", a comma...)
+    before the next medicine name, or up to the name itself if there is no
+    separator, without separators left at either end. When only the last
+    clause says how or when to take it ("Take aspirin and ibuprofen with
+    food"), that tail is added to the clauses that say neither.
     
-    # Extract timing (when to take the medication)
-    timing = extract_timing(doc)
-    if timing:
-        medication_info["timing"] = timing
+    Args:
+        text (str): The input text
+        
+    Returns:
+        list: Clauses in order; the whole text if it names at most one medicine
+    """
+    mentions = find_medicine_mentions(text)
+    if len(mentions) < 2:
+        return [text]
+
+    clauses = []
+    clause_start = 0
+    for (_, previous_end), (next_start, _) in zip(mentions, mentions[1:]):
+        boundary_start = boundary_end = next_start
+        for separator in CLAUSE_SEPARATOR.finditer(text, previous_end, next_start):
+            boundary_start, boundary_end = separator.start(), separator.end()
+        clauses.append(CLAUSE_EDGES.sub("", text[clause_start:boundary_start]))
+        clause_start = boundary_end
+    clauses.append(CLAUSE_EDGES.sub("", text[clause_start:]))
+
+    tail = SCHEDULE_PATTERN.search(text.lower(), mentions[-1][1])
+    if tail:
+        clauses[:-1] = [
+            clause if SCHEDULE_PATTERN.search(clause.lower()) else f"{clause} {text[tail.start():].strip()}"
+            for clause in clauses[:-1]
+        ]
+    return clauses
+
+def extract_medications(text):
+    """
+    Extract every medication named in an utterance
     
-    # Extract duration (how long to take the medication)
-    duration = extract_duration(doc)
-    if duration:
-        medication_info["duration"] = duration
+    Args:
+        text (str): The input text, possibly naming several medications
+        
+    Returns:
+        list: Extracted medication details, one dictionary per medication
+    """
+    return [extract_medication_info(clause) for clause in segment_medications(text)]
+
+def extract_medication_info_tiered(text):
+    """
+    Extract medication information, running only as much of spaCy as needed
     
-    # Extract special instructions
-    instructions = extract_instructions(doc)
-    if instructions:
-        medication_info["instructions"] = instructions
+    The "rules" tier uses the drug lexicon and the field patterns alone.
+    If a field is still empty and its keyword fallback could fire, or an
+    instruction keyword occurs, the text is tokenized ("tokens" tier). The
+    full pipeline only runs when no lexicon name is found and the medicine
+    name needs the entity, fuzzy, lemma or noun-chunk fallbacks ("spacy"
+    tier). Results are the same in every tier.
     
+    Args:
+        text (str): The input text containing medication information
+        
+    Returns:
+        tuple: (dict of extracted medication details, tier that answered)
+    """
+    fields, medicine_name, tier = _rules_tier(text)
+    doc = None
+    if tier == "spacy":
+        doc = get_nlp()(text)
+        medicine_name = extract_medicine_name(doc)
+    elif tier == "tokens":
+        doc = get_tokenizer()(text)
+    return _finish_tiered(fields, medicine_name, tier, doc), tier
+
+def extract_medication_info_tiered_batch(texts, batch_size=64):
+    """
+    Extract medication information from many texts with the tiered extractor
+    
+    Only the texts that reach the "spacy" tier go through nlp.pipe, together,
+    with the parser and NER disabled as in extract_medication_info_batch.
+    
+    Args:
+        texts (iterable): Input texts containing medication information
+        batch_size (int): Number of texts spaCy processes at a time
+        
+    Returns:
+        list: Extracted medication details for each text, in input order
+    """
+    texts = list(texts)
+    planned = [_rules_tier(text) for text in texts]
+    docs = {}
+    needs_spacy = [i for i, (_, _, tier) in enumerate(planned) if tier == "spacy"]
+    if needs_spacy:
+        nlp = get_nlp()
+        disabled = [name for name in BATCH_DISABLED_COMPONENTS if name in nlp.pipe_names]
+        pipe = nlp.pipe((texts[i] for i in needs_spacy), batch_size=batch_size, disable=disabled)
+        docs = dict(zip(needs_spacy, pipe))
+
+    results = []
+    for i, (fields, medicine_name, tier) in enumerate(planned):
+        doc = docs.get(i)
+        if tier == "spacy":
+            medicine_name = extract_medicine_name(doc)
+        elif tier == "tokens":
+            doc = get_tokenizer()(texts[i])
+        results.append(_finish_tiered(fields, medicine_name, tier, doc))
+    return results
+
+def _rules_tier(text):
+    """
+    Run the lexicon and field patterns, and pick the tier that finishes the text
+    """
+    lowered = text.lower()
+    fields = FIELD_SCANNER.scan(lowered)
+    medicine_name = lexicon_medicine_name(text)
+    # Instruction keywords add to the pattern matches; the other fallbacks only fill empty fields
+    needs_tokens = any(
+        (field == "instructions" or not fields[field]) and trigger.search(lowered)
+        for field, trigger in FALLBACK_TRIGGERS.items()
+    )
+    if not medicine_name:
+        return fields, medicine_name, "spacy"
+    if needs_tokens:
+        return fields, medicine_name, "tokens"
+    return fields, medicine_name, "rules"
+
+def _finish_tiered(fields, medicine_name, tier, doc):
+    """
+    Count the tier and assemble the result, filling fields from the doc if any
+    """
+    with _stats_lock:
+        _tier_counts[tier] += 1
+
+    medication_info = {
+        "medicine_name": medicine_name,
+        "suggested_name": suggest_medicine_name(medicine_name) if tier == "spacy" else "",
+    }
+    medication_info.update(_merge_fallbacks(fields, doc))
     return medication_info
 
+def get_tier_stats():
+    """
+    Count how many extractions each tier answered since start or the last reset
+    
+    Returns:
+        dict: Count per tier, plus the total
+    """
+    with _stats_lock:
+        stats = {tier: _tier_counts[tier] for tier in TIERS}
+    stats["total"] = sum(stats.values())
+    return stats
+
+def reset_tier_stats():
+    """
+    Reset the per-tier extraction counters
+    """
+    with _stats_lock:
+        _tier_counts.clear()
+
+def extract_medication_info_batch(texts, batch_size=64, n_process=1):
+    """
+    Extract medication information from many texts, streaming the results
+    
+    Texts go through nlp.pipe with the parser and NER disabled; they only
+    feed the medicine name fallbacks, so each doc that reaches one of those
+    gets the component applied on its own.
+    
+    Args:
+        texts (iterable): Input texts containing medication information
+        batch_size (int): Number of texts spaCy processes at a time
+        n_process (int): Worker processes for spaCy, -1 for one per CPU
+        
+    Yields:
+        dict: Extracted medication details for each text, in input order
+    """
+    nlp = get_nlp()
+    disabled = [name for name in BATCH_DISABLED_COMPONENTS if name in nlp.pipe_names]
+    for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disabled):
+        medicine_name = extract_medicine_name(doc)
+        medication_info = {"medicine_name": medicine_name, "suggested_name": suggest_medicine_name(medicine_name)}
+        medication_info.update(extract_fields(doc))
+        yield medication_info
+
+def _ensure_component(doc, name):
+    """
+    Apply a skipped pipeline component to a doc, along with any skipped
+    component before it in the pipeline (NER relies on the parser's
+    sentence boundaries)
+    """
+    for component_name, component in get_nlp().pipeline:
+        annotation = COMPONENT_ANNOTATIONS.get(component_name)
+        if annotation and not doc.has_annotation(annotation):
+            component(doc)
+        if component_name == name:
+            return
+
+def lexicon_medicine_name(text):
+    """
+    Find a medicine name from the drug lexicon in text, keeping the casing
+    used in the text
+    
+    Args:
+        text (str): The input text
+        
+    Returns:
+        str: The medicine name, or "" if none was found
+    """
+    match = drug_lexicon.get_lexicon().longest_match(text)
+    if match:
+        return match.text
+    return ""
+
+def suggest_medicine_name(medicine_name):
+    """
+    Suggest the lexicon name an extracted medicine name may be a misspelling of
+    
+    ASR output often misspells names, but a drug missing from the lexicon
+    can also be close to one in it, so the suggestion is only shown for the
+    user to confirm and never replaces the name.
+    
+    Args:
+        medicine_name (str): The medicine name as extracted
+        
+    Returns:
+        str: The closest lexicon name, or "" if the name is in the lexicon
+            or nothing is close enough
+    """
+    if not medicine_name or drug_lexicon.get_lexicon().longest_match(medicine_name):
+        return ""
+    fuzzy_match = drug_lexicon.get_fuzzy_matcher().best_match(medicine_name)
+    if fuzzy_match:
+        return fuzzy_match.name
+    return ""
+
 def extract_medicine_name(doc):
     """
     Extract medicine name from the spaCy doc
@@ -86,52 +455,22 @@ def extract_medicine_name(doc):
     Returns:
         str: Extracted medicine name
     """
-    # Common medicine names to look for - this is a limited list, in a real app this would be more comprehensive
-    common_medicines = [
-        "lisinopril", "metformin", "amlodipine", "atorvastatin", "metoprolol", 
-        "omeprazole", "losartan", "albuterol", "gabapentin", "hydrochlorothiazide",
-        "simvastatin", "levothyroxine", "montelukast", "pantoprazole", "furosemide",
-        "citalopram", "sertraline", "fluoxetine", "tramadol", "amoxicillin",
-        "azithromycin", "ibuprofen", "acetaminophen", "aspirin", "naproxen",
-        "clonazepam", "alprazolam", "zolpidem", "prednisone", "hydrocortisone",
-        "insulin", "warfarin", "xarelto", "eliquis", "plavix",
-        "crestor", "lipitor", "zocor", "nexium", "prilosec",
-        "protonix", "synthroid", "ventolin", "advair", "spiriva",
-        "flovent", "lantus", "humalog", "novolog", "tresiba",
-        "januvia", "jardiance", "trulicity", "ozempic", "farxiga",
-        "eliquis", "xarelto", "pradaxa", "savaysa", "brilinta",
-        "plavix", "effient", "brilinta", "multivitamin", "vitamin d",
-        "calcium", "iron", "zinc", "magnesium", "potassium",
-        "coq10", "fish oil", "omega-3", "probiotics", "melatonin"
-    ]
-    
     # Look for known medicine names
-    text_lower = doc.text.lower()
-    for medicine in common_medicines:
-        pattern = r'\b' + re.escape(medicine) + r'\b'
-        match = re.search(pattern, text_lower)
-        if match:
-            # Get the actual casing from the original text
-            start, end = match.span()
-            # Find all words in the text
-            words = word_tokenize(doc.text)
-            # Find words that overlap with the match
-            medicine_words = []
-            for word in words:
-                word_lower = word.lower()
-                if word_lower in medicine:
-                    medicine_words.append(word)
-            
-            if medicine_words:
-                return " ".join(medicine_words)
-            else:
-                return medicine.title()  # Use title case if we can't find the exact word
+    medicine_name = lexicon_medicine_name(doc.text)
+    if medicine_name:
+        return medicine_name
     
     # If no common medicine is found, try to extract entities that might be medicines
+    _ensure_component(doc, "ner")
     for ent in doc.ents:
         if ent.label_ in ["PRODUCT", "ORG", "GPE"]:  # These entity types might capture medicine names
             return ent.text
     
+    # Then for words close to a known name, as heard; suggest_medicine_name gives the name
+    fuzzy_match = drug_lexicon.get_fuzzy_matcher().best_match(doc.text)
+    if fuzzy_match:
+        return fuzzy_match.text
+    
     # If still not found, look for words following "take", "taking", "prescribed"
     for i, token in enumerate(doc):
         if token.lemma_ in ["take", "prescribe"] and i < len(doc) - 1:
@@ -147,199 +486,228 @@ def extract_medicine_name(doc):
                 return med_span.text
     
     # If no specific pattern is found, try to extract nouns that might be medicines
+    _ensure_component(doc, "parser")
     for chunk in doc.noun_chunks:
         if len(chunk) <= 3:  # Limit to reasonable length noun phrases
             return chunk.text
     
     return ""
 
-def extract_dosage(doc):
+# Field patterns, in priority order; for the single-value fields the first pattern that matches wins
+DOSAGE_PATTERNS = [
+    r'\d+\s*(?:mg|mcg|g|ml|cc|tablet|pill|capsule|dose|tab|cap)s?(?:\b|\s)',
+    r'(?:one|two|three|four|five|half|quarter)\s+(?:tablet|pill|capsule|dose|tab|cap)s?(?:\b|\s)',
+    r'\d+/\d+\s*(?:mg|mcg|g|ml|cc)(?:\b|\s)'
+]
+
+FREQUENCY_PATTERNS = [
+    r'(?:once|twice|three times|four times)\s+(?:a|per|every)\s+day',
+    r'(?:once|twice|three times|four times)\s+daily',
+    r'(?:every|each)\s+(?:day|morning|evening|night|afternoon)',
+    r'(?:every|each)\s+\d+\s+hours',
+    r'(?:every|each)\s+\d+\s*(?:hr|hrs)',
+    r'\d+\s+times\s+(?:a|per)\s+day',
+    r'\d+\s+times\s+daily',
+    r'(?:daily|weekly|monthly|yearly)'
+]
+
+TIMING_PATTERNS = [
+    r'(?:in|at|during)\s+(?:the\s+)?(?:morning|evening|night|afternoon|noon|midday|midnight|bedtime)',
+    r'(?:before|after|with)\s+(?:meals?|breakfast|lunch|dinner|food|eating)',
+    r'(?:on|with)\s+(?:an?\s+)?(?:empty\s+stomach|full\s+stomach)',
+    r'(?:before|at|after)\s+bedtime'
+]
+
+DURATION_PATTERNS = [
+    r'for\s+\d+\s+(?:day|week|month|year)s?',
+    r'for\s+(?:a|one|two|three|four|five|six|seven|eight|nine|ten)\s+(?:day|week|month|year)s?',
+    r'until\s+\w+',
+    r'continue\s+for\s+\d+\s+(?:day|week|month|year)s?',
+    r'(?:long[-\s]term|short[-\s]term|maintenance)\s+(?:treatment|therapy|medication|use)?'
+]
+
+# Every match of every instruction pattern is kept
+INSTRUCTION_PATTERNS = [
+    r'(?:with|without)\s+(?:food|water|milk)',
+    r'(?:do\s+not|don\'t)\s+(?:take|use|consume)\s+with\s+\w+',
+    r'avoid\s+\w+',
+    r'store\s+(?:in|at)\s+\w+',
+    r'(?:shake|swallow|chew|dissolve)\s+(?:well|thoroughly)?',
+    r'keep\s+(?:out\s+of\s+reach|refrigerated|at\s+room\s+temperature)',
+    r'take\s+on\s+an\s+empty\s+stomach',
+    r'take\s+with\s+food',
+    r'do\s+not\s+crush\s+or\s+chew',
+    r'may\s+cause\s+drowsiness'
+]
+
+# Says how or when to take a medication, as opposed to what and how much
+SCHEDULE_PATTERN = re.compile("|".join(FREQUENCY_PATTERNS + TIMING_PATTERNS + DURATION_PATTERNS + INSTRUCTION_PATTERNS))
+
+# Token fallbacks, used when no pattern matched a field
+DOSAGE_UNITS = {"mg", "mcg", "g", "ml", "cc", "tablet", "pill", "capsule", "dose", "tab", "cap"}
+FREQUENCY_KEYWORDS = {"daily", "weekly", "monthly", "twice", "thrice", "once", "every"}
+TIMING_KEYWORDS = {"morning", "evening", "night", "afternoon", "breakfast", "lunch", "dinner", "bedtime", "noon", "midnight"}
+DURATION_KEYWORDS = {"until", "long-term", "short-term", "maintenance", "continue", "ongoing", "chronic"}
+INSTRUCTION_KEYWORDS = {"avoid", "store", "shake", "swallow", "chew", "dissolve", "keep", "refrigerate", "caution", "warning"}
+
+# Words spaCy's English like_num accepts, besides digits and ordinals like "2nd"
+NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+    "nineteen", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
+    "hundred", "thousand", "million", "billion", "trillion", "quadrillion", "quintillion",
+    "sextillion", "septillion", "octillion", "nonillion", "decillion", "gajillion", "bazillion",
+    "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth",
+    "eleventh", "twelfth", "thirteenth", "fourteenth", "fifteenth", "sixteenth", "seventeenth",
+    "eighteenth", "nineteenth", "twentieth", "thirtieth", "fortieth", "fiftieth", "sixtieth",
+    "seventieth", "eightieth", "ninetieth", "hundredth", "thousandth", "millionth", "billionth",
+    "trillionth", "quadrillionth", "quintillionth", "sextillionth", "septillionth", "octillionth",
+    "nonillionth", "decillionth", "gajillionth", "bazillionth",
+}
+
+def _words(keywords):
+    return "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+
+# Any token like_num could accept, or the digits ending one
+_NUMBER = rf"(?:\d(?:st|nd|rd|th)?|\b(?:{_words(NUMBER_WORDS)})\b)"
+
+# A field's token fallback can only fire where its trigger matches the lowercased text:
+# a unit right after a number, a whole keyword, or "for" followed by a number
+FALLBACK_TRIGGERS = {
+    "dosage": re.compile(rf"{_NUMBER}[.,]?\s*(?:{_words(DOSAGE_UNITS)})\b"),
+    "frequency": re.compile(rf"\b(?:{_words(FREQUENCY_KEYWORDS)})\b"),
+    "timing": re.compile(rf"\b(?:{_words(TIMING_KEYWORDS)})\b"),
+    "duration": re.compile(rf"\b(?:{_words(DURATION_KEYWORDS)})\b|\bfor\s+[+\-~]?{_NUMBER}"),
+    "instructions": re.compile(rf"\b(?:{_words(INSTRUCTION_KEYWORDS)})\b"),
+}
+
+class FieldScanner:
     """
-    Extract dosage information from the spaCy doc
-    
-    Args:
-        doc: spaCy doc object
-        
-    Returns:
-        str: Extracted dosage information
-    """
-    # Common patterns for dosage
-    dosage_patterns = [
-        r'\d+\s*(?:mg|mcg|g|ml|cc|tablet|pill|capsule|dose|tab|cap)s?(?:\b|\s)',
-        r'(?:one|two|three|four|five|half|quarter)\s+(?:tablet|pill|capsule|dose|tab|cap)s?(?:\b|\s)',
-        r'\d+/\d+\s*(?:mg|mcg|g|ml|cc)(?:\b|\s)'
-    ]
-    
-    text = doc.text.lower()
-    
-    for pattern in dosage_patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(0).strip()
-    
-    # Look for numbers followed by units
-    for token in doc:
-        if token.like_num:
-            # Check if the next token is a unit
-            if token.i + 1 < len(doc) and doc[token.i + 1].text.lower() in ["mg", "mcg", "g", "ml", "cc", "tablet", "pill", "capsule", "dose", "tab", "cap"]:
-                return token.text + " " + doc[token.i + 1].text
-    
-    return ""
+    Single-pass scanner for the dosage, frequency, timing, duration and
+    instruction patterns
 
-def extract_frequency(doc):
+    Every pattern becomes a named group inside an optional lookahead, behind
+    a gate that only stops where at least one pattern matches. Each stop
+    therefore reports every pattern matching at that position, exactly as a
+    separate re.search or re.finditer from there would. One finditer over
+    the text then yields, per pattern, its leftmost match (for the
+    first-match-wins fields) and its non-overlapping matches (for
+    instructions).
     """
-    Extract frequency information from the spaCy doc
-    
-    Args:
-        doc: spaCy doc object
-        
-    Returns:
-        str: Extracted frequency information
-    """
-    # Common patterns for frequency
-    frequency_patterns = [
-        r'(?:once|twice|three times|four times)\s+(?:a|per|every)\s+day',
-        r'(?:once|twice|three times|four times)\s+daily',
-        r'(?:every|each)\s+(?:day|morning|evening|night|afternoon)',
-        r'(?:every|each)\s+\d+\s+hours',
-        r'(?:every|each)\s+\d+\s*(?:hr|hrs)',
-        r'\d+\s+times\s+(?:a|per)\s+day',
-        r'\d+\s+times\s+daily',
-        r'(?:daily|weekly|monthly|yearly)'
-    ]
-    
-    text = doc.text.lower()
-    
-    for pattern in frequency_patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(0).strip()
-    
-    # Look for frequency-related keywords
-    frequency_keywords = ["daily", "weekly", "monthly", "twice", "thrice", "once", "every"]
-    for token in doc:
-        if token.text.lower() in frequency_keywords:
-            # Try to get context by looking at nearby tokens
-            start = max(0, token.i - 2)
-            end = min(len(doc), token.i + 3)
-            return doc[start:end].text
-    
-    return ""
 
-def extract_timing(doc):
+    def __init__(self, search_fields, collect_field, collect_patterns):
+        self.search_fields = [field for field, _ in search_fields]
+        self.collect_field = collect_field
+        self._groups = []
+        patterns = []
+        for field, field_patterns in search_fields + [(collect_field, collect_patterns)]:
+            for priority, pattern in enumerate(field_patterns):
+                self._groups.append((f"p{len(patterns)}", field, priority))
+                patterns.append(pattern)
+
+        gate = "|".join(f"(?:{pattern})" for pattern in patterns)
+        lookaheads = "".join(
+            f"(?:(?=(?P<{name}>{pattern})))?" for (name, _, _), pattern in zip(self._groups, patterns)
+        )
+        self._regex = re.compile(f"(?=(?:{gate})){lookaheads}")
+
+    def scan(self, text):
+        """
+        Scan lowercased text for every field
+
+        Args:
+            text (str): Lowercased text
+
+        Returns:
+            dict: The first-priority match of each single-value field ("" if
+                none), and a list of every instruction match
+        """
+        first = {}
+        collected = {}
+        resume_at = {}
+        for match in self._regex.finditer(text):
+            for name, field, priority in self._groups:
+                start, end = match.span(name)
+                if start < 0:
+                    continue
+                if field != self.collect_field:
+                    first.setdefault((field, priority), (start, end))
+                elif start >= resume_at.get(priority, 0):
+                    # Same non-overlapping walk re.finditer makes for this pattern alone
+                    collected.setdefault(priority, []).append((start, end))
+                    resume_at[priority] = end if end > start else end + 1
+
+        results = {}
+        for field in self.search_fields:
+            spans = [span for (name, _), span in sorted(first.items()) if name == field]
+            results[field] = text[spans[0][0]:spans[0][1]].strip() if spans else ""
+        results[self.collect_field] = [
+            text[start:end].strip()
+            for priority in sorted(collected)
+            for start, end in collected[priority]
+        ]
+        return results
+
+FIELD_SCANNER = FieldScanner(
+    [
+        ("dosage", DOSAGE_PATTERNS),
+        ("frequency", FREQUENCY_PATTERNS),
+        ("timing", TIMING_PATTERNS),
+        ("duration", DURATION_PATTERNS),
+    ],
+    "instructions",
+    INSTRUCTION_PATTERNS
+)
+
+def _scan_tokens(doc):
     """
-    Extract timing information from the spaCy doc
-    
-    Args:
-        doc: spaCy doc object
-        
-    Returns:
-        str: Extracted timing information
-    """
-    # Common patterns for timing
-    timing_patterns = [
-        r'(?:in|at|during)\s+(?:the\s+)?(?:morning|evening|night|afternoon|noon|midday|midnight|bedtime)',
-        r'(?:before|after|with)\s+(?:meals?|breakfast|lunch|dinner|food|eating)',
-        r'(?:on|with)\s+(?:an?\s+)?(?:empty\s+stomach|full\s+stomach)',
-        r'(?:before|at|after)\s+bedtime'
-    ]
-    
-    text = doc.text.lower()
-    
-    for pattern in timing_patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(0).strip()
-    
-    # Look for time-related keywords
-    timing_keywords = ["morning", "evening", "night", "afternoon", "breakfast", "lunch", "dinner", "bedtime", "noon", "midnight"]
+    Collect the token fallback of every field in one walk over the doc
+    """
+    fallbacks = {"dosage": "", "frequency": "", "timing": "", "duration": "", "instructions": []}
+    n_tokens = len(doc)
     for token in doc:
-        if token.text.lower() in timing_keywords:
-            # Try to get context by looking at nearby tokens
-            start = max(0, token.i - 2)
-            end = min(len(doc), token.i + 3)
-            return doc[start:end].text
-    
-    return ""
+        word = token.text.lower()
+        i = token.i
+        if not fallbacks["dosage"] and token.like_num and i + 1 < n_tokens and doc[i + 1].text.lower() in DOSAGE_UNITS:
+            fallbacks["dosage"] = token.text + " " + doc[i + 1].text
+        if not fallbacks["frequency"] and word in FREQUENCY_KEYWORDS:
+            fallbacks["frequency"] = doc[max(0, i - 2):min(n_tokens, i + 3)].text
+        if not fallbacks["timing"] and word in TIMING_KEYWORDS:
+            fallbacks["timing"] = doc[max(0, i - 2):min(n_tokens, i + 3)].text
+        if not fallbacks["duration"] and (
+            word in DURATION_KEYWORDS or (word == "for" and i + 1 < n_tokens and doc[i + 1].like_num)
+        ):
+            fallbacks["duration"] = doc[i:min(n_tokens, i + 5)].text
+        if word in INSTRUCTION_KEYWORDS:
+            fallbacks["instructions"].append(doc[i:min(n_tokens, i + 5)].text)
+    return fallbacks
 
-def extract_duration(doc):
+def extract_fields(doc):
     """
-    Extract duration information from the spaCy doc
+    Extract dosage, frequency, timing, duration and special instructions
+    with one pass over the text and one over the tokens
     
     Args:
         doc: spaCy doc object
         
     Returns:
-        str: Extracted duration information
-    """
-    # Common patterns for duration
-    duration_patterns = [
-        r'for\s+\d+\s+(?:day|week|month|year)s?',
-        r'for\s+(?:a|one|two|three|four|five|six|seven|eight|nine|ten)\s+(?:day|week|month|year)s?',
-        r'until\s+\w+',
-        r'continue\s+for\s+\d+\s+(?:day|week|month|year)s?',
-        r'(?:long[-\s]term|short[-\s]term|maintenance)\s+(?:treatment|therapy|medication|use)?'
-    ]
-    
-    text = doc.text.lower()
-    
-    for pattern in duration_patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(0).strip()
-    
-    # Look for duration-related keywords
-    duration_keywords = ["until", "long-term", "short-term", "maintenance", "continue", "ongoing", "chronic"]
-    for token in doc:
-        if token.text.lower() in duration_keywords or (token.text.lower() == "for" and token.i + 1 < len(doc) and doc[token.i + 1].like_num):
-            # Try to get context by looking at nearby tokens
-            start = token.i
-            end = min(len(doc), token.i + 5)
-            return doc[start:end].text
-    
-    return ""
+        dict: The extracted fields, "" where nothing was found
+    """
+    return _merge_fallbacks(FIELD_SCANNER.scan(doc.text.lower()), doc)
 
-def extract_instructions(doc):
+def _merge_fallbacks(fields, doc):
     """
-    Extract special instructions from the spaCy doc
-    
-    Args:
-        doc: spaCy doc object
-        
-    Returns:
-        str: Extracted special instructions
-    """
-    # Common patterns for special instructions
-    instruction_patterns = [
-        r'(?:with|without)\s+(?:food|water|milk)',
-        r'(?:do\s+not|don\'t)\s+(?:take|use|consume)\s+with\s+\w+',
-        r'avoid\s+\w+',
-        r'store\s+(?:in|at)\s+\w+',
-        r'(?:shake|swallow|chew|dissolve)\s+(?:well|thoroughly)?',
-        r'keep\s+(?:out\s+of\s+reach|refrigerated|at\s+room\s+temperature)',
-        r'take\s+on\s+an\s+empty\s+stomach',
-        r'take\s+with\s+food',
-        r'do\s+not\s+crush\s+or\s+chew',
-        r'may\s+cause\s+drowsiness'
-    ]
-    
-    text = doc.text.lower()
-    
-    all_instructions = []
-    for pattern in instruction_patterns:
-        matches = re.finditer(pattern, text)
-        for match in matches:
-            all_instructions.append(match.group(0).strip())
-    
-    # Look for instruction-related keywords
-    instruction_keywords = ["avoid", "store", "shake", "swallow", "chew", "dissolve", "keep", "refrigerate", "caution", "warning"]
-    for token in doc:
-        if token.text.lower() in instruction_keywords:
-            # Try to get context by looking at nearby tokens
-            start = token.i
-            end = min(len(doc), token.i + 5)
-            instruction = doc[start:end].text
-            if instruction not in all_instructions:
-                all_instructions.append(instruction)
-    
-    return "; ".join(all_instructions) if all_instructions else ""
+    Fill the fields the scanner left empty from the token fallbacks, if a
+    doc is given, and join the instructions
+    """
+    instructions = fields["instructions"]
+    if doc is not None:
+        fallbacks = _scan_tokens(doc)
+        for field in FIELD_SCANNER.search_fields:
+            if not fields[field]:
+                fields[field] = fallbacks[field]
+        for instruction in fallbacks["instructions"]:
+            if instruction not in instructions:
+                instructions.append(instruction)
+    fields["instructions"] = "; ".join(instructions)
+    return fields
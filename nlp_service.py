@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import nlp_processor
+
+# Where the service listens (8765 is the fake alert call server's default)
+NLP_SERVICE_HOST = os.getenv("NLP_SERVICE_HOST", "127.0.0.1")
+NLP_SERVICE_PORT = int(os.getenv("NLP_SERVICE_PORT", 8766))
+
+# Worker processes, each holding its own copy of the spaCy model
+NLP_SERVICE_WORKERS = int(os.getenv("NLP_SERVICE_WORKERS", 2))
+
+# Concurrent requests are gathered into one nlp.pipe call of up to this many
+# texts, waiting at most this long after the first one arrives
+NLP_SERVICE_MAX_BATCH = int(os.getenv("NLP_SERVICE_MAX_BATCH", 32))
+NLP_SERVICE_MAX_WAIT_MS = float(os.getenv("NLP_SERVICE_MAX_WAIT_MS", 5))
+
+# A request gets a 503 if its texts are not extracted within this many seconds
+NLP_SERVICE_REQUEST_TIMEOUT = float(os.getenv("NLP_SERVICE_REQUEST_TIMEOUT", 30))
+
+class NLPServiceError(RuntimeError):
+    """
+    Raised when the NLP service cannot be reached or fails a request
+    """
+
+def _init_worker():
+    """
+    Load the model in a worker process before it takes requests
+    """
+    try:
+        nlp_processor.warm_up()
+    except nlp_processor.NLPResourceError as e:
+        # Requests will fail with the same error and get a 503
+        print(f"NLP worker warm-up failed: {e}")
+
+def _extract_batch(texts):
+    """
+    Extract medication information for a batch of texts in a worker process,
+    sending only the texts that need spaCy through nlp.pipe
+    """
+    return nlp_processor.extract_medication_info_tiered_batch(texts, batch_size=len(texts))
+
+class MicroBatcher:
+    """
+    Groups texts from concurrent requests into batches for the worker pool
+
+    Each worker has at most one batch in flight, so while every worker is
+    busy new texts wait in the queue and go out together in the next batch.
+    """
+
+    def __init__(self, workers=NLP_SERVICE_WORKERS, max_batch=NLP_SERVICE_MAX_BATCH, max_wait_ms=NLP_SERVICE_MAX_WAIT_MS):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.texts = 0
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self._pool_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(workers)
+        self._thread = threading.Thread(target=self._run, name="nlp-batcher", daemon=True)
+        self._thread.start()
+
+    def warm_up(self):
+        """
+        Start every worker and wait until each has loaded the model
+        """
+        futures = [self._pool.submit(_extract_batch, ["Take aspirin daily."]) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, text):
+        """
+        Queue a text for extraction
+
+        Args:
+            text (str): Text containing medication information
+
+        Returns:
+            Future: Resolves to the extracted medication details
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            # Wait for a free worker, taking whatever else arrived meanwhile
+            self._slots.acquire()
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self.batches += 1
+            self.texts += len(batch)
+            pool = self._pool
+            try:
+                pool_future = pool.submit(_extract_batch, [text for text, _ in batch])
+            except Exception as e:
+                # A worker died and broke the pool; fail this batch and start over with a new one
+                self._slots.release()
+                self._fail(batch, e)
+                self._restart_pool(pool)
+                continue
+            pool_future.add_done_callback(lambda done, batch=batch, pool=pool: self._resolve(done, batch, pool))
+
+    def _restart_pool(self, broken_pool):
+        """
+        Replace a broken worker pool, unless another thread already has
+        """
+        with self._pool_lock:
+            if self._pool is broken_pool:
+                print("NLP worker pool broke; starting new workers")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+                broken_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fail(self, batch, error):
+        for _, future in batch:
+            future.set_exception(error)
+
+    def _resolve(self, pool_future, batch, pool):
+        self._slots.release()
+        try:
+            results = pool_future.result()
+        except BrokenProcessPool as e:
+            self._fail(batch, e)
+            self._restart_pool(pool)
+            return
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        """
+        Get batching counters
+
+        Returns:
+            dict: Batches sent, texts processed and mean batch size
+        """
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
+
+class NLPRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /extract with {"texts": [...]} returns {"results": [...]};
+    GET /health returns the batching counters
+    """
+
+    batcher = None
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send(404, {"error": "not found"})
+            return
+        self._send(200, dict(self.batcher.stats(), model=nlp_processor.SPACY_MODEL))
+
+    def do_POST(self):
+        if self.path != "/extract":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            texts = json.loads(self.rfile.read(length))["texts"]
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": "expected a JSON body with a list of texts"})
+            return
+        deadline = time.monotonic() + NLP_SERVICE_REQUEST_TIMEOUT
+        try:
+            futures = [self.batcher.submit(str(text)) for text in texts]
+            results = [future.result(timeout=max(deadline - time.monotonic(), 0)) for future in futures]
+        except FutureTimeoutError:
+            self._send(503, {"error": f"extraction timed out after {NLP_SERVICE_REQUEST_TIMEOUT:g}s"})
+            return
+        except nlp_processor.NLPResourceError as e:
+            self._send(503, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+            return
+        self._send(200, {"results": results})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Requests are too frequent to log one line each
+        pass
+
+def serve(host=NLP_SERVICE_HOST, port=NLP_SERVICE_PORT, workers=NLP_SERVICE_WORKERS):
+    """
+    Run the NLP service until interrupted
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on
+        workers (int): Worker processes to start
+    """
+    batcher = MicroBatcher(workers)
+    print(f"Loading spaCy model '{nlp_processor.SPACY_MODEL}' in {workers} worker processes...")
+    batcher.warm_up()
+    NLPRequestHandler.batcher = batcher
+    server = ThreadingHTTPServer((host, port), NLPRequestHandler)
+    server.daemon_threads = True
+    print(f"NLP service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.shutdown()
+
+def extract_remote(texts, url, timeout=10):
+    """
+    Extract medication information for texts using a running NLP service
+
+    Args:
+        texts (list): Texts containing medication information
+        url (str): Base URL of the service, e.g. "http://127.0.0.1:8766"
+        timeout (float): Seconds to wait for the response
+
+    Returns:
+        list: Extracted medication details for each text, in order
+
+    Raises:
+        NLPServiceError: If the service is unreachable or the request fails
+    """
+    request = urllib.request.Request(
+        url.rstrip("/") + "/extract",
+        data=json.dumps({"texts": list(texts)}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())["results"]
+    except urllib.error.HTTPError as e:
+        raise NLPServiceError(f"NLP service returned {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+    except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+        raise NLPServiceError(f"NLP service at {url} is unavailable: {e}") from e
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve medication extraction from a pool of preloaded spaCy workers")
+    parser.add_argument("--host", default=NLP_SERVICE_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=NLP_SERVICE_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=NLP_SERVICE_WORKERS, help="Worker processes to start")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
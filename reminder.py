@@ -1,163 +1,262 @@
 import streamlit as st
 import database
-from datetime import datetime, timedelta
-import utils
+import adherence
+import schedule_index
+import dose_schedule
+import alert_outbox
+from datetime import datetime
 
-def check_medication_reminders(username):
+def _dose_taken(occurrence, taken_slots):
     """
-    Check for medication reminders that need to be sent
-    
+    Check whether a dose was recorded as taken, either for its own slot or
+    as an untyped dose of that medication
+    """
+    return (
+        (occurrence.medication_id, occurrence.slot) in taken_slots
+        or (occurrence.medication_id, "") in taken_slots
+    )
+
+def _added_before(med, due):
+    """
+    Check that a dose was due after its medication was added; earlier doses
+    were never the user's to take
+    """
+    return not med.get('created_at') or due >= datetime.strptime(med['created_at'], "%Y-%m-%d %H:%M:%S")
+
+def _dose_key(kind, medication, slot, when):
+    """
+    Outbox dedupe key for one notification about one dose, or None if the
+    dose is not known
+    """
+    if when is None:
+        return None
+    return f"{kind}:{medication['id']}:{slot or ''}:{when.date().isoformat()}"
+
+def _user_doses_today(medications, today):
+    """
+    Yield (medication, occurrence) pairs for one user's doses due today
+    """
+    # Filter for medications that should be active today
+    active_medications = schedule_index.get_index(medications).active_on(today)
+    for med in active_medications:
+        for occurrence in dose_schedule.occurrences_on(med, today):
+            if _added_before(med, occurrence.due):
+                yield med, occurrence
+
+def _reminders_from(doses, taken_slots, current_time):
+    """
+    Select the doses whose reminder is due now
+
     Args:
-        username (str): The username to check reminders for
-        
+        doses (iterable): (medication, occurrence) pairs due today
+        taken_slots (set): (medication_id, slot) pairs already taken today
+        current_time (datetime): Current time
+
     Returns:
         list: List of medication reminders that should be sent
     """
-    # Get today's date
-    today = datetime.now().date()
-    current_time = datetime.now()
-    
-    # Get the user's medications
-    medications = database.get_medications(username)
-    
-    # Filter for medications that should be active today
-    active_medications = []
-    for med in medications:
-        start_date = datetime.strptime(med['start_date'], "%Y-%m-%d").date()
-        end_date = datetime.strptime(med['end_date'], "%Y-%m-%d").date()
-        
-        if start_date <= today <= end_date:
-            active_medications.append(med)
-    
-    # Determine which medications need reminders
     reminders_to_send = []
-    for med in active_medications:
-        # Parse the timing to determine when the medication should be taken
-        timing_info = utils.parse_medication_time(med['timing'])
-        
-        # Check if medication has been taken today
-        if med.get('taken', False):
-            taken_time = datetime.strptime(med.get('taken_at', ''), "%Y-%m-%d %H:%M:%S").date()
-            if taken_time == today:
-                continue  # Skip if already taken today
-        
-        # Determine the time to send the reminder based on the timing information
-        reminder_time = None
-        
-        if timing_info['period'] == 'morning':
-            reminder_time = datetime.combine(today, datetime.strptime('08:00', '%H:%M').time())
-        elif timing_info['period'] == 'afternoon':
-            reminder_time = datetime.combine(today, datetime.strptime('12:00', '%H:%M').time())
-        elif timing_info['period'] == 'evening':
-            reminder_time = datetime.combine(today, datetime.strptime('18:00', '%H:%M').time())
-        elif timing_info['period'] == 'night':
-            reminder_time = datetime.combine(today, datetime.strptime('20:00', '%H:%M').time())
-        else:
-            # Default to a standard reminder time if period not specified
-            reminder_time = datetime.combine(today, datetime.strptime('09:00', '%H:%M').time())
-        
-        # If the timing is related to a meal, adjust the reminder time
-        if timing_info['event'] == 'breakfast':
-            reminder_time = datetime.combine(today, datetime.strptime('07:30', '%H:%M').time())
-        elif timing_info['event'] == 'lunch':
-            reminder_time = datetime.combine(today, datetime.strptime('12:30', '%H:%M').time())
-        elif timing_info['event'] == 'dinner':
-            reminder_time = datetime.combine(today, datetime.strptime('18:30', '%H:%M').time())
-        
-        # If the relation is "before" or "after", adjust the time accordingly
-        if timing_info['relation'] == 'before' and timing_info['event']:
-            reminder_time -= timedelta(minutes=30)
-        elif timing_info['relation'] == 'after' and timing_info['event']:
-            reminder_time += timedelta(minutes=30)
+    for med, occurrence in doses:
+        # Skip doses that have already been taken
+        if _dose_taken(occurrence, taken_slots):
+            continue
         
         # Check if it's time to send the reminder (within 15 minutes of the scheduled time)
-        time_diff = abs((current_time - reminder_time).total_seconds() / 60)
+        time_diff = abs((current_time - occurrence.due).total_seconds() / 60)
         
         if time_diff <= 15:
             reminders_to_send.append({
                 'medication': med,
-                'reminder_time': reminder_time,
-                'timing_info': timing_info
+                'reminder_time': occurrence.due,
+                'slot': occurrence.slot
             })
     
     return reminders_to_send
 
+def _missed_from(doses, taken_slots, current_time):
+    """
+    Select the doses that are past their cutoff and were not taken
+
+    Args:
+        doses (iterable): (medication, occurrence) pairs due today
+        taken_slots (set): (medication_id, slot) pairs already taken today
+        current_time (datetime): Current time
+
+    Returns:
+        list: List of medications that were missed
+    """
+    missed_medications = []
+    for med, occurrence in doses:
+        # Skip doses that have already been taken
+        if _dose_taken(occurrence, taken_slots):
+            continue
+        
+        # Check if the current time is past the cutoff time
+        if current_time > occurrence.cutoff:
+            missed_medications.append({
+                'medication': med,
+                'cutoff_time': occurrence.cutoff,
+                'slot': occurrence.slot
+            })
+    
+    return missed_medications
+
+def check_medication_reminders(username, current_time=None):
+    """
+    Check for medication reminders that need to be sent
+    
+    Args:
+        username (str): The username to check reminders for
+        current_time (datetime): Time to evaluate at, defaults to now
+        
+    Returns:
+        list: List of medication reminders that should be sent
+    """
+    current_time = current_time or datetime.now()
+    today = current_time.date()
+    
+    # Get the user's medications
+    medications = database.get_medications(username)
+    
+    # Doses already recorded for today
+    taken_slots = adherence.get_taken_slots(username, today)
+    
+    return _reminders_from(_user_doses_today(medications, today), taken_slots, current_time)
+
 def send_reminder_notification(reminder):
     """
-    Send a reminder notification
+    Queue a reminder call to the user in the alert outbox
     
     Args:
         reminder (dict): The reminder information
     
     Returns:
-        bool: True if notification was sent successfully, False otherwise
+        bool: True if the notification was queued, False otherwise
     """
-    # In a real application, this would send an actual notification
-    # For this demo, we'll just return True
+    medication = reminder['medication']
+    profile = database.get_user_profile(medication['username'])
+    if not profile or not profile.get('phone'):
+        return False
+
+    message = f"Reminder: it's time to take {medication['medicine_name']} ({medication['dosage']})."
+    contact = {'name': profile.get('name', medication['username']), 'phone': profile['phone']}
+    alert_outbox.enqueue_alert(
+        'reminder', medication['username'], [contact], message,
+        _dose_key('reminder', medication, reminder.get('slot'), reminder.get('reminder_time'))
+    )
     return True
 
-def check_missed_medications(username):
+def check_missed_medications(username, current_time=None):
     """
     Check for medications that were missed
     
     Args:
         username (str): The username to check for missed medications
+        current_time (datetime): Time to evaluate at, defaults to now
         
     Returns:
         list: List of medications that were missed
     """
-    # Get today's date
-    today = datetime.now().date()
-    current_time = datetime.now()
+    current_time = current_time or datetime.now()
+    today = current_time.date()
     
     # Get the user's medications
     medications = database.get_medications(username)
     
-    # Filter for medications that should be active today
-    active_medications = []
-    for med in medications:
-        start_date = datetime.strptime(med['start_date'], "%Y-%m-%d").date()
-        end_date = datetime.strptime(med['end_date'], "%Y-%m-%d").date()
+    # Doses already recorded for today
+    taken_slots = adherence.get_taken_slots(username, today)
+    
+    return _missed_from(_user_doses_today(medications, today), taken_slots, current_time)
+
+def _group_doses_today(today):
+    """
+    Stream every user's medications once and group today's doses by username
+    
+    Dose times are turned into datetimes once per distinct recurrence rule
+    for the run, not once per medication.
+    
+    Args:
+        today (date): The day to evaluate
         
-        if start_date <= today <= end_date:
-            active_medications.append(med)
+    Returns:
+        dict: Mapping of username to list of (medication, occurrence) pairs
+    """
+    today_str = today.strftime("%Y-%m-%d")
+    time_tables = {}
+    doses_by_user = {}
     
-    # Determine which medications were missed
-    missed_medications = []
-    for med in active_medications:
-        # Parse the timing to determine when the medication should have been taken
-        timing_info = utils.parse_medication_time(med['timing'])
+    for med in database.iter_all_medications():
+        # ISO dates compare correctly as strings
+        if not med['start_date'] <= today_str <= med['end_date']:
+            continue
         
-        # Check if medication has been taken today
-        if med.get('taken', False):
-            taken_time = datetime.strptime(med.get('taken_at', ''), "%Y-%m-%d %H:%M:%S").date()
-            if taken_time == today:
-                continue  # Skip if already taken today
+        elapsed = (today - datetime.strptime(med['start_date'], "%Y-%m-%d").date()).days
+        doses = dose_schedule.doses_on(dose_schedule.get_rule(med), elapsed)
+        if not doses:
+            continue
         
-        # Determine the cutoff time for considering the medication missed
-        cutoff_time = None
+        key = tuple((dose['time'], dose['cutoff'], dose['slot']) for dose in doses)
+        table = time_tables.get(key)
+        if table is None:
+            table = time_tables[key] = sorted(
+                (
+                    datetime.combine(today, datetime.strptime(dose_time, "%H:%M").time()),
+                    datetime.combine(today, datetime.strptime(cutoff, "%H:%M").time()),
+                    slot
+                )
+                for dose_time, cutoff, slot in key
+            )
         
-        if timing_info['period'] == 'morning':
-            cutoff_time = datetime.combine(today, datetime.strptime('11:00', '%H:%M').time())
-        elif timing_info['period'] == 'afternoon':
-            cutoff_time = datetime.combine(today, datetime.strptime('15:00', '%H:%M').time())
-        elif timing_info['period'] == 'evening':
-            cutoff_time = datetime.combine(today, datetime.strptime('21:00', '%H:%M').time())
-        elif timing_info['period'] == 'night':
-            cutoff_time = datetime.combine(today, datetime.strptime('23:59', '%H:%M').time())
-        else:
-            # Default cutoff time if period not specified
-            cutoff_time = datetime.combine(today, datetime.strptime('22:00', '%H:%M').time())
+        user_doses = doses_by_user.setdefault(med['username'], [])
+        for due, cutoff, slot in table:
+            if _added_before(med, due):
+                user_doses.append((med, dose_schedule.Occurrence(med['id'], due, cutoff, slot)))
+    
+    return doses_by_user
+
+def check_all_medication_reminders(current_time=None):
+    """
+    Check reminders for every user in a single pass over the medication store
+    
+    Args:
+        current_time (datetime): Time to evaluate at, defaults to now
         
-        # Check if the current time is past the cutoff time
-        if current_time > cutoff_time:
-            missed_medications.append({
-                'medication': med,
-                'cutoff_time': cutoff_time,
-                'timing_info': timing_info
-            })
+    Returns:
+        dict: Mapping of username to list of medication reminders that should be sent
+    """
+    current_time = current_time or datetime.now()
+    today = current_time.date()
+    doses_by_user = _group_doses_today(today)
+    taken_by_user = adherence.get_all_taken_slots(today)
     
-    return missed_medications
+    reminders = {}
+    for username, doses in doses_by_user.items():
+        user_reminders = _reminders_from(doses, taken_by_user.get(username, set()), current_time)
+        if user_reminders:
+            reminders[username] = user_reminders
+    return reminders
+
+def check_all_missed_medications(current_time=None):
+    """
+    Check missed doses for every user in a single pass over the medication store
+    
+    Args:
+        current_time (datetime): Time to evaluate at, defaults to now
+        
+    Returns:
+        dict: Mapping of username to list of medications that were missed
+    """
+    current_time = current_time or datetime.now()
+    today = current_time.date()
+    doses_by_user = _group_doses_today(today)
+    taken_by_user = adherence.get_all_taken_slots(today)
+    
+    missed = {}
+    for username, doses in doses_by_user.items():
+        user_missed = _missed_from(doses, taken_by_user.get(username, set()), current_time)
+        if user_missed:
+            missed[username] = user_missed
+    return missed
 
 def notify_emergency_contacts(username, missed_medication):
     """
@@ -168,7 +267,7 @@ def notify_emergency_contacts(username, missed_medication):
         missed_medication (dict): Information about the missed medication
         
     Returns:
-        bool: True if notification was sent successfully, False otherwise
+        bool: True if the notification was queued, False otherwise
     """
     # Get emergency contacts
     emergency_contacts = database.get_emergency_contacts(username)
@@ -176,18 +275,35 @@ def notify_emergency_contacts(username, missed_medication):
     if not emergency_contacts:
         return False
     
-    # In a real application, this would send an actual notification to the emergency contacts
-    # For this demo, we'll just return True if there are emergency contacts
-    return len(emergency_contacts) > 0
-
-import twilio_alert
+    medication = missed_medication['medication']
+    alert_message = (
+        f"This is an emergency notification for {username}. "
+        f"A scheduled dose of {medication['medicine_name']} was missed. Please check immediately."
+    )
+    alert_outbox.enqueue_alert(
+        'emergency', username, emergency_contacts, alert_message,
+        _dose_key('missed', medication, missed_medication.get('slot'), missed_medication.get('cutoff_time'))
+    )
+    return True
 
 def trigger_emergency_alert(username):
+    """
+    Queue emergency calls to all of a user's emergency contacts
+    
+    The calls are placed by the alert outbox worker, so they survive a
+    failed attempt or a restart.
+    
+    Args:
+        username (str): The username
+        
+    Returns:
+        bool: True if the alert was queued, False if there are no contacts
+    """
     emergency_contacts = database.get_emergency_contacts(username)
     if not emergency_contacts:
         return False
 
     alert_message = f"This is an emergency notification for {username}. A scheduled medication was missed. Please check immediately."
-    twilio_alert.call_emergency_contacts(emergency_contacts, alert_message)
+    alert_outbox.enqueue_alert('emergency', username, emergency_contacts, alert_message)
     return True
 
@@ -0,0 +1,408 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+import adherence
+import alert_outbox
+import database
+import dose_schedule
+import reminder
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# How often the scheduler checks the store for changes made by other processes
+STORE_POLL_SECONDS = float(os.getenv("REMINDER_STORE_POLL_SECONDS", 30))
+
+# Only the process holding this lock dispatches; the others retry this often
+# in case the leader exits
+LEADER_LOCK_FILE = os.path.join("data", "reminder_scheduler.lock")
+LEADER_RETRY_SECONDS = float(os.getenv("REMINDER_LEADER_RETRY_SECONDS", 30))
+
+# Calling emergency contacts about a missed dose must be switched on
+# explicitly; otherwise missed doses are only logged
+AUTO_ESCALATE = os.getenv("REMINDER_AUTO_ESCALATE", "").lower() in ("1", "true", "yes")
+
+def _try_lock(path):
+    """
+    Take an exclusive lock on a file without waiting
+
+    The operating system releases the lock when the process exits, so a
+    crashed leader does not block the others.
+
+    Returns:
+        file: The open lock file, which holds the lock until closed, or None
+            if another process holds it
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle = open(path, 'a')
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+def _log_missed(username, missed_medication):
+    """
+    Default missed-dose handler while automatic escalation is disabled
+    """
+    medication = missed_medication['medication']
+    print(f"Missed dose of {medication['medicine_name']} for {username} (escalation disabled)")
+    return False
+
+def _fingerprint(medications):
+    """
+    Key identifying the fields a user's reminders depend on
+    """
+    return tuple(sorted(
+        (
+            med['id'], med['start_date'], med['end_date'], med.get('frequency', ''),
+            med.get('timing', ''), med.get('updated_at', '')
+        )
+        for med in medications
+    ))
+
+class ReminderScheduler:
+    """
+    Process-wide reminder scheduler driven by a min-heap of due events
+
+    The heap holds at most one pending "reminder" event per medication plus
+    the "missed" checks of doses that were reminded but not yet past their
+    cutoff. The worker thread sleeps until the earliest deadline, so work is
+    proportional to due events. Changes to a user's medications bump that
+    user's generation; stale heap entries are dropped when they surface.
+    Changes made by another process are found by polling the store's
+    version, and only the users whose medications differ are re-queued.
+
+    Every app process and the standalone daemon create a scheduler, but only
+    the one holding the leader lock loads the heap and dispatches, so each
+    reminder and escalation goes out once.
+    """
+
+    def __init__(self, on_reminder=None, on_missed=None):
+        self.on_reminder = on_reminder or reminder.send_reminder_notification
+        if on_missed is None:
+            on_missed = reminder.notify_emergency_contacts if AUTO_ESCALATE else _log_missed
+        self.on_missed = on_missed
+        self._heap = []
+        self._sequence = itertools.count()
+        self._generations = {}
+        self._taken = set()
+        self._taken_day = None
+        self._store_version = None
+        self._fingerprints = {}
+        self._next_poll = 0.0
+        self._leader_lock = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def _push(self, due, kind, username, medication, occurrence):
+        heapq.heappush(self._heap, (
+            due, next(self._sequence), kind, username,
+            self._generations.get(username, 0), medication, occurrence
+        ))
+
+    def _schedule_medication(self, med, now):
+        """
+        Queue the pending missed checks and the next reminder of one medication
+
+        Doses due before the medication was added are skipped, so adding a
+        morning medication at 10:00 does not escalate that morning's dose.
+        """
+        window_start = datetime.combine(now.date(), datetime.min.time())
+        if med.get('created_at'):
+            window_start = max(window_start, datetime.strptime(med['created_at'], "%Y-%m-%d %H:%M:%S"))
+        window_end = datetime.combine(date.fromisoformat(med['end_date']) + timedelta(days=1), datetime.min.time())
+        for occurrence in dose_schedule.iter_occurrences(med, window_start, window_end):
+            if occurrence.due >= now:
+                self._push(occurrence.due, 'reminder', med['username'], med, occurrence)
+                break
+            if occurrence.cutoff > now:
+                self._push(occurrence.cutoff, 'missed', med['username'], med, occurrence)
+
+    def _schedule_after(self, med, occurrence):
+        """
+        Queue the reminder for the dose following an occurrence
+        """
+        window_end = datetime.combine(date.fromisoformat(med['end_date']) + timedelta(days=1), datetime.min.time())
+        following = dose_schedule.iter_occurrences(med, occurrence.due + timedelta(seconds=1), window_end)
+        next_occurrence = next(following, None)
+        if next_occurrence is not None:
+            self._push(next_occurrence.due, 'reminder', med['username'], med, next_occurrence)
+
+    def _medications_by_user(self):
+        by_user = {}
+        for med in database.iter_all_medications():
+            by_user.setdefault(med['username'], []).append(med)
+        return by_user
+
+    def _requeue(self, username, medications, now):
+        """
+        Drop a user's queued events and queue their medications again
+        """
+        self._generations[username] = self._generations.get(username, 0) + 1
+        if medications:
+            self._fingerprints[username] = _fingerprint(medications)
+        else:
+            self._fingerprints.pop(username, None)
+        for med in medications:
+            self._schedule_medication(med, now)
+
+    def load_all(self):
+        """
+        Build the heap from every user's medications in one pass over the store
+        """
+        now = datetime.now()
+        with self._condition:
+            # Read the version first, so a write during the load shows up on the next check
+            self._store_version = database.medications_version()
+            self._heap = []
+            self._fingerprints = {}
+            for username, medications in self._medications_by_user().items():
+                self._requeue(username, medications, now)
+            self._condition.notify()
+
+    def reload_changed_users(self):
+        """
+        Re-queue the users whose medications changed in the store since the
+        last load, e.g. from another process
+
+        Returns:
+            list: Usernames that were re-queued
+        """
+        with self._condition:
+            version = database.medications_version()
+            if version == self._store_version:
+                return []
+            self._store_version = version
+            by_user = self._medications_by_user()
+            changed = [
+                username for username in sorted(set(by_user) | set(self._fingerprints))
+                if _fingerprint(by_user.get(username, [])) != self._fingerprints.get(username, ())
+            ]
+            now = datetime.now()
+            for username in changed:
+                self._requeue(username, by_user.get(username, []), now)
+            self._condition.notify()
+            return changed
+
+    def refresh_user(self, username):
+        """
+        Re-queue one user's medications after they were added or deleted
+
+        Args:
+            username (str): The username whose medications changed
+        """
+        if not self.is_leader:
+            # The leader finds the change when it polls the store
+            return
+        medications = database.get_medications(username)
+        now = datetime.now()
+        with self._condition:
+            self._requeue(username, medications, now)
+            self._condition.notify()
+
+    def mark_taken(self, medication_id, slot, day=None):
+        """
+        Record a taken dose so its pending reminder and missed check are skipped
+
+        Args:
+            medication_id (str): Medication ID
+            slot (str): Dose slot that was taken
+            day (date): Day of the dose, defaults to today
+        """
+        today = datetime.now().date()
+        with self._condition:
+            if today != self._taken_day:
+                # Past days' doses are settled; the dose event store still has them
+                self._taken = {entry for entry in self._taken if entry[2] >= today}
+                self._taken_day = today
+            self._taken.add((medication_id, slot, day or today))
+
+    def _is_taken(self, username, occurrence):
+        day = occurrence.due.date()
+        if (occurrence.medication_id, occurrence.slot, day) in self._taken:
+            return True
+        # Doses marked from another process only show up in the dose event store
+        taken_slots = adherence.get_taken_slots(username, day)
+        return (
+            (occurrence.medication_id, occurrence.slot) in taken_slots
+            or (occurrence.medication_id, "") in taken_slots
+        )
+
+    def _next_due_event(self):
+        """
+        Block until the earliest event is due and pop it, or return None on stop
+        """
+        with self._condition:
+            while self._running:
+                until_poll = self._next_poll - time.monotonic()
+                if until_poll <= 0:
+                    self._next_poll = time.monotonic() + STORE_POLL_SECONDS
+                    changed = self.reload_changed_users()
+                    if changed:
+                        print(f"Medications changed for {len(changed)} users; reminders re-queued")
+                    continue
+                if not self._heap:
+                    self._condition.wait(until_poll)
+                    continue
+                delay = (self._heap[0][0] - datetime.now()).total_seconds()
+                if delay > 0:
+                    self._condition.wait(min(delay, until_poll))
+                    continue
+                due, _, kind, username, generation, med, occurrence = heapq.heappop(self._heap)
+                if generation != self._generations.get(username, 0):
+                    continue
+                if kind == 'reminder':
+                    self._push(occurrence.cutoff, 'missed', username, med, occurrence)
+                    self._schedule_after(med, occurrence)
+                return kind, username, med, occurrence
+            return None
+
+    def run(self):
+        """
+        Dispatch due events until stop() is called
+        """
+        while True:
+            event = self._next_due_event()
+            if event is None:
+                return
+            kind, username, med, occurrence = event
+            try:
+                if self._is_taken(username, occurrence):
+                    continue
+                if kind == 'reminder':
+                    self.on_reminder({'medication': med, 'reminder_time': occurrence.due, 'slot': occurrence.slot})
+                else:
+                    self.on_missed(username, {'medication': med, 'cutoff_time': occurrence.cutoff, 'slot': occurrence.slot})
+            except Exception as e:
+                print(f"Error dispatching {kind} for {username}: {e}")
+
+    @property
+    def is_leader(self):
+        return self._leader_lock is not None
+
+    def _lead(self):
+        """
+        Wait for the leader lock, then load every medication and dispatch
+        """
+        with self._condition:
+            while self._running and self._leader_lock is None:
+                self._leader_lock = _try_lock(LEADER_LOCK_FILE)
+                if self._leader_lock is None:
+                    self._condition.wait(LEADER_RETRY_SECONDS)
+            if not self._running:
+                return
+        print("Reminder scheduler took the leader lock; dispatching reminders")
+        self.load_all()
+        self._next_poll = time.monotonic() + STORE_POLL_SECONDS
+        self.catch_up()
+        self.run()
+
+    def catch_up(self, now=None):
+        """
+        Dispatch what fell due today while no scheduler was leading: the
+        reminders of the last few minutes and the doses already missed
+
+        The heap only holds events from now on, so these would otherwise be
+        lost across a restart or a change of leader. The outbox drops alerts
+        the previous leader already queued.
+
+        Args:
+            now (datetime): Time to evaluate at, defaults to now
+        """
+        now = now or datetime.now()
+        events = [
+            ('reminder', username, event)
+            for username, reminders in reminder.check_all_medication_reminders(now).items()
+            for event in reminders
+            if event['reminder_time'] < now
+        ] + [
+            ('missed', username, event)
+            for username, missed in reminder.check_all_missed_medications(now).items()
+            for event in missed
+        ]
+        for kind, username, event in events:
+            try:
+                if kind == 'reminder':
+                    self.on_reminder(event)
+                else:
+                    self.on_missed(username, event)
+            except Exception as e:
+                print(f"Error dispatching {kind} for {username}: {e}")
+
+    def start(self):
+        """
+        Start the worker thread, which dispatches once it holds the leader lock
+        """
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._lead, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the worker thread and give up the leader lock
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._leader_lock is not None:
+            self._leader_lock.close()
+            self._leader_lock = None
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """
+    Get the process-wide scheduler, starting it on first use
+
+    Returns:
+        ReminderScheduler: The running scheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReminderScheduler()
+            _scheduler.start()
+        return _scheduler
+
+def refresh_user(username):
+    """
+    Tell the running scheduler that a user's medications changed
+    """
+    if _scheduler is not None:
+        _scheduler.refresh_user(username)
+
+def mark_taken(medication_id, slot):
+    """
+    Tell the running scheduler that a dose was taken
+    """
+    if _scheduler is not None:
+        _scheduler.mark_taken(medication_id, slot)
+
+if __name__ == "__main__":
+    database.initialize_database()
+    get_scheduler()
+    alert_outbox.get_worker()
+    print("Reminder scheduler running. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        _scheduler.stop()
@@ -0,0 +1,218 @@
+from bisect import bisect_right
+from collections import namedtuple
+import copy
+from datetime import date
+import threading
+import numpy as np # type: ignore
+import dose_schedule
+
+# Number of medication lists whose index is kept around between reruns
+INDEX_CACHE_SIZE = 64
+
+# Time-of-day buckets used by the calendar views, in display order
+BUCKETS = ["Morning", "Afternoon", "Evening", "Night"]
+BUCKET_SLOTS = [bucket.lower() for bucket in BUCKETS]
+
+# Materialized schedule: ordinals (D,), per-bucket counts (D, 4), active meds per day (D,)
+ScheduleMatrix = namedtuple("ScheduleMatrix", ["ordinals", "buckets", "totals"])
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _to_ordinal(value):
+    """
+    Convert a date, "YYYY-MM-DD" string or ordinal to a proleptic Gregorian ordinal
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return date.fromisoformat(value).toordinal()
+    return value.toordinal()
+
+class MedicationIntervalIndex:
+    """
+    Interval index over medication [start_date, end_date] ranges
+
+    Dates are parsed once when the index is built. The timeline is cut into
+    elementary segments at every start and every day after an end, and each
+    segment stores the medications whose range covers it, so a day lookup is
+    a binary search. Medications dosed every few days are then kept only on
+    their dose days.
+    """
+
+    def __init__(self, medications):
+        self.medications = list(medications)
+        self.starts = [_to_ordinal(med['start_date']) for med in self.medications]
+        self.ends = [_to_ordinal(med['end_date']) for med in self.medications]
+        self.rules = [dose_schedule.get_rule(med) for med in self.medications]
+
+        events = {}
+        for i, (start, end) in enumerate(zip(self.starts, self.ends)):
+            if start > end:
+                continue
+            events.setdefault(start, []).append((1, i))
+            events.setdefault(end + 1, []).append((-1, i))
+
+        # Sweep the breakpoints in order, keeping the active set as we go
+        self._breakpoints = sorted(events)
+        self._segments = []
+        active = set()
+        for point in self._breakpoints:
+            for delta, i in events[point]:
+                if delta > 0:
+                    active.add(i)
+                else:
+                    active.discard(i)
+            self._segments.append(tuple(sorted(active)))
+
+        # Vectorized view of the same data for schedule materialization, one column per dose
+        columns = [
+            (i, self.starts[i], self.ends[i], rule['interval_days'], dose.get('day', 0), BUCKET_SLOTS.index(dose['slot']))
+            for i, rule in enumerate(self.rules)
+            for dose in rule['doses']
+        ]
+        (
+            self._dose_medications, self._dose_starts, self._dose_ends,
+            self._dose_intervals, self._dose_days, self._dose_buckets
+        ) = np.array(columns, dtype=np.int64).reshape(len(columns), 6).T
+
+    def _segment_at(self, ordinal):
+        position = bisect_right(self._breakpoints, ordinal) - 1
+        if position < 0:
+            return ()
+        return self._dosed_on(self._segments[position], ordinal)
+
+    def _dosed_on(self, segment, ordinal):
+        """
+        Keep the medications of a segment that have a dose on the day
+        """
+        return [i for i in segment if dose_schedule.doses_on(self.rules[i], ordinal - self.starts[i])]
+
+    def active_on(self, day):
+        """
+        Get the medications active on a day
+
+        Args:
+            day (date or str): The day to check
+
+        Returns:
+            list: Medications active on that day, in their original order
+        """
+        return [self.medications[i] for i in self._segment_at(_to_ordinal(day))]
+
+    def count_on(self, day):
+        """
+        Count the medications active on a day
+
+        Args:
+            day (date or str): The day to check
+
+        Returns:
+            int: Number of active medications
+        """
+        return len(self._segment_at(_to_ordinal(day)))
+
+    def counts_between(self, start_date, end_date):
+        """
+        Count active medications for every day of a range in one pass
+
+        Args:
+            start_date (date): First day of the range
+            end_date (date): Last day of the range (inclusive)
+
+        Returns:
+            dict: Mapping of date to number of active medications
+        """
+        first, last = _to_ordinal(start_date), _to_ordinal(end_date)
+        position = bisect_right(self._breakpoints, first) - 1
+        counts = {}
+        for ordinal in range(first, last + 1):
+            while position + 1 < len(self._breakpoints) and self._breakpoints[position + 1] <= ordinal:
+                position += 1
+            count = len(self._dosed_on(self._segments[position], ordinal)) if position >= 0 else 0
+            counts[date.fromordinal(ordinal)] = count
+        return counts
+
+    def active_between(self, start_date, end_date):
+        """
+        Get the active medications for every day of a range in one pass
+
+        Args:
+            start_date (date): First day of the range
+            end_date (date): Last day of the range (inclusive)
+
+        Returns:
+            dict: Mapping of date to list of active medications
+        """
+        first, last = _to_ordinal(start_date), _to_ordinal(end_date)
+        return {
+            date.fromordinal(ordinal): self.active_on(ordinal)
+            for ordinal in range(first, last + 1)
+        }
+
+    def materialize(self, start_date, end_date):
+        """
+        Materialize the schedule for a date range as a days x buckets matrix
+
+        Every day is compared against every dose's start and end ordinals,
+        cycle interval and day within the cycle by broadcasting, and the
+        resulting dose activity is folded into per-medication bucket flags,
+        so a medication counts once per bucket however many doses fall in it.
+
+        Args:
+            start_date (date): First day of the range
+            end_date (date): Last day of the range (inclusive)
+
+        Returns:
+            ScheduleMatrix: Per-day bucket counts and active medication totals
+        """
+        first, last = _to_ordinal(start_date), _to_ordinal(end_date)
+        ordinals = np.arange(first, last + 1, dtype=np.int64)
+        elapsed = ordinals[:, None] - self._dose_starts[None, :] - self._dose_days[None, :]
+        dose_active = (
+            (elapsed >= 0)
+            & (ordinals[:, None] <= self._dose_ends[None, :])
+            & (elapsed % self._dose_intervals[None, :] == 0)
+        )
+        in_bucket = np.zeros((len(ordinals), len(self.medications), len(BUCKETS)), dtype=bool)
+        np.logical_or.at(in_bucket, (slice(None), self._dose_medications, self._dose_buckets), dose_active)
+        totals = in_bucket.any(axis=2).sum(axis=1)
+        return ScheduleMatrix(ordinals, in_bucket.sum(axis=1), totals)
+
+def _data_version(medications):
+    """
+    Key identifying the fields an index depends on
+    """
+    return tuple(
+        (
+            med['id'], med['start_date'], med['end_date'], med.get('frequency', ''),
+            med.get('timing', ''), med.get('updated_at', '')
+        )
+        for med in medications
+    )
+
+def get_index(medications):
+    """
+    Get the interval index for a medication list, building it once per data version
+
+    Args:
+        medications (list): List of medication dictionaries
+
+    Returns:
+        MedicationIntervalIndex: Index over the medications
+    """
+    key = _data_version(medications)
+    with _cache_lock:
+        index = _cache.get(key)
+    if index is None:
+        index = MedicationIntervalIndex(medications)
+        with _cache_lock:
+            if len(_cache) >= INDEX_CACHE_SIZE:
+                _cache.pop(next(iter(_cache)))
+            _cache[key] = index
+        return index
+
+    # Same structure, but hand back the caller's own medication dicts
+    view = copy.copy(index)
+    view.medications = list(medications)
+    return view
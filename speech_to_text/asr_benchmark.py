@@ -0,0 +1,100 @@
+import re
+import json
+import time
+import argparse
+import logging
+
+try:
+    from speech_to_text import model_registry
+    from speech_to_text.audio_corpus import SAMPLING_RATE, AudioCorpus, find_clips, load_clip, is_corpus
+    from speech_to_text.batch_transcribe import transcribe_batch
+except ImportError:
+    # Run as a script from inside speech_to_text
+    import model_registry
+    from audio_corpus import SAMPLING_RATE, AudioCorpus, find_clips, load_clip, is_corpus
+    from batch_transcribe import transcribe_batch
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+def normalize_words(text):
+    """Upper-case text and split it into words, dropping punctuation other than apostrophes."""
+    return re.sub(r"[^A-Z0-9' ]", " ", text.upper()).split()
+
+def word_errors(reference, hypothesis):
+    """Count word substitutions, insertions and deletions between two word lists."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+def benchmark_backend(clips, model_path, backend, load=load_clip):
+    """Transcribe clips one at a time, as the voice path does, and measure load time, real-time factor and WER."""
+    started = time.perf_counter()
+    processor, model = model_registry.get_model_and_processor(model_path, backend)
+    load_seconds = time.perf_counter() - started
+
+    compute_seconds = 0.0
+    audio_seconds = 0.0
+    errors = 0
+    reference_words = 0
+    for clip in clips:
+        audio = load(clip.path)
+        started = time.perf_counter()
+        transcript = transcribe_batch([audio], processor, model)[0]
+        compute_seconds += time.perf_counter() - started
+        audio_seconds += len(audio) / SAMPLING_RATE
+        reference = normalize_words(clip.reference)
+        errors += word_errors(reference, normalize_words(transcript))
+        reference_words += len(reference)
+    return {
+        "backend": backend,
+        "model": model_path,
+        "clips": len(clips),
+        "load_seconds": round(load_seconds, 2),
+        "real_time_factor": round(compute_seconds / audio_seconds, 4) if audio_seconds else None,
+        "wer": round(errors / reference_words, 4) if reference_words else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ASR backends by real-time factor and word error rate")
+    parser.add_argument("--manifest", default="./transcriptions.txt", help="Clips with reference transcripts, or a packed corpus prefix")
+    parser.add_argument("--audio-dir", default="./preprocessed_data", help="Where to look for manifest entries by name")
+    parser.add_argument("--model", default=model_registry.ASR_MODEL_PATH, help="fp32 checkpoint for the torch backend")
+    parser.add_argument("--export-dir", default=None, help="Output of export_asr.py for the other backends (int8 falls back to quantizing --model)")
+    parser.add_argument("--backends", nargs="+", default=model_registry.BACKENDS, choices=model_registry.BACKENDS)
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N clips")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = AudioCorpus(args.manifest) if is_corpus(args.manifest) else None
+    clips = corpus.clips() if corpus else find_clips(args.manifest, args.audio_dir)
+    clips = [clip for clip in clips if clip.reference][:args.limit]
+    load = corpus.load if corpus else load_clip
+    results = []
+    for backend in args.backends:
+        model_path = args.model if backend == "torch" or not args.export_dir else args.export_dir
+        try:
+            results.append(benchmark_backend(clips, model_path, backend, load))
+        except (ImportError, OSError, ValueError) as e:
+            # ImportError when the backend's runtime (e.g. onnxruntime) is not installed
+            logging.warning(f"Skipping {backend} backend: {e}")
+            results.append({"backend": backend, "skipped": str(e)})
+            continue
+        logging.info(json.dumps(results[-1]))
+
+    print(f"{'backend':<10} {'RTF':>8} {'WER':>8} {'load s':>8}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['backend']:<10} skipped: {result['skipped']}")
+            continue
+        print(f"{result['backend']:<10} {result['real_time_factor']:>8} {result['wer']:>8} {result['load_seconds']:>8}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import csv
+import json
+import argparse
+import logging
+from collections import namedtuple
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SAMPLING_RATE = 16000
+AUDIO_EXTENSIONS = (".npy", ".wav")
+
+# A clip to transcribe; reference is the known transcript, or "" if there is none
+Clip = namedtuple("Clip", ["name", "path", "reference"])
+
+# A packed corpus is "<prefix>.npy" holding every clip back to back, plus "<prefix>.index.json"
+DATA_SUFFIX = ".npy"
+INDEX_SUFFIX = ".index.json"
+DTYPES = {"int16": np.int16, "float16": np.float16}
+
+def _resolve(path, base_dir, audio_dir):
+    """Find a manifest entry on disk, next to the manifest or by name in audio_dir."""
+    candidates = [path, os.path.join(base_dir, path)]
+    if audio_dir:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        candidates += [os.path.join(audio_dir, stem + extension) for extension in AUDIO_EXTENSIONS]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def find_clips(source, audio_dir=None):
+    """List clips from a directory of .npy/.wav files, a CSV manifest with a "wav" column, or a "<file> <transcript>" list."""
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.endswith(AUDIO_EXTENSIONS))
+        return [Clip(os.path.splitext(name)[0], os.path.join(source, name), "") for name in names]
+
+    base_dir = os.path.dirname(source)
+    entries = []
+    with open(source, "r", encoding="utf-8") as f:
+        if source.endswith(".csv"):
+            entries = [(row["wav"], row.get("transcript", "")) for row in csv.DictReader(f)]
+        else:
+            for line in f:
+                if line.strip():
+                    fname, _, transcript = line.strip().partition(" ")
+                    entries.append((fname, transcript))
+
+    clips = []
+    missing = []
+    for path, reference in entries:
+        resolved = _resolve(path, base_dir, audio_dir)
+        if resolved is None:
+            missing.append(path)
+            continue
+        clips.append(Clip(os.path.splitext(os.path.basename(path))[0], resolved, reference))
+    if missing:
+        logging.warning(f"Skipping {len(missing)} of {len(entries)} manifest entries with no audio file, e.g. {missing[0]}")
+    return clips
+
+def clip_length(path):
+    """Get a clip's length in samples without loading it."""
+    if path.endswith(".npy"):
+        return len(np.load(path, mmap_mode="r"))
+    import librosa # type: ignore
+    return int(librosa.get_duration(path=path) * SAMPLING_RATE)
+
+def load_clip(path):
+    """Load a clip as mono float32 at the model's sampling rate."""
+    if path.endswith(".npy"):
+        audio = np.load(path)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        if audio.dtype != np.float32:
+            audio = audio.astype(np.float32) / 32768.0 if audio.max() > 1 else audio.astype(np.float32)
+        return audio
+    import librosa # type: ignore
+    audio, _ = librosa.load(path, sr=SAMPLING_RATE)
+    return audio
+
+def pack(clips, prefix, dtype="int16"):
+    """Write clips into one contiguous array file plus an index of names, offsets, lengths and transcripts."""
+    lengths = [clip_length(clip.path) for clip in clips]
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int) if clips else []
+    data = np.lib.format.open_memmap(prefix + DATA_SUFFIX, mode="w+", dtype=DTYPES[dtype], shape=(int(sum(lengths)),))
+    for clip, offset, length in zip(clips, offsets, lengths):
+        audio = load_clip(clip.path)[:length]
+        if dtype == "int16":
+            audio = np.clip(audio, -1.0, 1.0) * 32767
+        data[offset:offset + len(audio)] = audio
+    data.flush()
+    del data
+
+    index = {
+        "dtype": dtype,
+        "sample_rate": SAMPLING_RATE,
+        "clips": [
+            {"name": clip.name, "offset": int(offset), "length": int(length), "reference": clip.reference}
+            for clip, offset, length in zip(clips, offsets, lengths)
+        ],
+    }
+    with open(prefix + INDEX_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    logging.info(f"Packed {len(clips)} clips ({sum(lengths) / SAMPLING_RATE:.1f}s of audio) into {prefix + DATA_SUFFIX}")
+
+class AudioCorpus:
+    """Read-only view of a packed corpus; clips are sliced from a memory map, so only the ones used are paged in."""
+
+    def __init__(self, prefix):
+        with open(prefix + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.dtype = index["dtype"]
+        self.names = [entry["name"] for entry in index["clips"]]
+        self.references = [entry["reference"] for entry in index["clips"]]
+        self.offsets = np.array([entry["offset"] for entry in index["clips"]], dtype=np.int64)
+        self.lengths = np.array([entry["length"] for entry in index["clips"]], dtype=np.int64)
+        self.data = np.load(prefix + DATA_SUFFIX, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.names)
+
+    def clips(self):
+        """List the corpus as clips whose path is their position in the corpus."""
+        return [Clip(name, i, reference) for i, (name, reference) in enumerate(zip(self.names, self.references))]
+
+    def length(self, i):
+        return int(self.lengths[i])
+
+    def raw(self, i):
+        """Get a clip's stored samples as a view into the memory map, without copying."""
+        return self.data[self.offsets[i]:self.offsets[i] + self.lengths[i]]
+
+    def load(self, i):
+        """Get a clip as float32 audio, the form the model takes."""
+        audio = self.raw(i).astype(np.float32)
+        if self.dtype == "int16":
+            audio /= 32767
+        return audio
+
+def is_corpus(prefix):
+    """Check whether a path is the prefix of a packed corpus."""
+    return os.path.exists(prefix + INDEX_SUFFIX)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack audio clips into one memory-mappable corpus file")
+    parser.add_argument("source", help="Directory of .npy/.wav files, CSV manifest with a wav column, or '<file> <transcript>' list")
+    parser.add_argument("--audio-dir", default="./preprocessed_data", help="Where to look for manifest entries by name")
+    parser.add_argument("--output", default="./audio_corpus", help="Output prefix; writes <prefix>.npy and <prefix>.index.json")
+    parser.add_argument("--dtype", default="int16", choices=list(DTYPES), help="Sample type to store")
+    args = parser.parse_args()
+    pack(find_clips(args.source, args.audio_dir), args.output, args.dtype)
+
+if __name__ == "__main__":
+    main()
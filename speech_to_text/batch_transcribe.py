@@ -0,0 +1,97 @@
+import sys
+import json
+import time
+import argparse
+import logging
+import torch
+
+try:
+    from speech_to_text import model_registry
+    from speech_to_text.audio_corpus import SAMPLING_RATE, AudioCorpus, find_clips, clip_length, load_clip, is_corpus
+except ImportError:
+    # Run as a script from inside speech_to_text
+    import model_registry
+    from audio_corpus import SAMPLING_RATE, AudioCorpus, find_clips, clip_length, load_clip, is_corpus
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+def make_batches(lengths, batch_size=16, max_batch_seconds=160):
+    """Group clip indices longest first, so each batch pads to a similar length and stays under the padded-audio budget."""
+    max_batch_samples = max_batch_seconds * SAMPLING_RATE
+    batches = []
+    batch = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        # The first clip in a batch is its longest, so it sets the padded length
+        if batch and (len(batch) == batch_size or lengths[batch[0]] * (len(batch) + 1) > max_batch_samples):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def transcribe_batch(audios, processor, model):
+    """Transcribe several clips in one padded forward pass."""
+    # Models whose feature extractor normalizes per layer (e.g. wav2vec2-base) were
+    # trained without attention masks and expect plain zero padding instead
+    use_mask = getattr(processor.feature_extractor, "return_attention_mask", False)
+    inputs = processor(
+        audios, sampling_rate=SAMPLING_RATE, return_tensors="pt",
+        padding=True, return_attention_mask=use_mask,
+    )
+    with torch.inference_mode():
+        if use_mask:
+            logits = model(inputs.input_values, attention_mask=inputs.attention_mask).logits
+        else:
+            logits = model(inputs.input_values).logits
+    predicted_ids = torch.argmax(logits, dim=-1)
+    return processor.batch_decode(predicted_ids)
+
+def transcribe_clips(clips, output, processor, model, batch_size=16, max_batch_seconds=160, corpus=None):
+    """Transcribe clips batch by batch, writing one JSON line per clip as each batch finishes; clips come from corpus when given."""
+    length = corpus.length if corpus else clip_length
+    load = corpus.load if corpus else load_clip
+    lengths = [length(clip.path) for clip in clips]
+    started = time.perf_counter()
+    for batch in make_batches(lengths, batch_size, max_batch_seconds):
+        audios = [load(clips[i].path) for i in batch]
+        for i, transcript in zip(batch, transcribe_batch(audios, processor, model)):
+            record = {
+                "name": clips[i].name,
+                "path": clips[i].path,
+                "seconds": round(lengths[i] / SAMPLING_RATE, 3),
+                "transcript": transcript,
+            }
+            if clips[i].reference:
+                record["reference"] = clips[i].reference
+            output.write(json.dumps(record) + "\n")
+        output.flush()
+    elapsed = time.perf_counter() - started
+    audio_seconds = sum(lengths) / SAMPLING_RATE
+    logging.info(
+        f"Transcribed {len(clips)} clips ({audio_seconds:.1f}s of audio) in {elapsed:.1f}s, "
+        f"real-time factor {elapsed / audio_seconds if audio_seconds else 0:.3f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a directory or manifest of audio clips in padded batches")
+    parser.add_argument("source", help="Directory of .npy/.wav files, CSV manifest with a wav column, '<file> <transcript>' list, or packed corpus prefix")
+    parser.add_argument("--audio-dir", default="./preprocessed_data", help="Where to look for manifest entries by name")
+    parser.add_argument("--output", default="-", help="JSON-lines output file, '-' for stdout")
+    parser.add_argument("--model", default=None, help="Checkpoint to use instead of ASR_MODEL_PATH")
+    parser.add_argument("--batch-size", type=int, default=16, help="Most clips per batch")
+    parser.add_argument("--max-batch-seconds", type=float, default=160, help="Most padded audio per batch")
+    args = parser.parse_args()
+
+    corpus = AudioCorpus(args.source) if is_corpus(args.source) else None
+    clips = corpus.clips() if corpus else find_clips(args.source, args.audio_dir)
+    processor, model = model_registry.get_model_and_processor(args.model)
+    if args.output == "-":
+        transcribe_clips(clips, sys.stdout, processor, model, args.batch_size, args.max_batch_seconds, corpus)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            transcribe_clips(clips, output, processor, model, args.batch_size, args.max_batch_seconds, corpus)
+
+if __name__ == "__main__":
+    main()
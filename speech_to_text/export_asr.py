@@ -0,0 +1,67 @@
+import os
+import argparse
+import logging
+import torch
+from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+
+try:
+    from speech_to_text import model_registry
+except ImportError:
+    # Run as a script from inside speech_to_text
+    import model_registry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+def export_int8(model, output_dir):
+    """Save a dynamically quantized copy of the model's weights."""
+    quantized = model_registry.quantize_dynamic(model)
+    path = os.path.join(output_dir, model_registry.INT8_WEIGHTS_FILE)
+    torch.save(quantized.state_dict(), path)
+    logging.info(f"Saved int8 weights to {path}")
+    return path
+
+def export_onnx(model, output_dir, opset=17, quantize=False):
+    """Export the model to an ONNX graph with dynamic batch and length, optionally with int8 weights as well."""
+    path = os.path.join(output_dir, model_registry.ONNX_MODEL_FILE)
+    dummy_input = torch.zeros(1, 16000)
+    torch.onnx.export(
+        model, (dummy_input,), path,
+        input_names=["input_values"], output_names=["logits"],
+        dynamic_axes={"input_values": {0: "batch", 1: "samples"}, "logits": {0: "batch", 1: "frames"}},
+        opset_version=opset, dynamo=False,
+    )
+    logging.info(f"Saved ONNX graph to {path}")
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic # type: ignore
+        int8_path = os.path.join(output_dir, model_registry.ONNX_INT8_MODEL_FILE)
+        quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+        logging.info(f"Saved int8 ONNX graph to {int8_path}")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a Wav2Vec2 checkpoint for faster CPU inference")
+    parser.add_argument("--model", default=model_registry.ASR_MODEL_PATH, help="Checkpoint to export, base or fine-tuned")
+    parser.add_argument("--output-dir", default="./wav2vec2-export", help="Directory to write the exported model to")
+    parser.add_argument("--int8", action="store_true", help="Write dynamically quantized PyTorch weights")
+    parser.add_argument("--onnx", action="store_true", help="Write an ONNX graph")
+    parser.add_argument("--onnx-int8", action="store_true", help="Also write an ONNX graph with int8 weights")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version")
+    args = parser.parse_args()
+    if not (args.int8 or args.onnx or args.onnx_int8):
+        parser.error("choose at least one of --int8, --onnx, --onnx-int8")
+
+    processor = Wav2Vec2Processor.from_pretrained(args.model)
+    model = Wav2Vec2ForCTC.from_pretrained(args.model).eval()
+    os.makedirs(args.output_dir, exist_ok=True)
+    # The export directory is a checkpoint of its own, so ASR_MODEL_PATH can point at it
+    processor.save_pretrained(args.output_dir)
+    model.config.save_pretrained(args.output_dir)
+
+    if args.onnx or args.onnx_int8:
+        export_onnx(model, args.output_dir, args.opset, quantize=args.onnx_int8)
+    if args.int8:
+        export_int8(model, args.output_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import threading
+import logging
+from types import SimpleNamespace
+import torch
+from transformers import Wav2Vec2Config, Wav2Vec2ForCTC, Wav2Vec2Processor
+
+# Checkpoint to transcribe with, e.g. "./wav2vec2-finetuned" after running train_asr.py,
+# or a directory written by export_asr.py
+ASR_MODEL_PATH = os.getenv("ASR_MODEL_PATH", "facebook/wav2vec2-base-960h")
+
+# Inference backend: "torch" (fp32), "int8" (dynamically quantized PyTorch), or
+# "onnx" / "onnx-int8" (ONNX Runtime with fp32 / int8 weights)
+ASR_BACKEND = os.getenv("ASR_BACKEND", "torch")
+BACKENDS = ["torch", "int8", "onnx", "onnx-int8"]
+
+# File names export_asr.py writes next to the config and processor
+INT8_WEIGHTS_FILE = "model_int8.pt"
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+
+# Loaded (processor, model) pairs by checkpoint and backend, shared by every caller in the process
+_models = {}
+_load_lock = threading.Lock()
+_warm_up_thread = None
+
+def quantize_dynamic(model):
+    """Quantize a model's linear layers to int8 weights, with activations quantized on the fly."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxCTCModel:
+    """ONNX Runtime session called like Wav2Vec2ForCTC, so transcription code works with either."""
+
+    def __init__(self, onnx_path):
+        import onnxruntime as ort # type: ignore
+        self.session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_values, attention_mask=None):
+        logits = self.session.run(["logits"], {"input_values": input_values.numpy()})[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+def _load_model(model_path, backend):
+    """Load a checkpoint's model for the given backend."""
+    if backend == "torch":
+        return Wav2Vec2ForCTC.from_pretrained(model_path).eval()
+    if backend == "int8":
+        weights_path = os.path.join(model_path, INT8_WEIGHTS_FILE)
+        if not os.path.exists(weights_path):
+            # Not exported yet: quantize the fp32 checkpoint while loading
+            return quantize_dynamic(Wav2Vec2ForCTC.from_pretrained(model_path).eval())
+        model = quantize_dynamic(Wav2Vec2ForCTC(Wav2Vec2Config.from_pretrained(model_path)).eval())
+        model.load_state_dict(torch.load(weights_path))
+        return model
+    if backend in ["onnx", "onnx-int8"]:
+        onnx_path = os.path.join(model_path, ONNX_MODEL_FILE if backend == "onnx" else ONNX_INT8_MODEL_FILE)
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"No ONNX graph at {onnx_path}; export one with export_asr.py first")
+        return OnnxCTCModel(onnx_path)
+    raise ValueError(f"Unknown ASR backend '{backend}', expected one of {BACKENDS}")
+
+def get_model_and_processor(model_path=None, backend=None):
+    """Get the processor and model for a checkpoint and backend, loading them on first use."""
+    key = (model_path or ASR_MODEL_PATH, backend or ASR_BACKEND)
+    if key not in _models:
+        with _load_lock:
+            if key not in _models:
+                try:
+                    processor = Wav2Vec2Processor.from_pretrained(key[0])
+                    model = _load_model(*key)
+                    logging.info(f"Loaded ASR model from {key[0]} ({key[1]} backend)")
+                except Exception as e:
+                    logging.error(f"Failed to load ASR model from {key[0]} ({key[1]} backend): {e}")
+                    raise
+                _models[key] = (processor, model)
+    return _models[key]
+
+def is_loaded(model_path=None, backend=None):
+    """Check whether a checkpoint has already been loaded for a backend."""
+    return (model_path or ASR_MODEL_PATH, backend or ASR_BACKEND) in _models
+
+def warm_up(background=False):
+    """Load the configured checkpoint ahead of the first transcription, optionally in a daemon thread."""
+    global _warm_up_thread
+    if background:
+        with _load_lock:
+            if _warm_up_thread is None:
+                _warm_up_thread = threading.Thread(target=_warm_up_quietly, name="asr-warm-up", daemon=True)
+                _warm_up_thread.start()
+        return
+    get_model_and_processor()
+
+def _warm_up_quietly():
+    try:
+        warm_up()
+    except Exception as e:
+        logging.error(f"ASR warm-up failed: {e}")
@@ -0,0 +1,220 @@
+import time
+import queue
+import argparse
+import logging
+from collections import namedtuple
+import numpy as np
+
+try:
+    from speech_to_text import model_registry
+    from speech_to_text.audio_corpus import load_clip
+    from speech_to_text.batch_transcribe import transcribe_batch
+except ImportError:
+    # Run as a script from inside speech_to_text
+    import model_registry
+    from audio_corpus import load_clip
+    from batch_transcribe import transcribe_batch
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SAMPLING_RATE = 16000
+FRAME_SAMPLES = 480  # 30 ms, the unit the voice activity gate works in
+
+# kind is "partial" while an utterance is still being spoken and "final" once it ends
+TranscriptEvent = namedtuple("TranscriptEvent", ["kind", "text", "seconds"])
+
+class RingBuffer:
+    """Fixed-size float32 audio buffer that keeps the most recent samples."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.written = 0
+        self._data = np.zeros(capacity, dtype=np.float32)
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def write(self, samples):
+        """Append samples, overwriting the oldest ones once full."""
+        samples = samples[-self.capacity:]
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def latest(self, count):
+        """Copy out the last count samples, oldest first."""
+        count = min(count, len(self))
+        end = self.written % self.capacity
+        if count <= end:
+            return self._data[end - count:end].copy()
+        return np.concatenate([self._data[end - count:], self._data[:end]])
+
+    def clear(self):
+        self.written = 0
+
+class EnergyVAD:
+    """Energy gate: a frame is speech when it is louder than both a fixed threshold and the tracked noise floor by a margin."""
+
+    def __init__(self, threshold_db=-35.0, margin_db=10.0, rise_db_per_second=2.0):
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.rise_db_per_second = rise_db_per_second
+        self.noise_db = threshold_db - margin_db
+
+    def is_speech(self, frame):
+        level_db = 20 * np.log10(np.sqrt(np.mean(frame ** 2)) + 1e-10)
+        speech = level_db > max(self.threshold_db, self.noise_db + self.margin_db)
+        # Minimum tracker, updated on every frame: drop to quieter levels at once and creep up slowly, so
+        # pauses between words pull the floor back down while a louder steady background is still learned
+        rise_db = self.rise_db_per_second * len(frame) / SAMPLING_RATE
+        self.noise_db = min(level_db, self.noise_db + rise_db)
+        return speech
+
+class StreamingRecognizer:
+    """Transcribes audio as it arrives, emitting partial transcripts over overlapping windows and a final one per utterance."""
+
+    def __init__(self, processor, model, window_seconds=4.0, step_seconds=1.0, end_silence_seconds=0.5,
+                 max_utterance_seconds=30.0, pre_roll_seconds=0.3, vad=None):
+        self.processor = processor
+        self.model = model
+        self.window = int(window_seconds * SAMPLING_RATE)
+        self.step = int(step_seconds * SAMPLING_RATE)
+        self.end_silence_frames = int(end_silence_seconds * SAMPLING_RATE / FRAME_SAMPLES)
+        self.max_utterance = int(max_utterance_seconds * SAMPLING_RATE)
+        self.pre_roll = int(pre_roll_seconds * SAMPLING_RATE)
+        self.vad = vad or EnergyVAD()
+        self.buffer = RingBuffer(self.max_utterance + self.pre_roll)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._utterance_start = None
+        self._silent_frames = 0
+        self._last_partial_at = 0
+        self._last_partial = ""
+
+    def _transcribe(self, audio):
+        return transcribe_batch([audio], self.processor, self.model)[0].strip()
+
+    def _utterance_audio(self):
+        return self.buffer.latest(self.buffer.written - self._utterance_start)
+
+    def _finish(self):
+        audio = self._utterance_audio()
+        self._utterance_start = None
+        self._last_partial = ""
+        text = self._transcribe(audio)
+        return TranscriptEvent("final", text, len(audio) / SAMPLING_RATE) if text else None
+
+    def feed(self, samples):
+        """Add audio and return the transcript events it completes."""
+        events = []
+        samples = np.concatenate([self._pending, np.asarray(samples, dtype=np.float32).ravel()])
+        whole = len(samples) - len(samples) % FRAME_SAMPLES
+        self._pending = samples[whole:]
+        for offset in range(0, whole, FRAME_SAMPLES):
+            frame = samples[offset:offset + FRAME_SAMPLES]
+            self.buffer.write(frame)
+            speech = self.vad.is_speech(frame)
+
+            if self._utterance_start is None:
+                if speech:
+                    self._utterance_start = max(self.buffer.written - FRAME_SAMPLES - self.pre_roll, self.buffer.written - len(self.buffer))
+                    self._silent_frames = 0
+                    self._last_partial_at = self.buffer.written
+                continue
+
+            self._silent_frames = 0 if speech else self._silent_frames + 1
+            spoken = self.buffer.written - self._utterance_start
+            if self._silent_frames >= self.end_silence_frames or spoken >= self.max_utterance:
+                # Long utterances are cut here and carry on as a new one, rather than being dropped
+                event = self._finish()
+                if event:
+                    events.append(event)
+            elif self.buffer.written - self._last_partial_at >= self.step:
+                self._last_partial_at = self.buffer.written
+                text = self._transcribe(self.buffer.latest(min(spoken, self.window)))
+                if text and text != self._last_partial:
+                    self._last_partial = text
+                    events.append(TranscriptEvent("partial", text, spoken / SAMPLING_RATE))
+        return events
+
+    def flush(self):
+        """End the current utterance, if any, and return its final transcript event."""
+        if self._utterance_start is None:
+            return []
+        event = self._finish()
+        return [event] if event else []
+
+def file_frames(path, chunk_seconds=0.1, realtime=False):
+    """Yield a .npy or .wav clip in microphone-sized chunks, optionally paced like live audio."""
+    audio = load_clip(path)
+    chunk = int(chunk_seconds * SAMPLING_RATE)
+    for start in range(0, len(audio), chunk):
+        if realtime:
+            time.sleep(chunk_seconds)
+        yield audio[start:start + chunk]
+
+def microphone_frames(chunk_seconds=0.1, max_seconds=None):
+    """Yield chunks from the default microphone as they are recorded."""
+    import sounddevice as sd # type: ignore
+    chunks = queue.Queue()
+    chunk = int(chunk_seconds * SAMPLING_RATE)
+    with sd.InputStream(samplerate=SAMPLING_RATE, channels=1, dtype="float32", blocksize=chunk,
+                        callback=lambda data, frames, timing, status: chunks.put(data[:, 0].copy())):
+        recorded = 0
+        while max_seconds is None or recorded < max_seconds * SAMPLING_RATE:
+            samples = chunks.get()
+            recorded += len(samples)
+            yield samples
+
+def transcribe_stream(frames, recognizer, single_utterance=False):
+    """Feed frames to a recognizer and yield its transcript events, stopping after the first final one if asked."""
+    for samples in frames:
+        for event in recognizer.feed(samples):
+            yield event
+            if single_utterance and event.kind == "final":
+                return
+    yield from recognizer.flush()
+
+def listen_once(max_seconds=15.0, recognizer=None):
+    """Record from the microphone until the speaker stops (or max_seconds pass) and return the transcript."""
+    if recognizer is None:
+        processor, model = model_registry.get_model_and_processor()
+        recognizer = StreamingRecognizer(processor, model)
+    for event in transcribe_stream(microphone_frames(max_seconds=max_seconds), recognizer, single_utterance=True):
+        if event.kind == "final":
+            return event.text
+        logging.info(f"Partial transcription: {event.text}")
+    return ""
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe speech as it arrives, from the microphone or a clip")
+    parser.add_argument("--file", help="Stream this .npy or .wav clip instead of the microphone")
+    parser.add_argument("--realtime", action="store_true", help="Pace file input like live audio")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Stop listening after this long")
+    parser.add_argument("--window", type=float, default=4.0, help="Seconds of audio behind each partial transcript")
+    parser.add_argument("--step", type=float, default=1.0, help="Seconds between partial transcripts")
+    parser.add_argument("--end-silence", type=float, default=0.5, help="Seconds of silence that end an utterance")
+    parser.add_argument("--threshold-db", type=float, default=-35.0, help="Quietest level counted as speech")
+    args = parser.parse_args()
+
+    processor, model = model_registry.get_model_and_processor()
+    recognizer = StreamingRecognizer(
+        processor, model, window_seconds=args.window, step_seconds=args.step,
+        end_silence_seconds=args.end_silence, vad=EnergyVAD(args.threshold_db),
+    )
+    if args.file:
+        frames = file_frames(args.file, realtime=args.realtime)
+    else:
+        frames = microphone_frames(max_seconds=args.max_seconds)
+        logging.info("Listening... press Ctrl+C to stop")
+    try:
+        for event in transcribe_stream(frames, recognizer):
+            print(f"[{event.kind} {event.seconds:.1f}s] {event.text}")
+    except KeyboardInterrupt:
+        for event in recognizer.flush():
+            print(f"[{event.kind} {event.seconds:.1f}s] {event.text}")
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import pyaudio
 import numpy as np
 import torch
 import logging
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+import model_registry
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -66,7 +66,7 @@ def transcribe_audio(audio, processor, model, sample_rate=16000):
     try:
         inputs = processor(audio, sampling_rate=sample_rate, return_tensors="pt", padding=True)
         logging.debug(f"Model input tensor shape: {inputs.input_values.shape}")
-        with torch.no_grad():
+        with torch.inference_mode():
             logits = model(inputs.input_values).logits
         logging.debug(f"Model logits shape: {logits.shape}")
         predicted_ids = torch.argmax(logits, dim=-1)
@@ -80,15 +80,8 @@ def transcribe_audio(audio, processor, model, sample_rate=16000):
         raise
 
 def load_model_and_processor():
-    """Load the pretrained Wav2Vec 2.0 model and processor."""
-    try:
-        processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-        model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-base-960h")
-        logging.info("Loaded pretrained facebook/wav2vec2-base-960h model")
-        return processor, model
-    except Exception as e:
-        logging.error(f"Failed to load model and processor: {e}")
-        raise
+    """Get the Wav2Vec 2.0 model and processor, loaded once per process."""
+    return model_registry.get_model_and_processor()
 
 def main():
     try:
@@ -1,13 +1,19 @@
 import numpy as np
 import torch
 import logging
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
 import matplotlib.pyplot as plt
 import librosa.display
 import sounddevice as sd
 import wave
 import csv
 
+try:
+    from speech_to_text import model_registry, streaming_asr
+except ImportError:
+    # Run as a script from inside speech_to_text
+    import model_registry
+    import streaming_asr
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -34,7 +40,7 @@ def transcribe_audio(audio, processor, model, sample_rate=16000):
     try:
         inputs = processor(audio, sampling_rate=sample_rate, return_tensors="pt", padding=True)
         logging.debug(f"Model input tensor shape: {inputs.input_values.shape}")
-        with torch.no_grad():
+        with torch.inference_mode():
             logits = model(inputs.input_values).logits
         logging.debug(f"Model logits shape: {logits.shape}")
         predicted_ids = torch.argmax(logits, dim=-1)
@@ -57,6 +63,7 @@ def visualize_audio(audio, sample_rate, save_path=None):
         plt.ylabel("Amplitude")
         if save_path:
             plt.savefig(save_path)
+            plt.close()
             logging.info(f"Audio waveform saved to {save_path}.")
         else:
             plt.show()
@@ -65,15 +72,8 @@ def visualize_audio(audio, sample_rate, save_path=None):
         raise
 
 def load_model_and_processor():
-    """Load the pretrained Wav2Vec 2.0 model and processor."""
-    try:
-        processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-        model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-base-960h")
-        logging.info("Model and processor loaded successfully.")
-        return processor, model
-    except Exception as e:
-        logging.error(f"Failed to load model and processor: {e}")
-        raise
+    """Get the Wav2Vec 2.0 model and processor, loaded once per process."""
+    return model_registry.get_model_and_processor()
 
 def get_real_transcription(audio_path):
     """Retrieve the real transcription from data.csv based on the audio path."""
@@ -139,12 +139,9 @@ def save_audio_to_wav(audio_data, sample_rate, file_path="temp_audio.wav"):
         raise
 
 def test_audio_live(duration, sample_rate):
-    """Record live audio, transcribe it, and return the transcription."""
+    """Listen until the speaker stops (at most duration seconds), transcribe, and return the transcription."""
     try:
-        audio_data = record_live_audio(duration, sample_rate)
-        save_audio_to_wav(audio_data, sample_rate)
-        processor, model = load_model_and_processor()
-        transcription = transcribe_audio(audio_data, processor, model, sample_rate)
+        transcription = streaming_asr.listen_once(max_seconds=duration)
         logging.info(f"Live transcription: {transcription}")
         return transcription
     except Exception as e:
@@ -3,6 +3,7 @@ import numpy as np
 import torch
 from datasets import Dataset
 from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor, Trainer, TrainingArguments
+from audio_corpus import AudioCorpus, is_corpus, INDEX_SUFFIX
 
 # Custom data collator for CTC
 class CTCDataCollator:
@@ -36,27 +37,38 @@ class CTCDataCollator:
         return batch
 
 # Step 1: Prepare the dataset
+def _npy_examples(data_dir, transcription_file):
+    with open(transcription_file, 'r') as f:
+        for line in f:
+            fname, transcript = line.strip().split(' ', 1)
+            audio_path = os.path.join(data_dir, fname)
+            if os.path.exists(audio_path):
+                yield {"audio": np.load(audio_path), "transcription": transcript}
+
 def load_npy_data(data_dir, transcription_file):
     """
     Load .npy audio files and their transcriptions.
     data_dir: Directory containing .npy files
     transcription_file: Text file with format 'filename transcription'
+    Clips are read one at a time into an on-disk Arrow dataset, so the
+    corpus is never held in memory as a whole.
     """
-    audio_data = []
-    transcriptions = []
-    
-    with open(transcription_file, 'r') as f:
-        lines = f.readlines()
-        for line in lines:
-            fname, transcript = line.strip().split(' ', 1)
-            audio_path = os.path.join(data_dir, fname)
-            if os.path.exists(audio_path):
-                audio = np.load(audio_path)
-                audio_data.append(audio)
-                transcriptions.append(transcript)
-    
-    dataset = Dataset.from_dict({"audio": audio_data, "transcription": transcriptions})
-    return dataset
+    return Dataset.from_generator(_npy_examples, gen_kwargs={"data_dir": data_dir, "transcription_file": transcription_file})
+
+def _corpus_examples(prefix, version):
+    corpus = AudioCorpus(prefix)
+    for i in range(len(corpus)):
+        yield {"audio": corpus.load(i), "transcription": corpus.references[i]}
+
+def load_corpus_data(prefix):
+    """
+    Load a corpus packed by audio_corpus.py.
+    prefix: Corpus prefix, i.e. the path without ".npy" / ".index.json"
+    Clips are sliced from the memory-mapped corpus one at a time.
+    """
+    # The datasets cache is keyed by these arguments, so a repacked corpus is read again
+    version = os.path.getmtime(prefix + INDEX_SUFFIX)
+    return Dataset.from_generator(_corpus_examples, gen_kwargs={"prefix": prefix, "version": version})
 
 # Step 2: Preprocess the data
 def preprocess_data(dataset, processor, sample_rate=16000):
@@ -117,7 +129,11 @@ def train_model(dataset, output_dir="./wav2vec2-finetuned"):
     print(f"Model saved to {output_dir}")
 
 if __name__ == "__main__":
+    corpus_prefix = "./audio_corpus"
     data_dir = "./preprocessed-data"
     transcription_file = "./transcriptions.txt"
-    dataset = load_npy_data(data_dir, transcription_file)
+    if is_corpus(corpus_prefix):
+        dataset = load_corpus_data(corpus_prefix)
+    else:
+        dataset = load_npy_data(data_dir, transcription_file)
     train_model(dataset)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+# The app's modules live at the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+@pytest.fixture(scope="session")
+def bundled_texts():
+    """Every distinct utterance in the bundled corpus and gold labels"""
+    import nlp_benchmark
+    corpus_dir = os.path.join(REPO_ROOT, nlp_benchmark.CORPUS_DIR)
+    gold = nlp_benchmark.load_gold(os.path.join(corpus_dir, os.path.basename(nlp_benchmark.GOLD_FILE)))
+    return sorted(set(nlp_benchmark.load_corpus(corpus_dir) + [label["text"] for label in gold]))
@@ -0,0 +1,36 @@
+from datetime import date
+import pytest
+import adherence
+import database
+
+@pytest.fixture
+def medication_id(tmp_path, monkeypatch):
+    """A medication carrying a legacy taken flag, in a fresh data directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(adherence, "_schema_ready", False)
+    database.initialize_database()
+    database.create_user("alice", "hash", "Alice", 70, "+15550100", "alice@example.com", "O+", "")
+    database.add_medication("alice", {
+        "medicine_name": "Lisinopril",
+        "dosage": "10mg",
+        "frequency": "once daily",
+        "timing": "in the morning",
+        "duration": "",
+        "instructions": "",
+        "start_date": "2026-01-01",
+        "end_date": "2026-12-31",
+    })
+    medication_id = database.get_medications("alice")[0]["id"]
+    database.mark_medication_taken(medication_id)
+    return medication_id
+
+def test_initialize_imports_taken_flags_once(medication_id, monkeypatch):
+    adherence.initialize_adherence_store()
+    assert adherence.get_taken_medication_ids("alice", date.today()) == {medication_id}
+
+    # A restart must not import the flags again
+    imported = []
+    monkeypatch.setattr(adherence, "_schema_ready", False)
+    monkeypatch.setattr(adherence, "import_taken_flags", imported.append)
+    adherence.initialize_adherence_store()
+    assert imported == []
@@ -0,0 +1,68 @@
+import time
+import pytest
+import alert_dispatcher
+import twilio_alert
+
+@pytest.fixture
+def call_server():
+    """Start a fake call server; pass latency and failure_rate to configure it"""
+    servers = []
+
+    def start(latency=0.0, failure_rate=0.0):
+        server = alert_dispatcher.run_fake_call_server(latency=latency, failure_rate=failure_rate)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/calls"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+class FlakyTransport(alert_dispatcher.FakeHttpTransport):
+    """Fails the first attempt for each number, then posts to the fake server"""
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.attempts = {}
+
+    def place_call(self, to, message, timeout):
+        self.attempts[to] = self.attempts.get(to, 0) + 1
+        if self.attempts[to] == 1:
+            raise ConnectionError("line busy")
+        return super().place_call(to, message, timeout)
+
+def _contacts(count):
+    return [{"name": f"Contact {i}", "phone": f"+1555{i:07d}"} for i in range(count)]
+
+def test_failed_call_is_retried_and_succeeds(call_server):
+    transport = FlakyTransport(call_server())
+    [result] = alert_dispatcher.dispatch_calls(_contacts(1), "Alert", transport=transport, retries=2, backoff=0.01)
+    assert result.ok and result.sid.startswith("CA")
+    assert result.attempts == 2
+
+def test_call_gives_up_after_retries_with_backoff(call_server):
+    transport = alert_dispatcher.FakeHttpTransport(call_server(failure_rate=1.0))
+    started = time.perf_counter()
+    [result] = alert_dispatcher.dispatch_calls(_contacts(1), "Alert", transport=transport, retries=2, backoff=0.05)
+    elapsed = time.perf_counter() - started
+    assert not result.ok
+    assert result.attempts == 3
+    assert "503" in result.error
+    # Waits of at least 0.05s and 0.1s before the two retries
+    assert elapsed >= 0.15
+
+def test_calls_are_placed_concurrently(call_server):
+    transport = alert_dispatcher.FakeHttpTransport(call_server(latency=0.2))
+    started = time.perf_counter()
+    results = alert_dispatcher.dispatch_calls(_contacts(20), "Alert", transport=transport)
+    elapsed = time.perf_counter() - started
+    assert [result.contact["phone"] for result in results] == [contact["phone"] for contact in _contacts(20)]
+    assert all(result.ok for result in results)
+    assert len({result.sid for result in results}) == 20
+    # One at a time would take 4s
+    assert elapsed < 2
+
+def test_twilio_client_uses_the_call_timeout():
+    pytest.importorskip("twilio")
+    transport = twilio_alert.TwilioTransport("AC" + "0" * 32, "token", "+15550000")
+    assert transport._get_client(3.5).http_client.timeout == 3.5
+    assert transport._get_client(3.5) is transport._get_client(3.5)
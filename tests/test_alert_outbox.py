@@ -0,0 +1,113 @@
+from contextlib import closing
+from datetime import datetime, timedelta
+import pytest
+import alert_dispatcher
+import alert_outbox
+
+CONTACT = {"name": "Bob", "phone": "+15550101"}
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    """A fresh outbox database with no worker running"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(alert_outbox, "_schema_ready", False)
+    monkeypatch.setattr(alert_outbox, "_worker", None)
+    return alert_outbox
+
+@pytest.fixture
+def call_server():
+    """Start a fake call server; pass failure_rate to configure it"""
+    servers = []
+
+    def start(failure_rate=0.0):
+        server = alert_dispatcher.run_fake_call_server(failure_rate=failure_rate)
+        servers.append(server)
+        return alert_dispatcher.FakeHttpTransport(f"http://127.0.0.1:{server.server_port}/calls")
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+def _make_due(entry_id):
+    with closing(alert_outbox._connect()) as conn, conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = ? WHERE id = ?", (alert_outbox._now(), entry_id))
+
+def _entry(entry_id):
+    [entry] = [entry for entry in alert_outbox.get_entries() if entry["id"] == entry_id]
+    return entry
+
+def _claim(entry_id, claimed_at):
+    with closing(alert_outbox._connect()) as conn, conn:
+        conn.execute(
+            "UPDATE outbox SET status = 'sending', updated_at = ? WHERE id = ?",
+            (claimed_at.strftime("%Y-%m-%d %H:%M:%S"), entry_id)
+        )
+
+def test_recover_in_flight_only_requeues_stale_claims(outbox):
+    contact = {"name": "Bob", "phone": "+15550101"}
+    fresh_id, stale_id = outbox.enqueue_alert("emergency", "alice", [contact, contact], "Help")
+    _claim(fresh_id, datetime.now())
+    _claim(stale_id, datetime.now() - outbox.CLAIM_TIMEOUT - timedelta(seconds=1))
+
+    assert outbox.recover_in_flight() == 1
+    statuses = {entry["id"]: entry["status"] for entry in outbox.get_entries()}
+    assert statuses == {fresh_id: "sending", stale_id: "pending"}
+
+def test_drain_once_marks_delivered_entries(outbox, call_server):
+    [entry_id] = outbox.enqueue_alert("emergency", "alice", [CONTACT], "Help")
+
+    assert outbox.drain_once(transport=call_server()) == 1
+    entry = _entry(entry_id)
+    assert entry["status"] == "delivered"
+    assert entry["attempts"] == 1
+    assert entry["sid"].startswith("CA")
+    assert outbox.drain_once(transport=call_server()) == 0
+
+def test_drain_once_backs_off_failed_entries(outbox, call_server):
+    [entry_id] = outbox.enqueue_alert("emergency", "alice", [CONTACT], "Help")
+    transport = call_server(failure_rate=1.0)
+
+    before = datetime.now()
+    assert outbox.drain_once(transport=transport) == 1
+    entry = _entry(entry_id)
+    assert entry["status"] == "pending"
+    assert entry["attempts"] == 1
+    assert "503" in entry["last_error"]
+    next_attempt = datetime.strptime(entry["next_attempt_at"], "%Y-%m-%d %H:%M:%S")
+    assert next_attempt >= (before + outbox.RETRY_DELAY).replace(microsecond=0)
+
+    # Not due again until the backoff has passed; the delay grows per attempt
+    assert outbox.drain_once(transport=transport) == 0
+    _make_due(entry_id)
+    before = datetime.now()
+    assert outbox.drain_once(transport=transport) == 1
+    entry = _entry(entry_id)
+    assert entry["attempts"] == 2
+    next_attempt = datetime.strptime(entry["next_attempt_at"], "%Y-%m-%d %H:%M:%S")
+    assert next_attempt >= (before + 2 * outbox.RETRY_DELAY).replace(microsecond=0)
+
+def test_drain_once_gives_up_after_max_attempts(outbox, call_server, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 3)
+    [entry_id] = outbox.enqueue_alert("emergency", "alice", [CONTACT], "Help")
+    transport = call_server(failure_rate=1.0)
+
+    for _ in range(3):
+        _make_due(entry_id)
+        assert outbox.drain_once(transport=transport) == 1
+    entry = _entry(entry_id)
+    assert entry["status"] == "failed"
+    assert entry["attempts"] == 3
+
+    _make_due(entry_id)
+    assert outbox.drain_once(transport=transport) == 0
+
+def test_enqueue_skips_contacts_already_queued_for_the_same_dose(outbox):
+    other = {"name": "Carol", "phone": "+15550102"}
+    first = outbox.enqueue_alert("emergency", "alice", [CONTACT], "Help", dedupe_key="missed:1:morning:2024-01-01")
+    second = outbox.enqueue_alert("emergency", "alice", [CONTACT, other], "Help", dedupe_key="missed:1:morning:2024-01-01")
+    third = outbox.enqueue_alert("emergency", "alice", [CONTACT], "Help", dedupe_key="missed:1:morning:2024-01-02")
+
+    assert len(first) == len(second) == len(third) == 1
+    assert len(outbox.get_entries()) == 3
+    # Alerts without a key are never deduplicated
+    assert len(outbox.enqueue_alert("emergency", "alice", [CONTACT, CONTACT], "Help")) == 2
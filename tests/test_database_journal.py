@@ -0,0 +1,42 @@
+import pytest
+import database_journal
+
+MEDICATION = {
+    "medicine_name": "Lisinopril",
+    "dosage": "10mg",
+    "frequency": "once daily",
+    "timing": "in the morning",
+    "duration": "",
+    "instructions": "",
+    "start_date": "2026-01-01",
+    "end_date": "2026-12-31",
+}
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """An empty journaled store in a fresh data directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database_journal, "_state", {"snapshot_mtime": None, "journal_offset": 0, "medications": {}})
+    database_journal.initialize_database()
+    return database_journal
+
+def _cut_journal(cut_bytes):
+    with open(database_journal.JOURNAL_FILE, "rb+") as f:
+        f.truncate(len(f.read()) - cut_bytes)
+
+@pytest.mark.parametrize("cut_bytes, survivors", [
+    (1, ["Lisinopril", "Metformin"]), # Only the newline was lost
+    (10, ["Metformin"]), # The entry itself was torn
+])
+def test_append_after_torn_tail(journal, cut_bytes, survivors):
+    journal.add_medication("alice", MEDICATION)
+    _cut_journal(cut_bytes)
+    assert journal.add_medication("alice", dict(MEDICATION, medicine_name="Metformin"))
+
+    # A fresh process replays the journal from the start
+    journal._state.update(snapshot_mtime=None, journal_offset=0, medications={})
+    assert [med["medicine_name"] for med in journal.get_medications("alice")] == survivors
+
+    journal.compact()
+    journal._state.update(snapshot_mtime=None, journal_offset=0, medications={})
+    assert [med["medicine_name"] for med in journal.get_medications("alice")] == survivors
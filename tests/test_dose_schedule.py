@@ -0,0 +1,46 @@
+from datetime import date, datetime
+import pytest
+import dose_schedule
+
+@pytest.mark.parametrize("frequency, timing, interval_days, doses", [
+    ("once daily", "in the morning", 1, [(0, "08:00", "morning")]),
+    ("once daily", "at bedtime", 1, [(0, "20:00", "night")]),
+    ("once daily", "morning and night", 1, [(0, "08:00", "morning"), (0, "20:00", "night")]),
+    ("twice daily", "morning and evening", 1, [(0, "08:00", "morning"), (0, "18:00", "evening")]),
+    ("twice daily", "", 1, [(0, "08:00", "morning"), (0, "20:00", "night")]),
+    ("three times a day", "with meals", 1, [(0, "07:30", "morning"), (0, "12:30", "afternoon"), (0, "18:30", "evening")]),
+    ("twice a week", "in the morning", 7, [(0, "08:00", "morning"), (4, "08:00", "morning")]),
+    ("weekly", "", 7, [(0, "09:00", "morning")]),
+    ("every other day", "at night", 2, [(0, "20:00", "night")]),
+    ("every 3 days", "", 3, [(0, "09:00", "morning")]),
+    ("every 2 weeks", "in the evening", 14, [(0, "18:00", "evening")]),
+    ("every 8 hours", "in the morning", 1, [(0, "08:00", "morning"), (0, "16:00", "afternoon"), (1, "00:00", "night")]),
+])
+def test_parse_recurrence(frequency, timing, interval_days, doses):
+    rule = dose_schedule.parse_recurrence(frequency, timing)
+    assert rule["interval_days"] == interval_days
+    assert [(dose["day"], dose["time"], dose["slot"]) for dose in rule["doses"]] == doses
+    assert all(dose["cutoff"] > dose["time"] for dose in rule["doses"])
+
+def _med(frequency, timing, **fields):
+    return dict({"id": "m1", "frequency": frequency, "timing": timing, "start_date": "2026-03-02", "end_date": "2026-03-31"}, **fields)
+
+def test_around_the_clock_doses_start_at_the_timing():
+    med = _med("every 8 hours", "in the morning")
+    first_day = [occurrence.due.strftime("%H:%M") for occurrence in dose_schedule.occurrences_on(med, date(2026, 3, 2))]
+    next_day = [occurrence.due.strftime("%H:%M") for occurrence in dose_schedule.occurrences_on(med, date(2026, 3, 3))]
+    assert first_day == ["08:00", "16:00"]
+    assert next_day == ["00:00", "08:00", "16:00"]
+
+def test_twice_a_week_falls_on_two_days_of_each_week():
+    med = _med("twice a week", "in the morning")
+    days = {
+        occurrence.due.date()
+        for occurrence in dose_schedule.iter_occurrences(med, datetime(2026, 3, 2), datetime(2026, 3, 16))
+    }
+    assert days == {date(2026, 3, 2), date(2026, 3, 6), date(2026, 3, 9), date(2026, 3, 13)}
+
+def test_rules_stored_by_an_older_parser_are_parsed_again():
+    stale = {"interval_days": 1, "doses": [{"time": "08:00", "cutoff": "11:00", "slot": "morning"}]}
+    med = _med("once daily", "morning and night", schedule=stale)
+    assert dose_schedule.get_slots(med) == ["morning", "night"]
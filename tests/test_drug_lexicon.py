@@ -0,0 +1,59 @@
+import re
+import pytest
+import drug_lexicon
+
+def _regex_matches(names, text):
+    """The matching the lexicon replaced: one word-bounded regex search per name"""
+    matches = set()
+    for key, name in names.items():
+        for match in re.finditer(r"\b" + re.escape(key) + r"\b", text.lower()):
+            matches.add(drug_lexicon.DrugMatch(name, match.start(), match.end(), text[match.start():match.end()]))
+    return matches
+
+def test_automaton_finds_what_per_name_regexes_find(bundled_texts):
+    lexicon = drug_lexicon.get_lexicon()
+    found = 0
+    for text in bundled_texts:
+        expected = _regex_matches(lexicon.names, text)
+        assert set(lexicon.find_all(text)) == expected, text
+        longest = lexicon.longest_match(text)
+        if expected:
+            assert longest.end - longest.start == max(match.end - match.start for match in expected), text
+        else:
+            assert longest is None
+        found += bool(expected)
+    assert found > len(bundled_texts) / 2
+
+def test_bundled_lexicon_is_found_from_any_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(drug_lexicon, "_lexicon", None)
+    assert "carvedilol" in drug_lexicon.get_lexicon().names
+
+def test_missing_lexicon_falls_back_with_a_warning(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(drug_lexicon, "DRUG_LEXICON_FILE", str(tmp_path / "missing.txt"))
+    monkeypatch.setattr(drug_lexicon, "_lexicon", None)
+    assert len(drug_lexicon.get_lexicon()) == len(set(drug_lexicon.DEFAULT_MEDICINES))
+    assert "missing.txt not found" in capsys.readouterr().out
+
+@pytest.mark.parametrize("heard, name", [
+    ("metforman", "Metformin"),
+    ("lisinoprill", "Lisinopril"),
+    ("amlodepine", "Amlodipine"),
+    ("ibuprofin", "Ibuprofen"),
+    ("asprin", "Aspirin"),
+    ("hydroclorothiazide", "Hydrochlorothiazide"),
+    ("levothyroxin", "Levothyroxine"),
+])
+def test_misspellings_resolve_to_the_lexicon_name(heard, name):
+    match = drug_lexicon.get_fuzzy_matcher().best_match(f"I take {heard} every day")
+    assert (match.name, match.text) == (name, heard)
+
+@pytest.mark.parametrize("drug", ["lorazepam", "prednisolone"])
+def test_real_drugs_missing_from_the_lexicon_are_not_matched(drug):
+    assert drug_lexicon.get_fuzzy_matcher().best_match(f"I take {drug} every day") is None
+
+def test_no_lexicon_name_matches_another():
+    names = list(drug_lexicon.get_lexicon().names.values())
+    for i, name in enumerate(names):
+        others = drug_lexicon.FuzzyDrugMatcher(names[:i] + names[i + 1:])
+        assert others.best_match(name) is None, name
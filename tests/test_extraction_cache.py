@@ -0,0 +1,33 @@
+import drug_lexicon
+import extraction_cache
+import nlp_processor
+
+def _lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+def test_persisted_file_stays_bounded(tmp_path):
+    path = str(tmp_path / "cache.jsonl")
+    cache = extraction_cache.ExtractionCache(max_size=10, path=path)
+    for i in range(100):
+        cache.put("v1", f"text {i}", {"medicine_name": str(i)})
+        assert _lines(path) <= 20
+
+    # The most recent entries survive a restart
+    reloaded = extraction_cache.ExtractionCache(max_size=10, path=path)
+    assert reloaded.get("v1", "text 99") == {"medicine_name": "99"}
+    assert reloaded.get("v1", "text 80") is None
+
+def test_entries_from_another_version_are_ignored(tmp_path):
+    path = str(tmp_path / "cache.jsonl")
+    extraction_cache.ExtractionCache(path=path).put("v1", "take aspirin", {"medicine_name": "aspirin"})
+    assert extraction_cache.ExtractionCache(path=path).get("v2", "take aspirin") is None
+
+def test_cache_version_follows_the_lexicon_and_fuzzy_threshold(monkeypatch):
+    version = nlp_processor._cache_version()
+    monkeypatch.setattr(drug_lexicon, "FUZZY_MIN_CONFIDENCE", 0.95)
+    assert nlp_processor._cache_version() != version
+    monkeypatch.undo()
+
+    monkeypatch.setattr(drug_lexicon, "_lexicon", drug_lexicon.DrugLexicon(["Aspirin", "Carvedilol"]))
+    assert nlp_processor._cache_version() != version
@@ -0,0 +1,86 @@
+import json
+import os
+import pytest
+import nlp_processor
+
+spacy = pytest.importorskip("spacy")
+
+# Fields from the extractors the scanner replaced, run over every bundled utterance
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "data", "field_baseline.jsonl")
+FIELDS = ["dosage", "frequency", "timing", "duration", "instructions"]
+
+@pytest.fixture(scope="module")
+def baseline():
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def test_baseline_covers_the_bundled_texts(baseline, bundled_texts):
+    assert [row["text"] for row in baseline] == bundled_texts
+
+def test_scanner_matches_baseline_fields(baseline):
+    tokenizer = nlp_processor.get_tokenizer()
+    for row in baseline:
+        fields = nlp_processor.extract_fields(tokenizer(row["text"]))
+        assert fields == {field: row[field] for field in FIELDS}, row["text"]
+
+def test_tiered_extractor_matches_baseline_fields(baseline, monkeypatch):
+    # Only the medicine name fallbacks need a trained model
+    monkeypatch.setattr(nlp_processor, "get_nlp", lambda: spacy.blank("en"))
+    monkeypatch.setattr(nlp_processor, "extract_medicine_name", lambda doc: "")
+    for row in baseline:
+        medication_info, tier = nlp_processor.extract_medication_info_tiered(row["text"])
+        assert {field: medication_info[field] for field in FIELDS} == {field: row[field] for field in FIELDS}, row["text"]
+        if tier != "spacy":
+            assert medication_info["medicine_name"] == nlp_processor.lexicon_medicine_name(row["text"])
+
+@pytest.fixture
+def nlp():
+    try:
+        return nlp_processor.get_nlp()
+    except nlp_processor.NLPResourceError as e:
+        pytest.skip(str(e))
+
+def test_tiered_extractor_matches_full_pipeline(nlp, bundled_texts):
+    for text in bundled_texts:
+        doc = nlp(text)
+        medicine_name = nlp_processor.extract_medicine_name(doc)
+        expected = {"medicine_name": medicine_name, "suggested_name": nlp_processor.suggest_medicine_name(medicine_name)}
+        expected.update(nlp_processor.extract_fields(doc))
+        assert nlp_processor.extract_medication_info_tiered(text)[0] == expected, text
+
+def test_tiered_batch_matches_single_texts(nlp, bundled_texts):
+    expected = [nlp_processor.extract_medication_info_tiered(text)[0] for text in bundled_texts]
+    assert nlp_processor.extract_medication_info_tiered_batch(bundled_texts, batch_size=16) == expected
+
+@pytest.fixture
+def blank_pipeline(monkeypatch):
+    """Stand in for the trained model, which only adds entities, lemmas and noun chunks"""
+    monkeypatch.setattr(nlp_processor, "get_nlp", lambda: spacy.blank("en"))
+
+def test_misspelled_name_is_kept_as_heard_with_a_suggestion(blank_pipeline):
+    medication_info, tier = nlp_processor.extract_medication_info_tiered("Take metforman 500mg twice daily")
+    assert tier == "spacy"
+    assert medication_info["medicine_name"] == "metforman"
+    assert medication_info["suggested_name"] == "Metformin"
+
+@pytest.mark.parametrize("medicine_name", ["Lorazepam", "Prednisolone 5mg", "Lisinopril", ""])
+def test_no_suggestion_for_real_or_known_drugs(medicine_name):
+    assert nlp_processor.suggest_medicine_name(medicine_name) == ""
+
+@pytest.mark.parametrize("text, clauses", [
+    ("Take aspirin daily", ["Take aspirin daily"]),
+    ("I take Lisinopril 10mg, and also vitamin D", ["I take Lisinopril 10mg", "vitamin D"]),
+    ("Lisinopril 10mg daily. Then metformin 500mg with dinner", ["Lisinopril 10mg daily.", "metformin 500mg with dinner"]),
+    # A tail saying how to take the last one applies to those without their own
+    ("Take aspirin and ibuprofen with food", ["Take aspirin with food", "ibuprofen with food"]),
+    (
+        "Take aspirin 81mg, ibuprofen 200mg and metformin 500mg twice daily",
+        ["Take aspirin 81mg twice daily", "ibuprofen 200mg twice daily", "metformin 500mg twice daily"],
+    ),
+    (
+        "Take metformin twice daily and lisinopril in the morning",
+        ["Take metformin twice daily", "lisinopril in the morning"],
+    ),
+])
+def test_segment_medications(text, clauses):
+    assert nlp_processor.segment_medications(text) == clauses
@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import wait
+from http.server import ThreadingHTTPServer
+import pytest
+import extraction_cache
+import nlp_processor
+import nlp_service
+
+pytest.importorskip("spacy")
+
+# Every text names a lexicon drug, so the workers never need the trained model
+TEXTS = [
+    "Take aspirin 81mg daily",
+    "Metformin 500mg twice a day with meals",
+    "Lisinopril 10mg in the morning, keep out of reach of children",
+    "Atorvastatin 20mg at bedtime for 30 days",
+]
+
+@pytest.fixture(scope="module")
+def batcher():
+    batcher = nlp_service.MicroBatcher(workers=1, max_batch=8, max_wait_ms=50)
+    yield batcher
+    batcher.shutdown()
+
+@pytest.fixture(scope="module")
+def service_url(batcher):
+    nlp_service.NLPRequestHandler.batcher = batcher
+    server = ThreadingHTTPServer(("127.0.0.1", 0), nlp_service.NLPRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def _local(texts):
+    return [nlp_processor.extract_medication_info_tiered(text)[0] for text in texts]
+
+def test_micro_batcher_groups_concurrent_texts(batcher):
+    texts = TEXTS * 5
+    batches_before, texts_before = batcher.batches, batcher.texts
+    futures = [batcher.submit(text) for text in texts]
+    wait(futures, timeout=60)
+
+    assert [future.result() for future in futures] == _local(texts)
+    assert batcher.texts - texts_before == len(texts)
+    # Texts queued within the wait window share a batch
+    assert batcher.batches - batches_before < len(texts)
+
+def test_extract_remote_returns_the_local_results(service_url):
+    assert nlp_service.extract_remote(TEXTS, service_url, timeout=60) == _local(TEXTS)
+
+def test_bad_request_raises_service_error(service_url):
+    with pytest.raises(nlp_service.NLPServiceError, match="404"):
+        nlp_service.extract_remote(TEXTS, service_url + "/missing")
+
+def test_unreachable_service_raises_service_error():
+    with pytest.raises(nlp_service.NLPServiceError, match="unavailable"):
+        nlp_service.extract_remote(TEXTS, "http://127.0.0.1:9", timeout=1)
+
+def test_extraction_falls_back_to_this_process(monkeypatch, capsys):
+    monkeypatch.setattr(nlp_processor, "NLP_SERVICE_URL", "http://127.0.0.1:9")
+    monkeypatch.setattr(nlp_processor, "_cache", extraction_cache.ExtractionCache())
+    assert nlp_processor.extract_medication_info(TEXTS[0]) == _local(TEXTS[:1])[0]
+    assert "Extracting in-process" in capsys.readouterr().out
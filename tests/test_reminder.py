@@ -0,0 +1,92 @@
+from datetime import date, datetime, time, timedelta
+import pytest
+import adherence
+import alert_outbox
+import database
+import reminder
+
+@pytest.fixture
+def medication(tmp_path, monkeypatch):
+    """A user with a phone, an emergency contact and one medication, in a fresh data directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "STORAGE_BACKEND", "json")
+    monkeypatch.setattr(alert_outbox, "_schema_ready", False)
+    monkeypatch.setattr(alert_outbox, "_worker", None)
+    monkeypatch.setattr(adherence, "_schema_ready", False)
+    database.initialize_database()
+    database.create_user("alice", "hash", "Alice", 70, "+15550100", "alice@example.com", "O+", "")
+    database.add_emergency_contact("alice", "Bob", "Son", "+15550101", "bob@example.com")
+    database.add_medication("alice", {
+        "medicine_name": "Lisinopril",
+        "dosage": "10mg",
+        "frequency": "once daily",
+        "timing": "in the morning",
+        "duration": "",
+        "instructions": "",
+        "start_date": "2026-01-01",
+        "end_date": "2026-12-31",
+    })
+    return database.get_medications("alice")[0]
+
+def test_send_reminder_notification_queues_call(medication):
+    assert reminder.send_reminder_notification({"medication": medication})
+    entries = alert_outbox.get_entries()
+    assert [entry["kind"] for entry in entries] == ["reminder"]
+    assert "Lisinopril (10mg)" in entries[0]["message"]
+
+def test_notify_emergency_contacts_queues_call(medication):
+    assert reminder.notify_emergency_contacts("alice", {"medication": medication})
+    entries = alert_outbox.get_entries()
+    assert [entry["kind"] for entry in entries] == ["emergency"]
+    assert "dose of Lisinopril was missed" in entries[0]["message"]
+
+def test_grouped_checks_match_per_user_checks(medication):
+    database.create_user("bob", "hash", "Bob", 72, "+15550102", "bob@example.com", "A+", "")
+    for frequency, timing in [("twice daily", ""), ("every other day", "at night"), ("every 8 hours", "morning")]:
+        database.add_medication("bob", {
+            "medicine_name": "Metformin",
+            "dosage": "500mg",
+            "frequency": frequency,
+            "timing": timing,
+            "duration": "",
+            "instructions": "",
+            "start_date": date.today().isoformat(),
+            "end_date": "2099-12-31",
+        })
+    tomorrow = date.today() + timedelta(days=1)
+    twice_daily = database.get_medications("bob")[0]
+    adherence.record_dose("bob", twice_daily["id"], "morning", datetime.combine(tomorrow, time(8, 10)))
+
+    checked = 0
+    for hour, minute in [(0, 5), (8, 5), (11, 30), (16, 10), (20, 0), (23, 59)]:
+        now = datetime.combine(tomorrow, time(hour, minute))
+        per_user = {
+            username: (reminder.check_medication_reminders(username, now), reminder.check_missed_medications(username, now))
+            for username in ["alice", "bob"]
+        }
+        grouped_reminders = reminder.check_all_medication_reminders(now)
+        grouped_missed = reminder.check_all_missed_medications(now)
+        for username, (reminders, missed) in per_user.items():
+            assert grouped_reminders.get(username, []) == reminders
+            assert grouped_missed.get(username, []) == missed
+            checked += len(reminders) + len(missed)
+    assert checked
+
+def test_doses_due_before_the_medication_was_added_are_not_missed(medication, monkeypatch):
+    day = date.today() + timedelta(days=1)
+    night = datetime.combine(day, time(23, 0))
+    monkeypatch.setattr(database, "get_medications", lambda username: [dict(medication, created_at=f"{day} 10:00:00")])
+    assert reminder.check_missed_medications("alice", night) == []
+
+    monkeypatch.setattr(database, "get_medications", lambda username: [dict(medication, created_at=f"{day} 07:00:00")])
+    assert [missed["slot"] for missed in reminder.check_missed_medications("alice", night)] == ["morning"]
+
+def test_repeated_alerts_for_the_same_dose_are_queued_once(medication):
+    cutoff = datetime(2026, 3, 1, 11, 0)
+    missed = {"medication": medication, "cutoff_time": cutoff, "slot": "morning"}
+    assert reminder.notify_emergency_contacts("alice", missed)
+    assert reminder.notify_emergency_contacts("alice", missed)
+    assert len(alert_outbox.get_entries()) == 1
+
+    reminder.notify_emergency_contacts("alice", dict(missed, cutoff_time=cutoff + timedelta(days=1)))
+    assert len(alert_outbox.get_entries()) == 2
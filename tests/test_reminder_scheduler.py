@@ -0,0 +1,100 @@
+from datetime import date, datetime, timedelta
+import pytest
+import database
+import reminder_scheduler
+
+MEDICATION = {
+    "medicine_name": "Lisinopril",
+    "dosage": "10mg",
+    "frequency": "once daily",
+    "timing": "in the morning",
+    "duration": "",
+    "instructions": "",
+    "start_date": "2026-01-01",
+    "end_date": "2099-12-31",
+}
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A fresh data directory with two users"""
+    monkeypatch.chdir(tmp_path)
+    database.initialize_database()
+    database.create_user("alice", "hash", "Alice", 70, "+15550100", "alice@example.com", "O+", "")
+    database.create_user("bob", "hash", "Bob", 72, "+15550102", "bob@example.com", "A+", "")
+    return tmp_path
+
+@pytest.fixture
+def scheduler(data_dir):
+    """A scheduler over the data directory, without its worker thread"""
+    scheduler = reminder_scheduler.ReminderScheduler(on_reminder=print, on_missed=print)
+    scheduler.load_all()
+    return scheduler
+
+def test_reload_changed_users_requeues_only_changed_users(scheduler):
+    database.add_medication("bob", MEDICATION)
+    assert scheduler.reload_changed_users() == ["bob"]
+    assert scheduler.reload_changed_users() == []
+
+    # Written as another process would, without telling this scheduler
+    database.add_medication("alice", MEDICATION)
+    bob_generation = scheduler._generations["bob"]
+    assert scheduler.reload_changed_users() == ["alice"]
+    assert scheduler._generations["bob"] == bob_generation
+    assert sorted(entry[3] for entry in scheduler._heap) == ["alice", "bob"]
+
+def test_doses_due_before_the_medication_was_added_are_skipped(scheduler):
+    today = date.today()
+    med = dict(MEDICATION, id="m1", username="alice", created_at=f"{today} 10:00:00")
+    scheduler._schedule_medication(med, datetime.combine(today, datetime.min.time()) + timedelta(hours=10, minutes=30))
+    # No missed check for the 08:00 dose, only tomorrow's reminder
+    assert [(entry[2], entry[0].date()) for entry in scheduler._heap] == [("reminder", today + timedelta(days=1))]
+
+def test_only_one_scheduler_leads(data_dir, monkeypatch):
+    monkeypatch.setattr(reminder_scheduler, "LEADER_RETRY_SECONDS", 0.05)
+    first = reminder_scheduler.ReminderScheduler(on_reminder=print, on_missed=print)
+    second = reminder_scheduler.ReminderScheduler(on_reminder=print, on_missed=print)
+    first.start()
+    second.start()
+    try:
+        _wait_for(lambda: first.is_leader or second.is_leader)
+        leader, follower = (first, second) if first.is_leader else (second, first)
+        reminder_scheduler.time.sleep(0.2)
+        assert not follower.is_leader
+
+        # The follower takes over once the leader exits
+        leader.stop()
+        _wait_for(lambda: follower.is_leader)
+    finally:
+        first.stop()
+        second.stop()
+
+def _wait_for(condition, timeout=5):
+    deadline = datetime.now() + timedelta(seconds=timeout)
+    while not condition():
+        assert datetime.now() < deadline
+        reminder_scheduler.time.sleep(0.01)
+
+def test_mark_taken_drops_past_days(scheduler):
+    today = date.today()
+    scheduler.mark_taken("old", "morning", today - timedelta(days=1))
+    scheduler._taken_day = today - timedelta(days=1)
+    scheduler.mark_taken("new", "morning")
+    assert scheduler._taken == {("new", "morning", today)}
+
+def test_catch_up_sends_what_fell_due_without_a_leader(data_dir):
+    database.add_medication("alice", MEDICATION)
+    sent = []
+    scheduler = reminder_scheduler.ReminderScheduler(
+        on_reminder=lambda event: sent.append(("reminder", event["slot"])),
+        on_missed=lambda username, event: sent.append(("missed", event["slot"])),
+    )
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    scheduler.catch_up(tomorrow + timedelta(hours=8, minutes=10))
+    scheduler.catch_up(tomorrow + timedelta(hours=12))
+    assert sent == [("reminder", "morning"), ("missed", "morning")]
+
+def test_missed_doses_escalate_only_when_enabled(data_dir, monkeypatch):
+    monkeypatch.setattr(reminder_scheduler, "AUTO_ESCALATE", False)
+    assert reminder_scheduler.ReminderScheduler().on_missed is reminder_scheduler._log_missed
+    monkeypatch.setattr(reminder_scheduler, "AUTO_ESCALATE", True)
+    assert reminder_scheduler.ReminderScheduler().on_missed is reminder_scheduler.reminder.notify_emergency_contacts
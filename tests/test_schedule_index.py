@@ -0,0 +1,24 @@
+from datetime import date
+import schedule_index
+
+DAILY = {"id": 1, "start_date": "2026-03-01", "end_date": "2026-03-31", "frequency": "once daily", "timing": "morning"}
+WEEKLY = {"id": 2, "start_date": "2026-03-02", "end_date": "2026-03-31", "frequency": "once a week", "timing": "morning"}
+TWICE_WEEKLY = {"id": 3, "start_date": "2026-03-03", "end_date": "2026-03-20", "frequency": "twice a week", "timing": "night"}
+AROUND_THE_CLOCK = {"id": 4, "start_date": "2026-03-05", "end_date": "2026-03-12", "frequency": "every 8 hours", "timing": "morning"}
+
+def test_active_on_keeps_only_dose_days():
+    index = schedule_index.MedicationIntervalIndex([DAILY, WEEKLY])
+    assert index.active_on(date(2026, 3, 9)) == [DAILY, WEEKLY]
+    assert index.active_on(date(2026, 3, 10)) == [DAILY]
+    assert index.count_on("2026-03-10") == 1
+
+def test_lookups_agree_with_materialize():
+    index = schedule_index.MedicationIntervalIndex([DAILY, WEEKLY, TWICE_WEEKLY, AROUND_THE_CLOCK])
+    first, last = date(2026, 2, 25), date(2026, 4, 3)
+    counts = index.counts_between(first, last)
+    matrix = index.materialize(first, last)
+    assert [counts[day] for day in sorted(counts)] == matrix.totals.tolist()
+    assert [len(meds) for _, meds in sorted(index.active_between(first, last).items())] == matrix.totals.tolist()
+    # The first day of an around-the-clock medication has no midnight dose
+    assert matrix.buckets[(date(2026, 3, 5) - first).days].tolist() == [2, 1, 0, 0]
+    assert matrix.buckets[(date(2026, 3, 6) - first).days].tolist() == [2, 1, 0, 1]
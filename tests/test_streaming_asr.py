@@ -0,0 +1,63 @@
+import wave
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+from speech_to_text import streaming_asr
+
+RATE = streaming_asr.SAMPLING_RATE
+
+def _tone(seconds, level=0.25):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return level * np.sin(2 * np.pi * 200 * t)
+
+def _frames(audio):
+    return audio.reshape(-1, streaming_asr.FRAME_SAMPLES)
+
+def _noise(seconds, level=0.001, seed=0):
+    return level * np.random.default_rng(seed).standard_normal(int(seconds * RATE))
+
+class BoundaryRecognizer(streaming_asr.StreamingRecognizer):
+    """Records where each utterance starts and ends instead of running a model"""
+
+    def __init__(self, **kwargs):
+        super().__init__(None, None, **kwargs)
+        self.utterances = []
+
+    def _transcribe(self, audio):
+        return "speech"
+
+    def _finish(self):
+        self.utterances.append((self._utterance_start / RATE, self.buffer.written / RATE))
+        return super()._finish()
+
+def test_file_fed_utterance_boundaries(tmp_path):
+    pytest.importorskip("librosa")
+    # Speech from 0.5 to 1.5 s and from 2.5 to 3.3 s, over quiet background noise
+    audio = np.concatenate([_noise(0.5), _tone(1.0), _noise(1.0, seed=1), _tone(0.8), _noise(0.7, seed=2)])
+    path = str(tmp_path / "speech_silence_speech.wav")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes((audio * 32767).astype(np.int16).tobytes())
+
+    recognizer = BoundaryRecognizer(end_silence_seconds=0.5, pre_roll_seconds=0.3)
+    events = list(streaming_asr.transcribe_stream(streaming_asr.file_frames(path), recognizer))
+
+    assert [event.kind for event in events if event.kind == "final"] == ["final", "final"]
+    # Each utterance starts a pre-roll before the speech and ends after the end silence
+    expected = [(0.2, 2.0), (2.2, 3.8)]
+    assert np.allclose(recognizer.utterances, expected, atol=0.05), recognizer.utterances
+
+def test_noise_floor_learns_a_louder_background_during_speech():
+    vad = streaming_asr.EnergyVAD(threshold_db=-35.0, margin_db=10.0)
+
+    # A steady -30 dB hum, above the fixed threshold, is taken for speech at first...
+    hum = [vad.is_speech(frame) for frame in _frames(_tone(6.0, level=0.045))]
+    assert hum[0]
+    # ...but the floor keeps rising under it, so it is background within a few seconds
+    assert not any(hum[-50:])
+    # Speech well above the hum is still heard
+    assert vad.is_speech(_frames(_tone(0.03, level=0.5))[0])
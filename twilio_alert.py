@@ -1,8 +1,10 @@
 # twilio_alert.py
 
-from twilio.rest import Client
 import os
+import threading
+from xml.sax.saxutils import escape
 from dotenv import load_dotenv
+import alert_dispatcher
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,23 +14,77 @@ TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+class TwilioTransport:
+    """
+    Call transport backed by the Twilio REST API
 
-def call_emergency_contacts(emergency_contacts, message="This is an emergency alert. Please check on your loved one."):
+    The Twilio client is only imported and built on the first call, so
+    importing this module needs neither the SDK's startup cost nor credentials.
+    The HTTP timeout is fixed per client, so one client is kept per timeout.
     """
-    Call all emergency contacts with a voice message using Twilio
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None, timeout=alert_dispatcher.CALL_TIMEOUT):
+        self.account_sid = account_sid or TWILIO_ACCOUNT_SID
+        self.auth_token = auth_token or TWILIO_AUTH_TOKEN
+        self.from_number = from_number or TWILIO_PHONE_NUMBER
+        self.timeout = timeout
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get_client(self, timeout):
+        with self._lock:
+            client = self._clients.get(timeout)
+            if client is None:
+                if not (self.account_sid and self.auth_token and self.from_number):
+                    raise RuntimeError(
+                        "Twilio credentials are not configured. Set TWILIO_ACCOUNT_SID, "
+                        "TWILIO_AUTH_TOKEN and TWILIO_PHONE_NUMBER."
+                    )
+                from twilio.rest import Client
+                from twilio.http.http_client import TwilioHttpClient
+                client = self._clients[timeout] = Client(
+                    self.account_sid, self.auth_token,
+                    http_client=TwilioHttpClient(timeout=timeout)
+                )
+            return client
+
+    def place_call(self, to, message, timeout):
+        """
+        Place one call
+
+        Args:
+            to (str): Phone number to call
+            message (str): Message to be converted to speech in the call
+            timeout (float): Seconds to wait for the Twilio API, defaults to
+                the transport's timeout
+
+        Returns:
+            str: Call SID
+        """
+        call = self._get_client(self.timeout if timeout is None else timeout).calls.create(
+            to=to,
+            from_=self.from_number,
+            twiml=f'<Response><Say>{escape(message)}</Say></Response>'
+        )
+        return call.sid
+
+def call_emergency_contacts(emergency_contacts, message="This is an emergency alert. Please check on your loved one.", transport=None):
+    """
+    Call all emergency contacts with a voice message, concurrently
 
     Args:
         emergency_contacts (list): List of emergency contact dicts
         message (str): Message to be converted to speech in the call
+        transport (object): Call transport, defaults to the configured one
+
+    Returns:
+        list: alert_dispatcher.CallResult for each contact
     """
-    for contact in emergency_contacts:
-        try:
-            call = client.calls.create(
-                to=contact["phone"],
-                from_=TWILIO_PHONE_NUMBER,
-                twiml=f'<Response><Say>{message}</Say></Response>'
-            )
-            print(f"Calling {contact['name']} at {contact['phone']}: Call SID {call.sid}")
-        except Exception as e:
-            print(f"Failed to call {contact['phone']}: {e}")
+    results = alert_dispatcher.dispatch_calls(emergency_contacts, message, transport=transport)
+    for result in results:
+        contact = result.contact
+        if result.ok:
+            print(f"Calling {contact['name']} at {contact['phone']}: Call SID {result.sid}")
+        else:
+            print(f"Failed to call {contact['phone']} after {result.attempts} attempts: {result.error}")
+    return results